@@ -0,0 +1,54 @@
+import threading
+
+from flask import Flask
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Routes flasgger serves: the UI, the JSON spec and the UI's static files
+DOCS_PREFIXES = ('/apidocs', '/apispec', '/flasgger_static')
+
+
+class LazySwaggerDocs:
+    """WSGI middleware serving the Swagger UI from a docs-only Flask app.
+
+    flasgger, and the jsonschema/yaml stack behind it, are imported when the
+    docs are first requested rather than when a worker starts. The docs app
+    registers the same blueprints as the API app, so the spec is unchanged.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self._docs_app = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._docs_app is not None
+
+    def docs_app(self):
+        with self._lock:
+            if self._docs_app is None:
+                from flasgger import Swagger
+                docs_app = Flask(self.app.import_name)
+                for blueprint in self.app.blueprints.values():
+                    docs_app.register_blueprint(blueprint)
+                self.app.extensions['vehicle_swagger'] = Swagger(docs_app)
+                self._docs_app = docs_app
+                logger.info("Swagger docs loaded")
+        return self._docs_app
+
+    def build_specs(self):
+        docs_app = self.docs_app()
+        swag = self.app.extensions['vehicle_swagger']
+        with docs_app.app_context():
+            for spec in swag.config['specs']:
+                swag.get_apispecs(spec['endpoint'])
+        return swag
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(DOCS_PREFIXES):
+            return self.docs_app()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
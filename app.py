@@ -1,28 +1,290 @@
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-from flasgger import Swagger
+import json
+import math
+import threading
+import time
+import uuid
 
-import entity
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, request, stream_with_context
+
+from api_docs import LazySwaggerDocs
+from cache import create_cache
+from compression import create_compressor, etag_variants
+from db_backends import VEHICLE_FIELDS, create_backend
 from db_context import DatabaseContext
-from databaseLayer import VehicleRepository
+from entity import VehicleRows
+from databaseLayer import VehicleRepository, VersionConflictError
 from businessLayer import VehicleService
-from config import get_db_connection_string
-from logger_config import setup_logger
+from config import (get_api_settings, get_cache_settings, get_compression_settings, get_db_connection_string,
+                    get_db_engine, get_db_pool_settings, get_hot_reload_settings, get_resilience_settings,
+                    get_write_behind_settings)
+from config_watcher import ConfigWatcher
+from logger_config import configure_logging, logging_stats, request_id_var, setup_logger
+from metrics import REGISTRY
+from resilience import CircuitBreaker, DatabaseUnavailableError, create_resilient_repository
+from serialization import COLUMNAR_JSON, ETAG_SUFFIXES, JSON, dumps, encode, to_columns, vehicle_media_types
+from validation import ValidationError, vehicle_validator
+from write_behind import create_write_buffer
 
 logger = setup_logger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-swagger = Swagger(app)
+vehicle_api = Blueprint('vehicle_api', __name__)
+
+CHANGE_STREAM_SECONDS = 300
+CHANGE_KEEPALIVE_SECONDS = 15
+CHANGE_STREAM_RETRY_MS = 1000
+# Long polls and streams each hold a server thread for up to a minute or
+# more, so only this many run at once per process; keep it below the
+# worker's thread count so CRUD requests always find a free thread
+DEFAULT_MAX_CHANGE_STREAMS = 2
+DEFAULT_MAX_BULK_ROWS = 10000
+
+
+def _vehicle_service():
+    return current_app.extensions['vehicle_service']
+
+
+def _json_response(payload, status=200):
+    # Vehicles are encoded straight from their slots instead of via __dict__
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def _vehicle_encoding():
+    # Anything we don't offer gets JSON, as before negotiation existed
+    return request.accept_mimetypes.best_match(vehicle_media_types()) or JSON
+
+
+def _vehicle_response(result, fields=None):
+    """A vehicle, list of vehicles or page dict, encoded as negotiated by the GET route."""
+    media_type = g.get('vehicle_encoding', JSON)
+    if media_type == JSON:
+        return _json_response(result)
+    if media_type == COLUMNAR_JSON:
+        if isinstance(result, dict):
+            result = dict(result, items=to_columns(result["items"], fields or VEHICLE_FIELDS))
+        else:
+            result = to_columns(result if isinstance(result, (list, VehicleRows)) else [result])
+    return Response(encode(result, media_type), mimetype=media_type)
+
+
+def _unavailable(e):
+    # Fail fast with a hint instead of a 500 (or a 409 on POST) while the database is down
+    logger.error("Database unavailable: %s", str(e))
+    response = jsonify({"error": "Database unavailable, try again later"})
+    response.status_code = 503
+    if e.retry_after:
+        response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+    return response
+
+
+def _version_tag(vehicle_no=None, prefix=False):
+    try:
+        service = _vehicle_service()
+        return service.version_tag(vehicle_no, prefix=True) if prefix else service.version_tag(vehicle_no)
+    except Exception as e:
+        # A missing validator only costs the client a full response
+        logger.warning("ETag lookup failed, responding without one: %s", str(e))
+        return None
+
+
+def _conditional(tag, view):
+    """Answers 304 when If-None-Match carries tag; otherwise runs view and tags a 200.
+
+    The tag is read before the data, so a concurrent write can only make it
+    stale (an extra full response), never validate outdated content.
+    """
+    # A compressed copy carries a suffixed tag but names the same content
+    for variant in etag_variants(tag) if tag is not None else ():
+        if request.if_none_match.contains_weak(variant):
+            response = Response(status=304)
+            response.set_etag(variant)
+            return response
+    response = current_app.make_response(view())
+    if tag is not None and response.status_code == 200:
+        response.set_etag(tag)
+    return response
+
+
+def _expected_version():
+    """Version named by If-Match, or None when the header is absent or '*'."""
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    tags = request.if_match.as_set()
+    # Weak tags never satisfy If-Match, and only one row is being replaced
+    if len(tags) != 1:
+        raise VersionConflictError("If-Match must name exactly one vehicle version")
+    # Suffixes mark another encoding (-gzip, -columnar) of the same version
+    tag = tags.pop().split('-', 1)[0]
+    if not tag.startswith('v') or not tag[1:].isdigit():
+        raise VersionConflictError("If-Match does not name a vehicle version")
+    return int(tag[1:])
+
+
+def build_vehicle_service():
+    # Dependency Injection
+    connection_string = get_db_connection_string()
+    resilience = get_resilience_settings()
+    db_backend = create_backend(get_db_engine(), connection_string, connect_timeout=resilience.get("connect_timeout"),
+                                query_timeout=resilience.get("query_timeout"))
+    db_context = DatabaseContext(db_backend, **get_db_pool_settings())
+    vehicle_repo = create_resilient_repository(resilience, VehicleRepository(db_context))
+    vehicle_cache = create_cache(get_cache_settings())
+    write_buffer = create_write_buffer(get_write_behind_settings(), vehicle_repo)
+    return VehicleService(vehicle_repo, vehicle_cache, write_buffer=write_buffer)
+
+
+def apply_config(service, config, changed):
+    """Applies a reloaded config to a running service; returns the sections that need a restart."""
+    # The engine, connection string, cache backend and write-behind mode are
+    # wired into objects built at startup
+    restart = changed - {"DbPool", "Cache", "Logging", "HotReload"}
+    # Each section is applied on its own, so one bad section doesn't keep the others back
+    for section in ("DbPool", "Cache", "Logging"):
+        if section not in changed:
+            continue
+        try:
+            if section == "DbPool":
+                service.repo.db_context.pool.reconfigure(**config.get("DbPool", {}))
+            elif section == "Cache":
+                cache = config.get("Cache", {})
+                running = service.cache_stats()["backend"] if service.cache is not None else "none"
+                if cache.get("backend", "memory") != running:
+                    restart.add("Cache")
+                elif service.cache is not None:
+                    service.cache.reconfigure(ttl=cache.get("ttl_seconds"), max_size=cache.get("max_size"))
+            else:
+                configure_logging(config.get("Logging", {}))
+        except Exception as e:
+            logger.error("Error applying reloaded %s config: %s", section, str(e))
+            restart.add(section)
+    if restart:
+        logger.warning("Config changes to %s take effect after a restart", ", ".join(sorted(restart)))
+    return restart
+
+
+def create_app(vehicle_service=None):
+    api_settings = get_api_settings()
+    app = Flask(__name__)
+    # Read by the ASGI front end, whose native routes bypass flask-cors
+    app.config['VEHICLE_CORS'] = api_settings.get("cors", True)
+    if app.config['VEHICLE_CORS']:
+        # Imported only when enabled
+        from flask_cors import CORS
+        CORS(app)
+    app.extensions['vehicle_service'] = vehicle_service or build_vehicle_service()
+    app.config['MAX_CHANGE_STREAMS'] = api_settings.get("max_change_streams", DEFAULT_MAX_CHANGE_STREAMS)
+    app.extensions['vehicle_change_streams'] = threading.BoundedSemaphore(app.config['MAX_CHANGE_STREAMS'])
+    app.config['MAX_BULK_ROWS'] = api_settings.get("max_bulk_rows", DEFAULT_MAX_BULK_ROWS)
+    app.register_blueprint(vehicle_api)
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request_metrics)
+    app.teardown_request(_clear_request_id)
+    compressor = create_compressor(get_compression_settings())
+    if compressor is not None:
+        app.extensions['vehicle_compressor'] = compressor
+        app.after_request(compressor)
+    if api_settings.get("swagger", True):
+        app.wsgi_app = app.extensions['vehicle_docs'] = LazySwaggerDocs(app)
+
+    hot_reload = get_hot_reload_settings()
+    if vehicle_service is None and hot_reload.get("enabled", False):
+        # Only a service built from the config file follows it. Under
+        # gunicorn's preload_app this runs in the master; the watcher restarts
+        # its thread in each forked worker (see config_watcher).
+        service = app.extensions['vehicle_service']
+        watcher = ConfigWatcher(interval=hot_reload.get("interval", 2.0))
+        watcher.listeners.append(lambda config, changed: apply_config(service, config, changed))
+        app.extensions['vehicle_config_watcher'] = watcher.start()
+    return app
 
-# Dependency Injection
-connection_string = get_db_connection_string()
-db_context = DatabaseContext(connection_string)
-vehicle_repo = VehicleRepository(db_context)
-vehicle_service = VehicleService(vehicle_repo)
 
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_id_token = request_id_var.set(g.request_id)
 
-@app.route('/api/vehicle-details', methods=['POST'])
+
+def _record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if 'request_start' in g:
+        REGISTRY.observe("http_request_duration_seconds", "Time to handle a request, by route",
+                         time.perf_counter() - g.request_start,
+                         method=request.method, route=route, status=response.status_code)
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def _clear_request_id(error=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+
+def warmup(app, swagger=True, connections=True):
+    # Pay one-off startup costs before the first request instead of during it
+    if swagger and 'vehicle_docs' in app.extensions:
+        app.extensions['vehicle_docs'].build_specs()
+        logger.info("Swagger spec generated")
+    if connections:
+        try:
+            app.extensions['vehicle_service'].repo.db_context.pool.prefill()
+        except Exception as e:
+            logger.warning("Connection pool warmup failed: %s", str(e))
+
+
+@vehicle_api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus metrics
+    ---
+    tags:
+      - Monitoring
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Latency histograms with p50/p95/p99, pool, cache, circuit breaker and logging counters
+    """
+    service = _vehicle_service()
+    gauges = []
+    pool = service.repo.db_context.pool.metrics()
+    gauges.append(("vehicle_db_pool_connections", "Pooled connections by state", "gauge",
+                   [({"state": "in_use"}, pool["in_use"]), ({"state": "idle"}, pool["idle"])]))
+    gauges.append(("vehicle_db_pool_max_size", "Configured pool size", "gauge", [({}, pool["max_size"])]))
+    for name in ("checkouts", "waits", "timeouts", "created", "discarded"):
+        gauges.append((f"vehicle_db_pool_{name}_total", f"Pool {name}", "counter", [({}, pool[name])]))
+    gauges.append(("vehicle_db_pool_wait_seconds_total", "Total time spent waiting for a connection", "counter",
+                   [({}, pool["wait_time_total"])]))
+
+    cache = service.cache_stats()
+    if cache:
+        for name in ("hits", "misses", "evictions", "invalidations", "stale_hits"):
+            gauges.append((f"vehicle_cache_{name}_total", f"Vehicle cache {name}", "counter",
+                           [({"backend": cache["backend"]}, cache[name])]))
+
+    write_buffer = service.write_buffer_stats()
+    if write_buffer:
+        gauges.append(("vehicle_write_behind_pending", "Updates waiting in the write-behind buffer", "gauge",
+                       [({}, write_buffer["pending"])]))
+        for name in ("coalesced", "flushes", "flushed", "failures", "rejected"):
+            gauges.append((f"vehicle_write_behind_{name}_total", f"Write-behind {name}", "counter",
+                           [({}, write_buffer[name])]))
+
+    resilience = service.resilience_stats()
+    if resilience:
+        gauges.append(("vehicle_db_circuit_state", "Database circuit breaker state (1 for the current one)", "gauge",
+                       [({"state": state}, int(resilience["state"] == state)) for state in CircuitBreaker.STATES]))
+        gauges.append(("vehicle_db_circuit_consecutive_failures", "Transient database failures in a row", "gauge",
+                       [({}, resilience["consecutive_failures"])]))
+        for name in ("failures", "rejected", "opened", "retries"):
+            gauges.append((f"vehicle_db_circuit_{name}_total", f"Database circuit breaker {name}", "counter",
+                           [({}, resilience[name])]))
+
+    gauges.append(("vehicle_log_records_dropped_total", "Log records dropped because the queue was full",
+                   "counter", [({}, logging_stats()["dropped"])]))
+    return Response(REGISTRY.render(gauges), mimetype='text/plain; version=0.0.4')
+
+
+@vehicle_api.route('/api/vehicle-details', methods=['POST'])
 def post_vehicle_details():
     """
     Add a new vehicle
@@ -54,21 +316,402 @@ def post_vehicle_details():
     responses:
       201:
         description: Vehicle added successfully
+      400:
+        description: Bad request (payload failed validation)
       409:
         description: Conflict - Vehicle already exists
+      503:
+        description: Database unavailable (see Retry-After)
     """
     try:
         details = request.json
-        logger.info("POST /VehicleDetails called with: %s", details)
-        vehicle_service.vehicle_details(details)
+        logger.debug("POST /VehicleDetails called with: %s", details)
+        _vehicle_service().vehicle_details(details)
         logger.info("Vehicle created successfully.")
         return jsonify({"message": "Success"}), 201
+    except ValidationError as e:
+        logger.warning("POST /VehicleDetails rejected: %s", str(e))
+        return jsonify({"error": str(e), "fields": e.errors}), 400
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
     except Exception as e:
         logger.error("POST /VehicleDetails error: %s", str(e))
         return jsonify({"error": str(e)}), 409
 
 
-@app.route('/api/vehicle-details', methods=['GET'])
+@vehicle_api.route('/api/vehicle-details/bulk', methods=['POST'])
+def post_bulk_vehicle_details():
+    """
+    Add many vehicles in one request
+    ---
+    tags:
+      - Vehicle API
+    consumes:
+      - application/json
+      - application/x-ndjson
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: JSON array of vehicles, or one vehicle object per line (NDJSON)
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              vehicle_no:
+                type: string
+                example: "TEST123"
+              no_of_safety_check:
+                type: integer
+                example: 3
+              isCompleted:
+                type: boolean
+                example: true
+    responses:
+      200:
+        description: Per-row status (created, duplicate or invalid)
+      400:
+        description: Bad request (body is not a JSON array or NDJSON)
+      413:
+        description: More rows than Api.max_bulk_rows
+      503:
+        description: Database unavailable (see Retry-After)
+    """
+    try:
+        max_rows = current_app.config['MAX_BULK_ROWS']
+        if 'ndjson' in (request.mimetype or ''):
+            # Read line by line, stopping one row past the limit
+            records = _parse_ndjson(request.stream, max_rows + 1)
+        else:
+            records = request.get_json(silent=True)
+            if not isinstance(records, list):
+                logger.warning("POST /BulkVehicleDetails called without a JSON array")
+                return jsonify({"error": "Request body must be a JSON array or NDJSON"}), 400
+        if len(records) > max_rows:
+            logger.warning("POST /BulkVehicleDetails rejected: more than %d rows", max_rows)
+            return jsonify({"error": f"At most {max_rows} rows per request"}), 413
+
+        logger.info("POST /BulkVehicleDetails called with %d rows", len(records))
+        results = _vehicle_service().bulk_vehicle_details(records)
+        summary = {status: 0 for status in ("created", "duplicate", "invalid")}
+        for result in results:
+            summary[result["status"]] += 1
+        logger.info("Bulk create finished: %s", summary)
+        return jsonify(dict(summary, results=results))
+
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
+    except Exception as e:
+        logger.error("POST /BulkVehicleDetails error: %s", str(e))
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@vehicle_api.route('/api/vehicle-details/lookup', methods=['POST'])
+def lookup_vehicle_details():
+    """
+    Look up many vehicles by vehicle number
+    ---
+    tags:
+      - Vehicle API
+    consumes:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: JSON array of vehicle numbers (up to 10000)
+        schema:
+          type: array
+          items:
+            type: string
+            example: "TEST123"
+    responses:
+      200:
+        description: Per-plate status (found with the vehicle, missing or invalid)
+      400:
+        description: Bad request (body is not a JSON array, or too many plates)
+      503:
+        description: Database unavailable (see Retry-After)
+    """
+    return _batch_by_plate("POST /LookupVehicleDetails", _vehicle_service().lookup_vehicles,
+                           ("found", "missing", "invalid"))
+
+
+@vehicle_api.route('/api/vehicle-details/batch', methods=['DELETE'])
+def delete_vehicle_details_batch():
+    """
+    Delete many vehicles in one transaction
+    ---
+    tags:
+      - Vehicle API
+    consumes:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: JSON array of vehicle numbers (up to 10000)
+        schema:
+          type: array
+          items:
+            type: string
+            example: "TEST123"
+    responses:
+      200:
+        description: Per-plate status (deleted, missing or invalid)
+      400:
+        description: Bad request (body is not a JSON array, or too many plates)
+      503:
+        description: Database unavailable (see Retry-After)
+    """
+    return _batch_by_plate("DELETE /BatchDeleteVehicleDetails", _vehicle_service().delete_vehicles,
+                           ("deleted", "missing", "invalid"))
+
+
+def _batch_by_plate(name, operation, statuses):
+    try:
+        vehicle_nos = request.get_json(silent=True)
+        logger.info("%s called with %s plates", name, len(vehicle_nos) if isinstance(vehicle_nos, list) else "no")
+        results = operation(vehicle_nos)
+    except ValueError as e:
+        logger.warning("%s rejected: %s", name, str(e))
+        return jsonify({"error": str(e)}), 400
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
+    except Exception as e:
+        logger.error("%s error: %s", name, str(e))
+        return jsonify({"error": "Internal server error"}), 500
+
+    summary = {status: 0 for status in statuses}
+    for result in results:
+        summary[result["status"]] += 1
+    logger.info("%s finished: %s", name, summary)
+    return _json_response(dict(summary, results=results))
+
+
+def _parse_ndjson(lines, max_records):
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # Unparseable lines are reported back as invalid rows
+            records.append(None)
+        if len(records) == max_records:
+            break
+    return records
+
+
+@vehicle_api.route('/api/vehicle-details/export', methods=['GET'])
+def export_vehicle_details():
+    """
+    Stream every vehicle as NDJSON or CSV
+    ---
+    tags:
+      - Vehicle API
+    produces:
+      - application/x-ndjson
+      - text/csv
+    parameters:
+      - in: query
+        name: format
+        schema:
+          type: string
+          enum: [ndjson, csv]
+        required: false
+        description: Export format (default ndjson)
+    responses:
+      200:
+        description: Streamed vehicle rows
+      304:
+        description: Not modified since the ETag sent in If-None-Match
+      400:
+        description: Bad request (unsupported format)
+      503:
+        description: Database unavailable (see Retry-After)
+    """
+    return _conditional(_version_tag(), _export_vehicle_details)
+
+
+def _export_vehicle_details():
+    export_format = request.args.get('format', 'ndjson').lower()
+    try:
+        logger.info("GET /ExportVehicleDetails called with format: %s", export_format)
+        chunks = _vehicle_service().export_vehicles(export_format)
+    except ValueError as e:
+        logger.warning("GET /ExportVehicleDetails rejected: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
+    except Exception as e:
+        logger.error("GET /ExportVehicleDetails error: %s", str(e))
+        return jsonify({"error": "Internal server error"}), 500
+
+    if export_format == 'csv':
+        return Response(stream_with_context(chunks), mimetype='text/csv',
+                        headers={"Content-Disposition": "attachment; filename=vehicle-details.csv"})
+    return Response(stream_with_context(chunks), mimetype='application/x-ndjson')
+
+
+@vehicle_api.route('/api/vehicle-details/stats', methods=['GET'])
+def get_vehicle_stats():
+    """
+    Fleet statistics
+    ---
+    tags:
+      - Vehicle API
+    parameters:
+      - in: query
+        name: prefix_length
+        schema:
+          type: integer
+        required: false
+        description: Also group the statistics by the first 1-4 characters of vehicle_no
+    responses:
+      200:
+        description: Totals, completion rate and no_of_safety_check distribution with p50/p90/p95/p99
+      304:
+        description: Not modified since the ETag sent in If-None-Match
+      400:
+        description: Bad request (invalid prefix_length)
+      503:
+        description: Database unavailable (see Retry-After)
+    """
+    return _conditional(_version_tag(), _fetch_vehicle_stats)
+
+
+def _fetch_vehicle_stats():
+    try:
+        prefix_length = request.args.get('prefix_length', type=int)
+        if 'prefix_length' in request.args and prefix_length is None:
+            raise ValueError("prefix_length must be an integer")
+        logger.info("GET /VehicleStats called with prefix_length: %s", prefix_length)
+        stats = _vehicle_service().get_vehicle_stats(prefix_length)
+    except ValueError as e:
+        logger.warning("GET /VehicleStats rejected: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
+    except Exception as e:
+        logger.error("GET /VehicleStats error: %s", str(e))
+        return jsonify({"error": "Internal server error"}), 500
+    return _json_response(stats)
+
+
+@vehicle_api.route('/api/vehicle-details/changes', methods=['GET'])
+def get_vehicle_changes():
+    """
+    Inserts, updates and deletes since a sequence number
+    ---
+    tags:
+      - Vehicle API
+    produces:
+      - application/json
+      - text/event-stream
+    parameters:
+      - in: query
+        name: since
+        schema:
+          type: integer
+        required: false
+        description: Return changes after this seq (default 0, use next_since)
+      - in: query
+        name: limit
+        schema:
+          type: integer
+        required: false
+        description: Maximum changes to return (1-1000)
+      - in: query
+        name: wait
+        schema:
+          type: integer
+        required: false
+        description: Long poll - seconds to wait for a change when there is none yet (0-60)
+      - in: header
+        name: Last-Event-ID
+        schema:
+          type: string
+        required: false
+        description: With Accept text/event-stream, resume after this seq
+    responses:
+      200:
+        description: Changes with next_since, or a Server-Sent Events stream of changes
+      400:
+        description: Bad request (invalid since, limit or wait)
+      503:
+        description: Database unavailable, or too many waiting subscribers (see Retry-After)
+    """
+    stream = request.accept_mimetypes.best == 'text/event-stream'
+    slots = None
+    try:
+        since, limit, wait = (request.args.get(arg, type=int) for arg in ('since', 'limit', 'wait'))
+        for arg, value in (('since', since), ('limit', limit), ('wait', wait)):
+            if arg in request.args and value is None:
+                raise ValueError(f"{arg} must be an integer")
+        if stream and request.headers.get('Last-Event-ID', '').isdigit():
+            since = int(request.headers['Last-Event-ID'])
+        since, wait = since or 0, wait or 0
+        logger.info("GET /VehicleChanges called: since=%s, limit=%s, wait=%s, stream=%s", since, limit, wait, stream)
+        service = _vehicle_service()
+        if stream or wait:
+            slots = current_app.extensions['vehicle_change_streams']
+            if not slots.acquire(blocking=False):
+                slots = None
+                return _change_streams_busy()
+        if stream:
+            # Validated up front so a bad request gets a 400, not a broken stream
+            service.get_changes(since, limit)
+            response = Response(_change_events(service, since, limit), mimetype='text/event-stream',
+                                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+            # The slot is held until the server closes the stream
+            response.call_on_close(slots.release)
+            slots = None
+            return response
+        changes, next_since = service.get_changes(since, limit, wait)
+    except ValueError as e:
+        logger.warning("GET /VehicleChanges rejected: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
+    except Exception as e:
+        logger.error("GET /VehicleChanges error: %s", str(e))
+        return jsonify({"error": "Internal server error"}), 500
+    finally:
+        if slots is not None:
+            slots.release()
+
+    logger.info("Returning changes. Count: %d", len(changes))
+    return _json_response({"changes": changes, "next_since": next_since})
+
+
+def _change_streams_busy():
+    logger.warning("GET /VehicleChanges rejected: too many waiting subscribers")
+    response = jsonify({"error": "Too many change feed subscribers, try again later"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(math.ceil(CHANGE_STREAM_RETRY_MS / 1000))
+    return response
+
+
+def _change_events(service, since, limit):
+    # Bounded so worker threads are recycled; EventSource clients reconnect
+    # on their own and resume from Last-Event-ID
+    deadline = time.monotonic() + CHANGE_STREAM_SECONDS
+    yield f"retry: {CHANGE_STREAM_RETRY_MS}\n\n"
+    try:
+        while (remaining := deadline - time.monotonic()) > 0:
+            changes, since = service.get_changes(since, limit, int(min(CHANGE_KEEPALIVE_SECONDS, remaining)))
+            if not changes:
+                yield ": keepalive\n\n"
+            for change in changes:
+                yield f"id: {change['seq']}\nevent: change\ndata: {dumps(change).decode()}\n\n"
+    except Exception as e:
+        logger.error("GET /VehicleChanges stream error: %s", str(e))
+
+
+@vehicle_api.route('/api/vehicle-details', methods=['GET'])
 def get_all_vehicle_details():
     """
     Fetch vehicle(s) by vehicle number or get all
@@ -82,34 +725,127 @@ def get_all_vehicle_details():
           type: string
         required: false
         description: Vehicle number to fetch
+      - in: query
+        name: match
+        schema:
+          type: string
+          enum: [exact, prefix, contains, fuzzy]
+        required: false
+        description: How vehicle_no is matched (default prefix)
+      - in: query
+        name: limit
+        schema:
+          type: integer
+        required: false
+        description: Page size for keyset pagination, or maximum search results (1-1000)
+      - in: query
+        name: after
+        schema:
+          type: string
+        required: false
+        description: Cursor - return vehicles after this vehicle_no (use next_cursor)
+      - in: query
+        name: fields
+        schema:
+          type: string
+        required: false
+        description: Comma-separated list of fields to return
     responses:
       200:
-        description: Vehicle(s) found
+        description: Vehicle(s) found, or a page with items and next_cursor
+      304:
+        description: Not modified since the ETag sent in If-None-Match
+      400:
+        description: Bad request (invalid limit or fields)
       404:
         description: Vehicle not found
+      503:
+        description: Database unavailable (see Retry-After)
     """
+    vehicle_no = request.args.get('vehicle_no')
+    exact = bool(vehicle_no) and request.args.get('match', '').lower() == 'exact'
+    listing = bool(vehicle_no) and not any(arg in request.args for arg in ('match', 'limit'))
+    g.vehicle_encoding = media_type = _vehicle_encoding()
+    # One row's version validates an exact lookup; anything wider uses the
+    # table counter, taken with the cached rows for a prefix listing
+    tag = _version_tag(vehicle_no if exact or listing else None, prefix=listing)
+    if tag is not None and media_type != JSON:
+        tag = f"{tag}-{ETAG_SUFFIXES[media_type]}"
+    response = _conditional(tag, _fetch_vehicle_details)
+    response.vary.add('Accept')
+    return response
+
+
+def _fetch_vehicle_details():
     try:
         vehicle_no = request.args.get('vehicle_no')
+        if not vehicle_no and any(arg in request.args for arg in ('limit', 'after', 'fields')):
+            return _get_vehicle_page()
+        if vehicle_no and any(arg in request.args for arg in ('match', 'limit')):
+            return _search_vehicles(vehicle_no)
+
         logger.info("GET /FetchAllVehicleDetails called with vehicle_no: %s", vehicle_no)
-        result = vehicle_service.get_all_vehicle_details(vehicle_no)
+        result = _vehicle_service().get_all_vehicle_details(vehicle_no)
 
         if result is None:
             logger.warning("Vehicle not found: %s", vehicle_no)
             return jsonify({"error": "Vehicle not found"}), 404
 
-        if isinstance(result, list):
+        if isinstance(result, (list, VehicleRows)):
             logger.info("Returning all vehicles. Count: %d", len(result))
-            return jsonify([v.__dict__ for v in result])
+            return _vehicle_response(result)
         
         logger.info("Returning vehicle: %s", result.vehicle_no)
-        return jsonify(result.__dict__)
+        return _vehicle_response(result)
     
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
     except Exception as e:
         logger.error("GET /FetchAllVehicleDetails error: %s", str(e))
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route('/api/vehicle-details', methods=['PUT'])
+def _search_vehicles(vehicle_no):
+    try:
+        match = request.args.get('match', 'prefix').lower()
+        limit = request.args.get('limit', type=int)
+        if 'limit' in request.args and limit is None:
+            raise ValueError("limit must be an integer")
+        logger.info("GET /FetchAllVehicleDetails search: %s match=%s limit=%s", vehicle_no, match, limit)
+        result = _vehicle_service().search_vehicles(vehicle_no, match, limit)
+    except ValueError as e:
+        logger.warning("GET /FetchAllVehicleDetails rejected: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+
+    if result is None:
+        logger.warning("Vehicle not found: %s", vehicle_no)
+        return jsonify({"error": "Vehicle not found"}), 404
+    if isinstance(result, list):
+        logger.info("Returning search results. Count: %d", len(result))
+        return _vehicle_response(result)
+    logger.info("Returning vehicle: %s", result.vehicle_no)
+    return _vehicle_response(result)
+
+
+def _get_vehicle_page():
+    try:
+        limit = request.args.get('limit', type=int)
+        if 'limit' in request.args and limit is None:
+            raise ValueError("limit must be an integer")
+        fields = request.args.get('fields')
+        fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+        after = request.args.get('after') or None
+        logger.info("GET /FetchAllVehicleDetails page called: after=%s, limit=%s, fields=%s", after, limit, fields)
+        items, next_cursor = _vehicle_service().get_vehicle_page(limit, after, fields)
+    except ValueError as e:
+        logger.warning("GET /FetchAllVehicleDetails rejected: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+
+    logger.info("Returning vehicle page. Count: %d", len(items))
+    return _vehicle_response({"items": items, "next_cursor": next_cursor}, fields)
+
+
+@vehicle_api.route('/api/vehicle-details', methods=['PUT'])
 def update_vehicle_details():
     """
     Update an existing vehicle
@@ -119,6 +855,18 @@ def update_vehicle_details():
     consumes:
       - application/json
     parameters:
+      - in: query
+        name: upsert
+        schema:
+          type: boolean
+        required: false
+        description: Create the vehicle if it does not exist yet
+      - in: header
+        name: If-Match
+        schema:
+          type: string
+        required: false
+        description: ETag from an exact GET; the update only applies to that version
       - in: body
         name: body
         required: true
@@ -141,28 +889,51 @@ def update_vehicle_details():
     responses:
       200:
         description: Vehicle updated successfully
+      400:
+        description: Bad request (payload failed validation)
       404:
         description: Vehicle not found
+      412:
+        description: The vehicle no longer matches the version in If-Match
+      503:
+        description: Database unavailable (see Retry-After)
     """
     try:
-        data = request.json
-        logger.info("PUT /UpdateVehicleDetails called with: %s", data)
-        vehicle = entity.Vehicle(data.get('vehicle_no'), data.get('no_of_safety_check'), data.get('isCompleted'))
-        success = vehicle_service.update_vehicle_details(vehicle)
+        data = request.get_json(silent=True)
+        upsert = request.args.get('upsert', 'false').lower() == 'true'
+        logger.debug("PUT /UpdateVehicleDetails called with: %s (upsert=%s)", data, upsert)
+        vehicle = vehicle_validator.to_vehicle(data)
+        expected_version = _expected_version()
+        success = _vehicle_service().update_vehicle_details(vehicle, upsert=upsert, expected_version=expected_version)
 
         if success:
             logger.info("Vehicle updated successfully: %s", vehicle.vehicle_no)
-            return jsonify({"message": "Vehicle updated successfully"})
+            response = jsonify({"message": "Vehicle updated successfully"})
+            if expected_version is not None:
+                # A conditional update moves the row exactly one version on
+                response.set_etag(f"v{expected_version + 1}")
+            return response
 
         logger.warning("Vehicle not found or update failed: %s", vehicle.vehicle_no)
         return jsonify({"error": "Vehicle not found or update failed"}), 404
 
+    except ValidationError as e:
+        logger.warning("PUT /UpdateVehicleDetails rejected: %s", str(e))
+        return jsonify({"error": str(e), "fields": e.errors}), 400
+    except VersionConflictError as e:
+        logger.warning("PUT /UpdateVehicleDetails precondition failed: %s", str(e))
+        return jsonify({"error": str(e)}), 412
+    except ValueError as e:
+        logger.warning("PUT /UpdateVehicleDetails rejected: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
     except Exception as e:
         logger.error("PUT /UpdateVehicleDetails error: %s", str(e))
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route('/api/vehicle-details', methods=['DELETE'])
+@vehicle_api.route('/api/vehicle-details', methods=['DELETE'])
 def delete_vehicle_details():
     """
     Delete a vehicle by vehicle number
@@ -183,6 +954,8 @@ def delete_vehicle_details():
         description: Bad request (missing vehicle_no)
       404:
         description: Vehicle not found
+      503:
+        description: Database unavailable (see Retry-After)
     """
     try:
         vehicle_no = request.args.get('vehicle_no')
@@ -191,7 +964,7 @@ def delete_vehicle_details():
             return jsonify({"error": "vehicle_no query parameter is required"}), 400
 
         logger.info("DELETE /DeleteVehicleDetails called for: %s", vehicle_no)
-        success = vehicle_service.delete_vehicle(vehicle_no)
+        success = _vehicle_service().delete_vehicle(vehicle_no)
 
         if success:
             logger.info("Vehicle deleted: %s", vehicle_no)
@@ -200,10 +973,29 @@ def delete_vehicle_details():
         logger.warning("Vehicle not found or deletion failed: %s", vehicle_no)
         return jsonify({"error": "Vehicle not found or deletion failed"}), 404
 
+    except DatabaseUnavailableError as e:
+        return _unavailable(e)
     except Exception as e:
         logger.error("DELETE /DeleteVehicleDetails error: %s", str(e))
         return jsonify({"error": "Internal server error"}), 500
 
 
+_default_app = None
+_default_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # The module-level app is built on first access rather than at import
+    global _default_app
+    if name not in ('app', 'vehicle_service'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+    if name == 'app':
+        return _default_app
+    return _default_app.extensions['vehicle_service']
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,371 @@
+import asyncio
+import contextvars
+import io
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from logger_config import request_id_var, setup_logger
+from metrics import REGISTRY
+from resilience import DatabaseUnavailableError
+from serialization import JSON, dumps, vehicle_media_types
+from validation import ValidationError, vehicle_validator
+
+logger = setup_logger(__name__)
+
+VEHICLE_ROUTE = '/api/vehicle-details'
+CHANGES_ROUTE = '/api/vehicle-details/changes'
+CONDITIONAL_HEADERS = {b'if-none-match', b'if-match'}
+
+
+class VehicleASGIApp:
+    """ASGI front end for the vehicle API.
+
+    The CRUD verbs on /api/vehicle-details are handled natively: the event
+    loop parses requests and only the blocking service call is offloaded to a
+    bounded thread pool, so concurrent requests overlap their database waits.
+    Every other route is served by the Flask app through a WSGI bridge on the
+    same executor, except the change feed: its long polls and streams wait
+    for minutes, so they get a separate executor and never hold the threads
+    sized to the connection pool.
+    """
+
+    def __init__(self, service, wsgi_app, max_workers=10, compressor=None, max_change_streams=2, cors=False):
+        self.service = service
+        self.wsgi_app = wsgi_app
+        self.compressor = compressor
+        self.cors = cors
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vehicle-db")
+        # The Flask route caps waiting subscribers at max_change_streams; the
+        # spare threads answer plain polls and rejections while they wait
+        self.change_executor = ThreadPoolExecutor(max_workers=max_change_streams + 2,
+                                                  thread_name_prefix="vehicle-changes")
+        self.handlers = {
+            'GET': self._get,
+            'POST': self._post,
+            'PUT': self._put,
+            'DELETE': self._delete,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        body = await self._read_body(receive)
+        handler = self.handlers.get(scope['method']) if scope['path'] == VEHICLE_ROUTE else None
+        if handler is not None and any(name in CONDITIONAL_HEADERS for name, _ in scope.get('headers', [])):
+            # Preconditions are evaluated by the Flask routes
+            handler = None
+        if handler is not None and scope['method'] == 'GET' and self._wants_other_encoding(scope):
+            # So are the columnar and MessagePack encodings
+            handler = None
+        if handler is None:
+            executor = self.change_executor if scope['path'] == CHANGES_ROUTE else self.executor
+            await self._call_wsgi(scope, body, send, executor)
+            return
+
+        start = time.perf_counter()
+        headers = dict(scope.get('headers', []))
+        request_id = headers.get(b'x-request-id', b'').decode('latin-1') or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        try:
+            query = {key: values[-1] for key, values in parse_qs(scope['query_string'].decode()).items()}
+            try:
+                status, payload, *extra = await handler(query, body)
+            except DatabaseUnavailableError as e:
+                logger.error("ASGI %s %s database unavailable: %s", scope['method'], scope['path'], str(e))
+                status, payload, extra = 503, {"error": "Database unavailable, try again later"}, []
+            except Exception as e:
+                logger.error("ASGI %s %s error: %s", scope['method'], scope['path'], str(e))
+                status, payload, extra = 500, {"error": "Internal server error"}, []
+            await self._send_json(send, status, payload, request_id, *extra,
+                                  accept_encoding=headers.get(b'accept-encoding', b''), origin=headers.get(b'origin'))
+            REGISTRY.observe("http_request_duration_seconds", "Time to handle a request, by route",
+                             time.perf_counter() - start,
+                             method=scope['method'], route=VEHICLE_ROUTE, status=status)
+        finally:
+            request_id_var.reset(token)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                self.change_executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Carry the request ID (and other context) over to the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, lambda: context.run(func, *args, **kwargs))
+
+    def _wants_other_encoding(self, scope):
+        accept = dict(scope.get('headers', [])).get(b'accept')
+        if not accept:
+            return False
+        media_type = parse_accept_header(accept.decode('latin-1'), MIMEAccept).best_match(vehicle_media_types())
+        return media_type not in (None, JSON)
+
+    async def _send_json(self, send, status, payload, request_id=None, etag=None, accept_encoding=b'', origin=None):
+        body = dumps(payload)
+        headers = [(b'content-type', b'application/json')]
+        vary = []
+        if self.cors:
+            # What flask-cors sends with its defaults: any origin is allowed
+            headers.append((b'access-control-allow-origin', origin or b'*'))
+            if origin:
+                vary.append(b'Origin')
+        if self.compressor is not None and status == 200:
+            # Same negotiation, threshold and ETag suffix as the Flask hook
+            vary.append(b'Accept, Accept-Encoding')
+            coding = None
+            if len(body) >= self.compressor.min_size:
+                coding = self.compressor.choose(parse_accept_header(accept_encoding.decode('latin-1')))
+            if coding:
+                body = self.compressor.compress(body, coding)
+                headers.append((b'content-encoding', coding.encode()))
+                etag = f"{etag}-{coding}" if etag else etag
+        if vary:
+            headers.append((b'vary', b', '.join(vary)))
+        headers.append((b'content-length', str(len(body)).encode()))
+        if request_id:
+            headers.append((b'x-request-id', request_id.encode('latin-1')))
+        if etag:
+            headers.append((b'etag', f'"{etag}"'.encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # ---------------------------
+    # Native /api/vehicle-details handlers
+    # ---------------------------
+    async def _post(self, query, body):
+        try:
+            details = json.loads(body)
+            logger.debug("ASGI POST /VehicleDetails called with: %s", details)
+            await self._run(self.service.vehicle_details, details)
+            return 201, {"message": "Success"}
+        except ValidationError as e:
+            return 400, {"error": str(e), "fields": e.errors}
+        except DatabaseUnavailableError:
+            # Answered with 503 by the dispatcher, not as a conflict
+            raise
+        except Exception as e:
+            logger.error("ASGI POST /VehicleDetails error: %s", str(e))
+            return 409, {"error": str(e)}
+
+    def _version_tag(self, vehicle_no, prefix=False):
+        try:
+            if prefix:
+                return self.service.version_tag(vehicle_no, prefix=True)
+            return self.service.version_tag(vehicle_no)
+        except Exception as e:
+            logger.warning("ETag lookup failed, responding without one: %s", str(e))
+            return None
+
+    @staticmethod
+    def _int_arg(query, name):
+        # Same message as the Flask routes, not int()'s
+        if name not in query:
+            return None
+        try:
+            return int(query[name])
+        except ValueError:
+            raise ValueError(f"{name} must be an integer") from None
+
+    async def _get(self, query, body):
+        vehicle_no = query.get('vehicle_no')
+        exact = bool(vehicle_no) and query.get('match', '').lower() == 'exact'
+        listing = bool(vehicle_no) and not any(arg in query for arg in ('match', 'limit'))
+        # Read before the data, as in the Flask route
+        tag = await self._run(self._version_tag, vehicle_no if exact or listing else None, listing)
+        try:
+            limit = self._int_arg(query, 'limit')
+            if not vehicle_no and any(arg in query for arg in ('limit', 'after', 'fields')):
+                fields = [f.strip() for f in query['fields'].split(',') if f.strip()] if query.get('fields') else None
+                items, next_cursor = await self._run(self.service.get_vehicle_page, limit, query.get('after') or None, fields)
+                return 200, {"items": items, "next_cursor": next_cursor}, tag
+            if vehicle_no and any(arg in query for arg in ('match', 'limit')):
+                result = await self._run(self.service.search_vehicles, vehicle_no,
+                                         query.get('match', 'prefix').lower(), limit)
+            else:
+                result = await self._run(self.service.get_all_vehicle_details, vehicle_no)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+        if result is None:
+            return 404, {"error": "Vehicle not found"}
+        return 200, result, tag
+
+    async def _put(self, query, body):
+        upsert = query.get('upsert', 'false').lower() == 'true'
+        try:
+            vehicle = vehicle_validator.to_vehicle(json.loads(body) if body else None)
+            success = await self._run(self.service.update_vehicle_details, vehicle, upsert=upsert)
+        except ValidationError as e:
+            return 400, {"error": str(e), "fields": e.errors}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        if success:
+            return 200, {"message": "Vehicle updated successfully"}
+        return 404, {"error": "Vehicle not found or update failed"}
+
+    async def _delete(self, query, body):
+        vehicle_no = query.get('vehicle_no')
+        if not vehicle_no:
+            return 400, {"error": "vehicle_no query parameter is required"}
+        if await self._run(self.service.delete_vehicle, vehicle_no):
+            return 200, {"message": "Vehicle deleted successfully"}
+        return 404, {"error": "Vehicle not found or deletion failed"}
+
+    # ---------------------------
+    # WSGI bridge for the remaining routes
+    # ---------------------------
+    def _environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = 'HTTP_' + name
+                environ[key] = environ[key] + ',' + value if key in environ else value
+        return environ
+
+    async def _call_wsgi(self, scope, body, send, executor=None):
+        loop = asyncio.get_running_loop()
+        # Bounded so a slow client applies back-pressure to streamed responses
+        queue = asyncio.Queue(maxsize=16)
+        cancelled = []
+        environ = self._environ(scope, body)
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def run():
+            # The whole response is produced on one worker thread, which keeps
+            # Flask's streaming request context on the thread that pushed it.
+            response = {}
+
+            def start_response(status, headers, exc_info=None):
+                response['status'] = int(status.split(' ', 1)[0])
+                response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+            try:
+                result = self.wsgi_app(environ, start_response)
+                started = False
+                try:
+                    for chunk in result:
+                        if cancelled:
+                            break
+                        if not started:
+                            put(('start', response))
+                            started = True
+                        if chunk:
+                            put(('body', chunk))
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+                if not started:
+                    put(('start', response))
+                put(('end', None))
+            except BaseException as e:
+                logger.error("ASGI WSGI bridge error: %s", str(e))
+                put(('error', e))
+
+        future = loop.run_in_executor(executor or self.executor, run)
+        started = False
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == 'start':
+                    started = True
+                    await send({'type': 'http.response.start', 'status': value['status'],
+                                'headers': value['headers']})
+                elif kind == 'body':
+                    await send({'type': 'http.response.body', 'body': value, 'more_body': True})
+                elif kind == 'end':
+                    await send({'type': 'http.response.body', 'body': b''})
+                    break
+                else:
+                    if not started:
+                        await self._send_json(send, 500, {"error": "Internal server error"})
+                    break
+        except BaseException:
+            cancelled.append(True)
+            # Drain so the worker thread is never left blocked on a full queue
+            while not future.done():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.01)
+            raise
+        await future
+
+
+def create_asgi_app(flask_app, service, max_workers=None):
+    db_context = getattr(service.repo, 'db_context', None)
+    if max_workers is None:
+        # Offloading more calls than there are pooled connections only queues
+        # them on the pool instead of the executor.
+        max_workers = db_context.pool.max_size if db_context is not None else 10
+    logger.info("ASGI app using %d executor workers", max_workers)
+    return VehicleASGIApp(service, flask_app, max_workers, compressor=flask_app.extensions.get('vehicle_compressor'),
+                          max_change_streams=flask_app.config.get('MAX_CHANGE_STREAMS', 2),
+                          cors=flask_app.config.get('VEHICLE_CORS', False))
+
+
+_application = None
+
+
+def __getattr__(name):
+    # Built on first access (by the ASGI server) rather than at import
+    global _application
+    if name != 'application':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _application is None:
+        from app import create_app, warmup
+        flask_app = create_app()
+        warmup(flask_app)
+        _application = create_asgi_app(flask_app, flask_app.extensions['vehicle_service'])
+    return _application
@@ -0,0 +1,57 @@
+"""Cold-start cost of a worker: importing app, the first API request and the first docs request.
+
+Each run is a fresh interpreter on the in-memory backend, so nothing is
+shared with earlier runs apart from the OS file cache. Prints the median
+of --runs as JSON:
+
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/api/vehicle-details?vehicle_no=COLD1')
+first_request = time.perf_counter()
+client.get('/apispec_1.json')
+first_docs = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_request_ms": (first_request - imported) * 1000,
+                  "first_docs_ms": (first_docs - first_request) * 1000}))
+"""
+# Keep the probe off the configured database, the console and the config watcher
+PROBE_ENV = {"VEHICLE_API_DBENGINE": "memory", "VEHICLE_API_LOGGING__CONSOLE": "false",
+             "VEHICLE_API_HOTRELOAD__ENABLED": "false"}
+
+
+def probe(directory):
+    env = dict(os.environ, PYTHONPATH=ROOT, **PROBE_ENV)
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=directory, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmark(runs=5):
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        # Log files land in the temporary directory, not the working tree
+        samples = [probe(directory) for _ in range(runs)]
+    return {key: round(sorted(sample[key] for sample in samples)[runs // 2], 1) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps({"runs": args.runs, "results": run_benchmark(args.runs)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""Load test for the /api/vehicle-details CRUD paths.
+
+Seeds a SQLite database with N vehicles, then exercises every verb at the
+given concurrency against either the Flask test client or a live local
+server, and reports throughput and latency percentiles as JSON:
+
+    python -m benchmarks.crud --rows 1000 --concurrency 8
+    python -m benchmarks.crud --rows 100000 --target server --baseline benchmarks/baseline.json
+
+With --baseline the run fails (exit code 1) when any scenario's throughput
+drops, or its p95 latency grows, by more than --tolerance compared with
+the stored results for the same target/rows/concurrency.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROW_PRESETS = {"1k": 1000, "100k": 100000, "1m": 1000000}
+SCENARIOS = ("post", "get_exact", "get_prefix", "get_page", "put", "delete")
+
+
+def _plate(index):
+    return f"BM{index:07d}"
+
+
+def build_service(directory, rows):
+    from businessLayer import VehicleService
+    from databaseLayer import VehicleRepository
+    from db_backends import SqliteBackend
+    from db_context import DatabaseContext
+    from entity import Vehicle
+
+    db_context = DatabaseContext(SqliteBackend(os.path.join(directory, "bench.db")), max_size=32)
+    repo = VehicleRepository(db_context)
+    batch = []
+    for index in range(rows):
+        batch.append(Vehicle(_plate(index), index % 10, index % 2))
+        if len(batch) == 50000:
+            repo.insert_vehicles(batch)
+            batch = []
+    if batch:
+        repo.insert_vehicles(batch)
+    return VehicleService(repo)
+
+
+class ClientTarget:
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class ServerTarget:
+    def __init__(self, app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args):
+                pass
+
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        try:
+            headers = {}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers["Content-Type"] = "application/json"
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def _requests_for(scenario, rows, count, repeat=0):
+    rng = random.Random(f"{scenario}-{repeat}")
+    for i in range(count):
+        existing = _plate(rng.randrange(rows)) if rows else _plate(0)
+        new_plate = f"N{repeat:02d}{i:07d}"
+        if scenario == "post":
+            yield "POST", "/api/vehicle-details", {"vehicle_no": new_plate, "no_of_safety_check": 1, "isCompleted": False}, 201
+        elif scenario == "get_exact":
+            yield "GET", f"/api/vehicle-details?vehicle_no={existing}&match=exact", None, 200
+        elif scenario == "get_prefix":
+            yield "GET", f"/api/vehicle-details?vehicle_no={existing[:7]}&match=prefix&limit=20", None, 200
+        elif scenario == "get_page":
+            yield "GET", f"/api/vehicle-details?limit=100&after={existing}", None, 200
+        elif scenario == "put":
+            yield "PUT", "/api/vehicle-details", {"vehicle_no": existing, "no_of_safety_check": i, "isCompleted": True}, 200
+        elif scenario == "delete":
+            # Removes what the post scenario created
+            yield "DELETE", f"/api/vehicle-details?vehicle_no={new_plate}", None, 200
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(target, scenario, rows, requests, concurrency, repeat=0):
+    work = list(_requests_for(scenario, rows, requests, repeat))
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def one(item):
+        method, path, body, expected = item
+        start = time.perf_counter()
+        try:
+            status = target.request(method, path, body)
+        except Exception as e:
+            status = repr(e)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status != expected:
+                errors.append(status)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, work))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(work),
+        "errors": len(errors),
+        "throughput_rps": round(len(work) / wall, 2) if wall else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def _median_run(runs):
+    # Per-metric median over the repeats; one noisy run doesn't decide the result
+    merged = {}
+    for key in runs[0]:
+        values = sorted(run[key] for run in runs)
+        merged[key] = values[len(values) // 2]
+    merged["errors"] = sum(run["errors"] for run in runs)
+    merged["requests"] = sum(run["requests"] for run in runs)
+    return merged
+
+
+def run_benchmark(rows=1000, concurrency=4, requests=500, target="client", scenarios=SCENARIOS, repeat=3):
+    from app import create_app
+    from logger_config import configure_logging
+
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # Keep benchmark log output out of the working tree and off the console
+        os.chdir(directory)
+        try:
+            configure_logging({"console": False, "sample_rate": 0.0})
+            service = build_service(directory, rows)
+            app = create_app(service)
+            runner = ServerTarget(app) if target == "server" else ClientTarget(app)
+            try:
+                # Warm the pool, page cache and code paths before measuring
+                run_scenario(runner, "get_exact", rows, min(requests, 50), concurrency)
+                runs = {scenario: [] for scenario in scenarios}
+                for index in range(repeat):
+                    for scenario in scenarios:
+                        runs[scenario].append(run_scenario(runner, scenario, rows, requests, concurrency, index))
+                results = {scenario: _median_run(scenario_runs) for scenario, scenario_runs in runs.items()}
+            finally:
+                runner.close()
+                service.repo.db_context.close()
+        finally:
+            os.chdir(original_cwd)
+            configure_logging()
+    return {
+        "meta": {"target": target, "rows": rows, "concurrency": concurrency, "requests": requests,
+                 "repeat": repeat, "python": sys.version.split()[0]},
+        "results": results,
+    }
+
+
+def baseline_key(report):
+    meta = report["meta"]
+    return f"{meta['target']}-{meta['rows']}-c{meta['concurrency']}"
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    expected = baseline.get(baseline_key(report))
+    for scenario, result in report["results"].items():
+        if result["errors"]:
+            regressions.append(f"{scenario}: {result['errors']} unexpected responses")
+        reference = (expected or {}).get(scenario)
+        if not reference:
+            continue
+        if result["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {result['throughput_rps']} rps "
+                               f"< baseline {reference['throughput_rps']} rps")
+        if result["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {result['p95_ms']} ms > baseline {reference['p95_ms']} ms")
+    return regressions
+
+
+def _rows(value):
+    return ROW_PRESETS.get(value.lower()) or int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=_rows, default=1000, help="table size: 1k, 100k, 1m or a number")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--target", choices=("client", "server"), default="client")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the median is reported")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run in --baseline")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.rows, args.concurrency, args.requests, args.target,
+                           [s for s in args.scenarios.split(",") if s], max(1, min(args.repeat, 99)))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+
+    if not args.baseline:
+        return 0
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    if args.update_baseline:
+        baseline[baseline_key(report)] = report["results"]
+        with open(args.baseline, "w") as file:
+            file.write(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        return 0
+
+    regressions = compare(report, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION: " + regression, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
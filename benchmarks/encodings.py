@@ -0,0 +1,67 @@
+"""Payload size and client-side decode time of a full vehicle listing per encoding.
+
+Covers row-object JSON (the default), columnar JSON and MessagePack (when
+installed), each uncompressed and with every coding the server offers. The
+decode time includes decompression, as a client would pay it:
+
+    python -m benchmarks.encodings --rows 100000
+"""
+import argparse
+import gzip
+import json
+import time
+
+from compression import ResponseCompressor, available_codings, brotli
+from entity import Vehicle
+from serialization import COLUMNAR_JSON, JSON, MSGPACK, encode, msgpack, to_columns
+
+
+def best_time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _decoder(media_type, coding):
+    parse = msgpack.unpackb if media_type == MSGPACK else json.loads
+    if coding == "gzip":
+        return lambda body: parse(gzip.decompress(body))
+    if coding == "br":
+        return lambda body: parse(brotli.decompress(body))
+    return parse
+
+
+def run_benchmark(rows=100000, repeat=3):
+    vehicles = [Vehicle(f"KA{i:08d}", i % 10, i % 2) for i in range(rows)]
+    payloads = {JSON: encode(vehicles), COLUMNAR_JSON: encode(to_columns(vehicles))}
+    if msgpack is not None:
+        payloads[MSGPACK] = encode(vehicles, MSGPACK)
+    compressor = ResponseCompressor()
+    results = {}
+    for media_type, body in payloads.items():
+        for coding in (None,) + available_codings():
+            encoded = compressor.compress(body, coding) if coding else body
+            decode = _decoder(media_type, coding)
+            name = media_type + (f" + {coding}" if coding else "")
+            results[name] = {
+                "bytes": len(encoded),
+                "compress_seconds": round(best_time(lambda: compressor.compress(body, coding), repeat), 4)
+                if coding else 0.0,
+                "decode_seconds": round(best_time(lambda: decode(encoded), repeat), 4),
+            }
+    return {"rows": rows, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.rows, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
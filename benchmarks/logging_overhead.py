@@ -0,0 +1,84 @@
+"""Per-request logging overhead on the calling thread.
+
+Compares the original synchronous handlers with the queue-based pipeline
+from logger_config, with and without hot-path sampling:
+
+    python -m benchmarks.logging_overhead --requests 20000
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+
+from logger_config import NonBlockingQueueHandler, SamplingFilter
+
+# app.py, businessLayer.py and databaseLayer.py log this many lines per request
+LINES_PER_REQUEST = 5
+PAYLOAD = {"vehicle_no": "TEST1234", "no_of_safety_check": 3, "isCompleted": True}
+
+
+def _file_handlers(directory):
+    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    info_handler = logging.FileHandler(os.path.join(directory, "app.log"))
+    info_handler.setLevel(logging.INFO)
+    error_handler = logging.FileHandler(os.path.join(directory, "error.log"))
+    error_handler.setLevel(logging.ERROR)
+    console_handler = logging.StreamHandler(open(os.devnull, "w"))
+    console_handler.setLevel(logging.INFO)
+    handlers = [info_handler, error_handler, console_handler]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _measure(logger, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        for _ in range(LINES_PER_REQUEST):
+            logger.info("POST /VehicleDetails called with: %s", PAYLOAD)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def run(requests):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        logger = logging.getLogger("bench.sync")
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        handlers = _file_handlers(directory)
+        for handler in handlers:
+            logger.addHandler(handler)
+        results["sync_us_per_request"] = _measure(logger, requests)
+        for handler in handlers:
+            handler.close()
+
+        for mode, sample_rate in (("queue", 1.0), ("queue_sampled_10pct", 0.1)):
+            logger = logging.getLogger("bench." + mode)
+            logger.propagate = False
+            logger.setLevel(logging.DEBUG)
+            queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=requests * LINES_PER_REQUEST))
+            queue_handler.addFilter(SamplingFilter(sample_rate))
+            handlers = _file_handlers(directory)
+            listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+            listener.start()
+            logger.addHandler(queue_handler)
+            results[mode + "_us_per_request"] = _measure(logger, requests)
+            listener.stop()
+            for handler in handlers:
+                handler.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""CPU time and peak memory to serialise a full vehicle listing.
+
+Compares the original path (a __dict__-backed Vehicle per row, then
+jsonify over v.__dict__) with the slotted Vehicle + serialization.dumps
+used by the API today, and with encoding the cursor rows directly:
+
+    python -m benchmarks.serialization --rows 100000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from flask import Flask, jsonify
+
+from entity import Vehicle
+from serialization import dumps, encode_rows
+
+
+class DictVehicle:
+    def __init__(self, vehicle_no, no_of_safety_check, isCompleted):
+        self.vehicle_no = vehicle_no
+        self.no_of_safety_check = no_of_safety_check
+        self.isCompleted = isCompleted
+
+
+def measure(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_mb": round(peak / 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = [(f"KA{i:08d}", i % 10, i % 2) for i in range(args.rows)]
+    app = Flask(__name__)
+    with app.app_context():
+        results = {
+            "dict_vehicle_jsonify": measure(
+                lambda: jsonify([v.__dict__ for v in [DictVehicle(*row) for row in rows]]).get_data(), args.repeat),
+            "slotted_vehicle_dumps": measure(lambda: dumps([Vehicle(*row) for row in rows]), args.repeat),
+            "rows_encode_rows": measure(lambda: encode_rows(rows), args.repeat),
+        }
+    print(json.dumps({"rows": args.rows, "results": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,52 +1,496 @@
+import csv
+import io
+import math
+import threading
+import time
+from collections import defaultdict
+
 import entity
-import re
+from cache import MISSING
+from db_backends import VEHICLE_FIELDS
 from logger_config import setup_logger
+from resilience import DatabaseUnavailableError
+from search_index import NGramIndex
+from serialization import encode_rows_ndjson
+from validation import INVALID_VEHICLE_NO, vehicle_validator
 
 logger = setup_logger(__name__)
 
+EXPORT_FORMATS = ("ndjson", "csv")
+SEARCH_MODES = ("exact", "prefix", "contains", "fuzzy")
+DEFAULT_SEARCH_LIMIT = 50
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_CHANGE_WAIT = 60
+# Writes from other processes are only seen by re-reading the change counter
+CHANGE_POLL_INTERVAL = 1.0
+# Past this many missed changes, rebuilding the search index beats replaying them
+INDEX_REPLAY_LIMIT = 50000
+# How stale the search index may get with writes from other processes
+INDEX_REFRESH_INTERVAL = 1.0
+MAX_STATS_PREFIX = 4
+MAX_BATCH_PLATES = 10000
+CSV_BOOLEANS = {True: "true", False: "false", None: ""}
+STATS_PERCENTILES = (50, 90, 95, 99)
+
+
+def _summarize(histogram):
+    """Fleet statistics from (no_of_safety_check, isCompleted, count) rows."""
+    total = completed = 0
+    counts = defaultdict(int)
+    for checks, is_completed, count in histogram:
+        total += count
+        if is_completed:
+            completed += count
+        if checks is not None:
+            counts[checks] += count
+    distribution = sorted(counts.items())
+    recorded = sum(counts.values())
+    checks = {"count": recorded}
+    if recorded:
+        checks.update(min=distribution[0][0], max=distribution[-1][0],
+                      mean=round(sum(value * count for value, count in distribution) / recorded, 4))
+        # Nearest-rank percentiles, walked off the cumulative histogram
+        running, values = 0, iter(distribution)
+        for percentile in STATS_PERCENTILES:
+            rank = max(1, math.ceil(percentile / 100 * recorded))
+            while running < rank:
+                value, count = next(values)
+                running += count
+            checks[f"p{percentile}"] = value
+    checks["distribution"] = [{"value": value, "count": count} for value, count in distribution]
+    return {"total": total, "completed": completed, "pending": total - completed,
+            "completion_rate": round(completed / total, 4) if total else 0.0, "safety_checks": checks}
+
+
 class VehicleService:
-    def __init__(self, repo):
+    def __init__(self, repo, cache=None, search_index=None, validator=None, write_buffer=None):
         self.repo = repo
+        self.cache = cache
+        self.validator = validator or vehicle_validator
+        self.write_buffer = write_buffer
+        if write_buffer is not None:
+            # Cached reads taken while an update was buffered are stale once it lands
+            write_buffer.listeners.append(self._invalidate)
+        # Built from the table on the first contains/fuzzy search
+        self.search_index = search_index if search_index is not None else NGramIndex()
+        self._index_lock = threading.Lock()
+        self._index_generation = None
+        self._index_checked_at = 0.0
+        # Wakes change-feed waiters after a write made through this service
+        self._change_signal = threading.Condition()
+        self._change_generation = 0
 
-    def vehicle_details(self, details):
+    def _cache_key(self, vehicle_no):
+        # Plate lookups are case-insensitive in the database, so are the keys
+        return "rows:" + vehicle_no.upper()
+
+    def _invalidate(self, vehicle_nos):
+        with self._change_signal:
+            self._change_generation += 1
+            self._change_signal.notify_all()
+        if self.cache is None:
+            return
+        # A cached prefix result contains a vehicle exactly when the prefix
+        # is one of the vehicle's own prefixes, so those are the keys to drop.
+        keys = set()
+        for vehicle_no in vehicle_nos:
+            if isinstance(vehicle_no, str):
+                keys.update(self._cache_key(vehicle_no[:i]) for i in range(1, len(vehicle_no) + 1))
+                keys.add("row:" + vehicle_no.upper())
         try:
-            vehicle_no = details.get('vehicle_no')
-            no_of_safety_check = details.get('no_of_safety_check')
-            is_completed = details.get('isCompleted')
+            self.cache.delete_many(keys)
+        except Exception as e:
+            logger.error("Cache invalidation failed: %s", str(e))
+
+    def _ensure_search_index(self):
+        """Builds the index on first use, then brings it up to date from the change log.
+
+        Replaying the log picks up writes from every worker, including those
+        committed while the index was being built. The change counter is only
+        read after a write through this service or once INDEX_REFRESH_INTERVAL
+        has passed, so most searches never reach the database.
+        """
+        index = self.search_index
+        # Read before the counter: a write landing after it moves the generation
+        generation = self._change_generation
+        if (index.built_at is not None and generation == self._index_generation
+                and time.monotonic() - self._index_checked_at < INDEX_REFRESH_INTERVAL):
+            return
+        counter = self.repo.get_change_counter()
+        self._refresh_search_index(counter)
+        self._index_generation, self._index_checked_at = generation, time.monotonic()
+
+    def _refresh_search_index(self, counter):
+        index = self.search_index
+        if index.built_at is not None and (counter is None or index.seq == counter):
+            return
+        with self._index_lock:
+            if index.built_at is None or index.seq is None or counter - index.seq > INDEX_REPLAY_LIMIT:
+                logger.info("Building vehicle search index")
+                # Taken before the scan: changes racing it are replayed next time
+                index.build((row for rows in self.repo.iter_vehicles() for row in rows), seq=counter)
+                return
+            while counter is not None and index.seq < counter:
+                changes = self.repo.get_changes(index.seq, MAX_PAGE_SIZE)
+                if not changes:
+                    break
+                for _, operation, vehicle_no, count, completed in changes:
+                    if operation == "delete":
+                        index.remove(vehicle_no)
+                    else:
+                        index.add((vehicle_no, count, completed))
+                index.seq = changes[-1][0]
 
-            # Validate vehicle_no using RegExp
-            pattern = re.compile(r'^[A-Z0-9\- ]{5,10}$')
-            if not pattern.match(vehicle_no):
-                raise ValueError("Invalid vehicle number. It must be 5–10 characters long and contain only A-Z, 0–9, hyphen, or space.")
+    def _overlay(self, rows, columns=VEHICLE_FIELDS):
+        # Reads see updates that are still waiting in the write-behind buffer
+        if self.write_buffer is None:
+            return rows
+        return self.write_buffer.overlay(rows, columns)
 
-            vehicle = entity.Vehicle(vehicle_no, no_of_safety_check, is_completed)
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    def write_buffer_stats(self):
+        return self.write_buffer.stats() if self.write_buffer is not None else None
+
+    def resilience_stats(self):
+        # Only a repository wrapped in ResilientRepository has a breaker
+        stats = getattr(self.repo, "resilience_stats", None)
+        return stats() if stats is not None else None
+
+    def version_tag(self, vehicle_no=None, prefix=False):
+        """Entity tag for the whole table, for one vehicle, or with prefix for a plate-prefix lookup.
+
+        None when no reliable tag exists. Cached lookups return the tag stored
+        with the cached rows, so it always names the body the cache serves.
+        """
+        try:
+            if self.write_buffer is not None:
+                # Buffered updates are already visible to reads but not yet
+                # counted in the database, so a tag would validate stale copies
+                if (self.write_buffer.get(vehicle_no.upper()) if vehicle_no and not prefix else len(self.write_buffer)):
+                    return None
+            if vehicle_no and self.cache is not None:
+                return (self._get_rows_by_prefix(vehicle_no) if prefix else self._get_exact_row(vehicle_no))[0]
+            if vehicle_no is None or prefix:
+                counter = self.repo.get_change_counter()
+                return None if counter is None else f"t{counter}"
+            version = self.repo.get_vehicle_version(vehicle_no.upper())
+            return None if version is None else f"v{version}"
+        except Exception as e:
+            logger.error("Error in version_tag(): %s", str(e))
+            raise
+
+    def get_changes(self, since=0, limit=None, wait=0):
+        """Changes committed after sequence number since, oldest first, and the since for the next call.
+
+        With wait, blocks for up to that many seconds until a change arrives.
+        """
+        try:
+            limit = MAX_PAGE_SIZE if limit is None else limit
+            if since < 0:
+                raise ValueError("since must not be negative")
+            if not 1 <= limit <= MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+            if not 0 <= wait <= MAX_CHANGE_WAIT:
+                raise ValueError(f"wait must be between 0 and {MAX_CHANGE_WAIT} seconds")
+            rows = self.repo.get_changes(since, limit)
+            if not rows and wait and self._wait_for_changes(since, wait):
+                rows = self.repo.get_changes(since, limit)
+            changes = [{"seq": seq, "op": operation, "vehicle_no": vehicle_no, "no_of_safety_check": count,
+                        "isCompleted": None if completed is None else bool(completed)}
+                       for seq, operation, vehicle_no, count, completed in rows]
+            return changes, changes[-1]["seq"] if changes else since
+        except Exception as e:
+            logger.error("Error in get_changes(): %s", str(e))
+            raise
+
+    def _wait_for_changes(self, since, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._change_signal:
+                generation = self._change_generation
+            counter = self.repo.get_change_counter()
+            if counter is not None and counter > since:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with self._change_signal:
+                self._change_signal.wait_for(lambda: self._change_generation != generation,
+                                             min(remaining, CHANGE_POLL_INTERVAL))
+
+    def get_vehicle_stats(self, prefix_length=None):
+        """Totals, completion rate and no_of_safety_check percentiles, optionally per plate prefix.
+
+        Aggregated in the database and cached against the change counter, so
+        repeated calls between writes cost one primary-key read.
+        """
+        try:
+            if prefix_length is not None and not 1 <= prefix_length <= MAX_STATS_PREFIX:
+                raise ValueError(f"prefix_length must be between 1 and {MAX_STATS_PREFIX}")
+            # Read before aggregating: a racing write can only make the
+            # entry fresher than its key, never older
+            counter = self.repo.get_change_counter() if self.cache is not None else None
+            key = None if counter is None else f"stats:{counter}:{prefix_length or 0}"
+            if key is not None:
+                try:
+                    stats = self.cache.get(key)
+                except Exception as e:
+                    logger.error("Cache read failed: %s", str(e))
+                    stats = MISSING
+                if stats is not MISSING:
+                    logger.debug("Cache hit: %s", key)
+                    return stats
+
+            rows = self.repo.get_vehicle_stats(prefix_length)
+            if prefix_length is None:
+                stats = _summarize(rows)
+            else:
+                groups = defaultdict(list)
+                for prefix, checks, is_completed, count in rows:
+                    groups[prefix].append((checks, is_completed, count))
+                stats = _summarize(row for group in groups.values() for row in group)
+                stats["groups"] = [dict(prefix=prefix, **_summarize(group)) for prefix, group in sorted(groups.items())]
+            if key is not None:
+                try:
+                    self.cache.set(key, stats)
+                except Exception as e:
+                    logger.error("Cache write failed: %s", str(e))
+            return stats
+        except Exception as e:
+            logger.error("Error in get_vehicle_stats(): %s", str(e))
+            raise
+
+    def vehicle_details(self, details):
+        try:
+            vehicle = self.validator.to_vehicle(details)
             logger.info("Creating vehicle: vehicle_no=%s, no_of_safety_check=%s, isCompleted=%s",
                         vehicle.vehicle_no, vehicle.no_of_safety_check, vehicle.isCompleted)
             self.repo.insert_vehicle(vehicle)
+            self._invalidate([vehicle.vehicle_no])
         except Exception as e:
             logger.error("Error in vehicle_details(): %s", str(e))
             raise
 
+    def bulk_vehicle_details(self, records, chunk_size=1000):
+        try:
+            results = []
+            vehicles = []
+            seen = set()
+            errors = self.validator.validate_batch(records)
+            for index, record in enumerate(records):
+                if index in errors:
+                    results.append({"index": index,
+                                    "vehicle_no": record.get('vehicle_no') if isinstance(record, dict) else None,
+                                    "status": "invalid", "error": " ".join(errors[index].values())})
+                    continue
+                vehicle_no = record['vehicle_no']
+                result = {"index": index, "vehicle_no": vehicle_no}
+                results.append(result)
+                if vehicle_no in seen:
+                    result["status"] = "duplicate"
+                else:
+                    seen.add(vehicle_no)
+                    vehicles.append(entity.Vehicle(vehicle_no, record.get('no_of_safety_check'),
+                                                   record.get('isCompleted')))
+
+            logger.info("Bulk create: %d rows received, %d valid", len(results), len(vehicles))
+            try:
+                statuses = self.repo.insert_vehicles(vehicles, chunk_size) if vehicles else {}
+            finally:
+                # Earlier chunks may have committed even if a later one failed
+                self._invalidate(vehicle.vehicle_no for vehicle in vehicles)
+            for result in results:
+                if "status" not in result:
+                    result["status"] = statuses[result["vehicle_no"]]
+            return results
+        except Exception as e:
+            logger.error("Error in bulk_vehicle_details(): %s", str(e))
+            raise
+
     def get_all_vehicle_details(self, vehicle_no=None):
         try:
             if vehicle_no:
                 logger.info("Fetching vehicles by number prefix: %s", vehicle_no)
-                rows = self.repo.get_vehicle_by_number(vehicle_no)
-                return [entity.Vehicle(*row) for row in rows] if rows else []
+                return entity.VehicleRows(self._overlay(self._get_rows_by_prefix(vehicle_no)[1]))
             else:
                 logger.info("Fetching all vehicles")
-                rows = self.repo.get_all_vehicles()
-                return [entity.Vehicle(*row) for row in rows] if rows else []
+                # Encoded straight from the rows, without a Vehicle per row
+                return entity.VehicleRows(self._overlay(self.repo.get_all_vehicles()))
         except Exception as e:
             logger.error("Error in get_all_vehicle_details(): %s", str(e))
             raise
 
+    def search_vehicles(self, vehicle_no, match="prefix", limit=None):
+        try:
+            if match not in SEARCH_MODES:
+                raise ValueError(f"match must be one of: {', '.join(SEARCH_MODES)}")
+            if match == "exact":
+                logger.info("Fetching vehicle by exact number: %s", vehicle_no)
+                row = self._get_exact_row(vehicle_no)[1]
+                return entity.Vehicle(*self._overlay([row])[0]) if row else None
+
+            limit = DEFAULT_SEARCH_LIMIT if limit is None else limit
+            if not 1 <= limit <= MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+            logger.info("Searching vehicles: %s match=%s limit=%d", vehicle_no, match, limit)
+            if match == "prefix":
+                rows = self.repo.get_vehicle_by_number(vehicle_no, limit)
+            else:
+                self._ensure_search_index()
+                if match == "contains":
+                    rows = self.search_index.contains(vehicle_no, limit)
+                else:
+                    rows = self.search_index.fuzzy(vehicle_no, limit)
+            return [entity.Vehicle(*row) for row in self._overlay(rows)]
+        except Exception as e:
+            logger.error("Error in search_vehicles(): %s", str(e))
+            raise
+
+    # Cached lookups are stored as (tag, rows) pairs: other workers' writes
+    # don't invalidate this cache, so a tag read from the database could name
+    # a newer version than the cached body and validate it wrongly.
+    def _get_exact_row(self, vehicle_no):
+        """(tag, row) for one plate; the tag is only read with cached entries."""
+        # Stored plates are upper case, but SQLite compares case-sensitively:
+        # normalise once so the query and the cache key always agree
+        vehicle_no = vehicle_no.upper()
+        if self.cache is None:
+            return None, self.repo.get_vehicle(vehicle_no)
+        key = "row:" + vehicle_no
+        try:
+            entry = self.cache.get(key)
+        except Exception as e:
+            logger.error("Cache read failed: %s", str(e))
+            entry = MISSING
+        if entry is not MISSING:
+            logger.debug("Cache hit: %s", key)
+            return entry
+        try:
+            row = self.repo.get_vehicle_with_version(vehicle_no)
+        except DatabaseUnavailableError as e:
+            return self._read_stale(key, e)
+        entry = (f"v{row[3]}", tuple(row[:3])) if row else (None, None)
+        try:
+            self.cache.set(key, entry)
+        except Exception as e:
+            logger.error("Cache write failed: %s", str(e))
+        return entry
 
-    def update_vehicle_details(self, vehicle):
+    def _read_stale(self, key, error):
+        # While the database is down an expired entry beats an error
         try:
+            value = self.cache.get_stale(key)
+        except Exception as e:
+            logger.error("Cache read failed: %s", str(e))
+            value = MISSING
+        if value is MISSING:
+            raise error
+        logger.warning("Serving stale cache entry %s: %s", key, str(error))
+        return value
+
+    def _get_rows_by_prefix(self, vehicle_no):
+        """(tag, rows) for a plate prefix; the tag is only read with cached entries."""
+        if self.cache is None:
+            return None, self.repo.get_vehicle_by_number(vehicle_no)
+        key = self._cache_key(vehicle_no)
+        try:
+            entry = self.cache.get(key)
+        except Exception as e:
+            logger.error("Cache read failed: %s", str(e))
+            entry = MISSING
+        if entry is not MISSING:
+            logger.debug("Cache hit: %s", key)
+            return entry
+        try:
+            # Read before the rows, so a racing write can only make the tag stale
+            counter = self.repo.get_change_counter()
+            rows = [tuple(row) for row in self.repo.get_vehicle_by_number(vehicle_no)]
+        except DatabaseUnavailableError as e:
+            return self._read_stale(key, e)
+        entry = (None if counter is None else f"t{counter}", rows)
+        try:
+            self.cache.set(key, entry)
+        except Exception as e:
+            logger.error("Cache write failed: %s", str(e))
+        return entry
+
+    def get_vehicle_page(self, limit=None, after=None, fields=None):
+        try:
+            limit = DEFAULT_PAGE_SIZE if limit is None else limit
+            if not 1 <= limit <= MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+            fields = list(fields or VEHICLE_FIELDS)
+            unknown = [field for field in fields if field not in VEHICLE_FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+            # vehicle_no is always selected because it is the cursor key
+            columns = ["vehicle_no"] + [field for field in fields if field != "vehicle_no"]
+            logger.info("Fetching vehicle page: after=%s, limit=%d, fields=%s", after, limit, fields)
+            rows = self._overlay(self.repo.get_vehicles_page(columns, after, limit + 1), columns)
+            next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+            items = []
+            for row in rows[:limit]:
+                record = dict(zip(columns, row))
+                if record.get("isCompleted") is not None:
+                    record["isCompleted"] = bool(record["isCompleted"])
+                items.append({field: record[field] for field in fields})
+            return items, next_cursor
+        except Exception as e:
+            logger.error("Error in get_vehicle_page(): %s", str(e))
+            raise
+
+    def export_vehicles(self, export_format="ndjson", chunk_size=1000):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+        logger.info("Exporting vehicles as %s", export_format)
+        chunks = map(self._overlay, self.repo.iter_vehicles(chunk_size))
+        if export_format == "csv":
+            return self._export_csv(chunks)
+        return self._export_ndjson(chunks)
+
+    def _export_ndjson(self, chunks):
+        for rows in chunks:
+            yield encode_rows_ndjson(rows)
+
+    def _export_csv(self, chunks):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(VEHICLE_FIELDS)
+        for rows in chunks:
+            # The column is a TINYINT; written as true/false like the JSON formats
+            writer.writerows((row[0], row[1], CSV_BOOLEANS[None if row[2] is None else bool(row[2])]) for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def update_vehicle_details(self, vehicle, upsert=False, expected_version=None):
+        try:
+            if expected_version is not None:
+                return self._update_if_version(vehicle, expected_version)
+            if upsert:
+                # Upsert may create the row, so it gets the same check as create
+                if not isinstance(vehicle.vehicle_no, str) or not self.validator.plate.fullmatch(vehicle.vehicle_no):
+                    raise ValueError(INVALID_VEHICLE_NO)
+                logger.info("Upserting vehicle: vehicle_no=%s", vehicle.vehicle_no)
+                if self.write_buffer is not None:
+                    # Upserts may create rows, so they are written through
+                    self.write_buffer.discard(vehicle.vehicle_no)
+                result = self.repo.upsert_vehicle(vehicle)
+                self._invalidate([vehicle.vehicle_no])
+                return result
+
             logger.info("Updating vehicle: vehicle_no=%s", vehicle.vehicle_no)
+            if self.write_buffer is not None:
+                return self._buffer_update(vehicle)
             result = self.repo.update_vehicle(vehicle)
             if result:
+                self._invalidate([vehicle.vehicle_no])
                 logger.info("Update successful for vehicle: %s", vehicle.vehicle_no)
             else:
                 logger.warning("Update failed: vehicle not found - %s", vehicle.vehicle_no)
@@ -55,11 +499,92 @@ class VehicleService:
             logger.error("Error in update_vehicle_details(): %s", str(e))
             raise
 
+    def _update_if_version(self, vehicle, expected_version):
+        logger.info("Updating vehicle: vehicle_no=%s if version=%s", vehicle.vehicle_no, expected_version)
+        if self.write_buffer is not None and self.write_buffer.get(vehicle.vehicle_no) is not None:
+            # The stored version only moves once buffered updates are committed
+            self.write_buffer.flush()
+        result = self.repo.update_vehicle(vehicle, expected_version)
+        if result:
+            self._invalidate([vehicle.vehicle_no])
+        return result
+
+    def _buffer_update(self, vehicle):
+        # Only existing rows are buffered, which keeps the 404 contract and
+        # lets reads overlay buffered values without changing which rows exist
+        if self.write_buffer.get(vehicle.vehicle_no) is None and self._get_exact_row(vehicle.vehicle_no)[1] is None:
+            logger.warning("Update failed: vehicle not found - %s", vehicle.vehicle_no)
+            return False
+        if not self.write_buffer.add(vehicle):
+            # Buffer closed (shutting down) or full (flushes failing): write through
+            result = self.repo.update_vehicle(vehicle)
+            if result:
+                self._invalidate([vehicle.vehicle_no])
+            return result
+        self._invalidate([vehicle.vehicle_no])
+        logger.info("Update buffered for vehicle: %s", vehicle.vehicle_no)
+        return True
+
+    def _batch_plates(self, vehicle_nos):
+        if not isinstance(vehicle_nos, list):
+            raise ValueError("Request body must be a JSON array of vehicle numbers")
+        if len(vehicle_nos) > MAX_BATCH_PLATES:
+            raise ValueError(f"At most {MAX_BATCH_PLATES} vehicle numbers per request")
+        invalid = self.validator.validate_plates(vehicle_nos)
+        # Each plate is sent to the database once, however often it is listed
+        plates = list(dict.fromkeys(p for i, p in enumerate(vehicle_nos) if i not in invalid))
+        return invalid, plates
+
+    def lookup_vehicles(self, vehicle_nos):
+        """Found/missing/invalid status for each plate, fetched with chunked IN lists."""
+        try:
+            invalid, plates = self._batch_plates(vehicle_nos)
+            logger.info("Batch lookup: %d plates, %d distinct valid", len(vehicle_nos), len(plates))
+            rows = self._overlay(self.repo.get_vehicles(plates)) if plates else []
+            found = {row[0]: entity.Vehicle(*row) for row in rows}
+            results = []
+            for index, vehicle_no in enumerate(vehicle_nos):
+                if index in invalid:
+                    results.append({"vehicle_no": vehicle_no, "status": "invalid", "error": INVALID_VEHICLE_NO})
+                elif vehicle_no in found:
+                    results.append(dict(found[vehicle_no].to_dict(), status="found"))
+                else:
+                    results.append({"vehicle_no": vehicle_no, "status": "missing"})
+            return results
+        except Exception as e:
+            logger.error("Error in lookup_vehicles(): %s", str(e))
+            raise
+
+    def delete_vehicles(self, vehicle_nos):
+        """Deletes every listed vehicle in one transaction; deleted/missing/invalid status for each plate."""
+        try:
+            invalid, plates = self._batch_plates(vehicle_nos)
+            logger.info("Batch delete: %d plates, %d distinct valid", len(vehicle_nos), len(plates))
+            if self.write_buffer is not None:
+                for vehicle_no in plates:
+                    self.write_buffer.discard(vehicle_no)
+            deleted = set(self.repo.delete_vehicles(plates)) if plates else set()
+            if deleted:
+                self._invalidate(deleted)
+            results = []
+            for index, vehicle_no in enumerate(vehicle_nos):
+                if index in invalid:
+                    results.append({"vehicle_no": vehicle_no, "status": "invalid", "error": INVALID_VEHICLE_NO})
+                else:
+                    results.append({"vehicle_no": vehicle_no, "status": "deleted" if vehicle_no in deleted else "missing"})
+            return results
+        except Exception as e:
+            logger.error("Error in delete_vehicles(): %s", str(e))
+            raise
+
     def delete_vehicle(self, vehicle_no):
         try:
             logger.info("Deleting vehicle: %s", vehicle_no)
+            if self.write_buffer is not None:
+                self.write_buffer.discard(vehicle_no)
             result = self.repo.delete_vehicle(vehicle_no)
             if result:
+                self._invalidate([vehicle_no])
                 logger.info("Delete successful: %s", vehicle_no)
             else:
                 logger.warning("Delete failed: vehicle not found - %s", vehicle_no)
@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_size=1024, ttl=30.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # Expired entries, kept for get_stale until replaced, invalidated or crowded out
+        self._stale = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._stale_hits = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return MISSING
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._stale[key] = value
+                while len(self._stale) > self.max_size:
+                    self._stale.popitem(last=False)
+                self._expirations += 1
+                self._misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def get_stale(self, key):
+        """The cached value even if it has expired; for when the source can't be read."""
+        with self._lock:
+            entry = self._entries.get(key)
+            value = entry[0] if entry is not None else self._stale.get(key, MISSING)
+            if value is not MISSING:
+                self._stale_hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._stale.pop(key, None)
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._stale.pop(key, None)
+                if self._entries.pop(key, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stale.clear()
+
+    def reconfigure(self, ttl=None, max_size=None):
+        # Entries already cached keep the expiry they were stored with
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if max_size is not None:
+                if max_size < 1:
+                    raise ValueError("max_size must be at least 1")
+                self.max_size = max_size
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+                while len(self._stale) > self.max_size:
+                    self._stale.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "stale_hits": self._stale_hits,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+
+class RedisCache:
+    """Cache on any client exposing Redis get/set(ex=)/delete."""
+
+    def __init__(self, client, ttl=30.0, key_prefix="vehicle-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        raw = self.client.get(self.key_prefix + key)
+        with self._lock:
+            if raw is None:
+                self._misses += 1
+                return MISSING
+            self._hits += 1
+        return json.loads(raw)
+
+    def get_stale(self, key):
+        # Redis drops expired keys itself, so there is nothing older to fall back on
+        return MISSING
+
+    def set(self, key, value):
+        ttl = max(1, int(self.ttl)) if self.ttl else None
+        self.client.set(self.key_prefix + key, json.dumps(value), ex=ttl)
+
+    def delete_many(self, keys):
+        keys = [self.key_prefix + key for key in keys]
+        if keys:
+            deleted = self.client.delete(*keys)
+            with self._lock:
+                self._invalidations += deleted or 0
+
+    def clear(self):
+        # Entries expire through their TTL; nothing is shared to flush locally.
+        pass
+
+    def reconfigure(self, ttl=None, max_size=None):
+        # Redis bounds its own memory, so only the TTL applies
+        if ttl is not None:
+            self.ttl = ttl
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "redis",
+                "hits": self._hits,
+                "misses": self._misses,
+                # Redis evicts on its own and does not report it per client
+                "evictions": 0,
+                "invalidations": self._invalidations,
+                "stale_hits": 0,
+            }
+
+
+def create_cache(settings):
+    backend = settings.get("backend", "memory")
+    ttl = settings.get("ttl_seconds", 30)
+    if backend == "none":
+        logger.info("Vehicle cache disabled")
+        return None
+    if backend == "memory":
+        logger.info("Using in-process vehicle cache (max_size=%s, ttl=%ss)", settings.get("max_size", 1024), ttl)
+        return LRUCache(max_size=settings.get("max_size", 1024), ttl=ttl)
+    if backend == "redis":
+        # Only needed when the Redis backend is configured
+        import redis
+        logger.info("Using Redis vehicle cache (ttl=%ss)", ttl)
+        return RedisCache(redis.Redis.from_url(settings["redis_url"]), ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
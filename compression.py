@@ -0,0 +1,84 @@
+import gzip
+
+from flask import request
+
+from logger_config import setup_logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = setup_logger(__name__)
+
+# Binary msgpack still shrinks well: plate numbers repeat their prefixes
+COMPRESSIBLE_TYPES = ("application/json", "application/vnd.vehicle.columnar+json", "application/msgpack",
+                      "application/x-msgpack", "text/")
+
+
+def available_codings():
+    # Preferred first; best_match keeps the server's order when qualities tie
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def etag_variants(tag):
+    """The tag plus the tags of its compressed forms, which name the same content."""
+    return (tag,) + tuple(f"{tag}-{coding}" for coding in available_codings())
+
+
+def _compressible(mimetype):
+    return any(mimetype == kind or kind.endswith("/") and mimetype.startswith(kind) for kind in COMPRESSIBLE_TYPES)
+
+
+class ResponseCompressor:
+    """Compresses finished responses of at least min_size bytes for clients that accept it.
+
+    Used as a Flask after_request hook and, through choose/compress, by the
+    ASGI front end. Streamed responses (exports, the change stream) are left
+    alone so they keep flushing as they are produced. A strong ETag gets a
+    -gzip/-br suffix, since the compressed bytes are a different representation.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def choose(self, accept_encodings):
+        """The coding to use for a werkzeug Accept-Encoding value, or None."""
+        return accept_encodings.best_match(available_codings())
+
+    def compress(self, body, coding):
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        # A fixed mtime keeps the output, and so its ETag, stable across requests
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def __call__(self, response):
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                or "Content-Encoding" in response.headers or not _compressible(response.mimetype)):
+            return response
+        response.vary.add("Accept-Encoding")
+        coding = self.choose(request.accept_encodings)
+        if coding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        response.set_data(self.compress(body, coding))
+        response.headers["Content-Encoding"] = coding
+        tag, weak = response.get_etag()
+        if tag and not weak:
+            response.set_etag(f"{tag}-{coding}")
+        return response
+
+
+def create_compressor(settings):
+    if not settings.get("enabled", True):
+        return None
+    compressor = ResponseCompressor(min_size=settings.get("min_size", 1024),
+                                    gzip_level=settings.get("gzip_level", 6),
+                                    brotli_quality=settings.get("brotli_quality", 5))
+    logger.info("Response compression enabled (%s, min_size=%s bytes)", "/".join(available_codings()),
+                compressor.min_size)
+    return compressor
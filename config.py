@@ -1,17 +1,192 @@
+import copy
 import json
+import logging
 import os
+import threading
 
-def get_db_connection_string():
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'env_parameters.json')
+# VEHICLE_API_ENVIRONMENT picks the environment, VEHICLE_API_DBCONNECTIONSTRING
+# and VEHICLE_API_DBENGINE replace those keys, and VEHICLE_API_<SECTION>__<KEY>
+# (e.g. VEHICLE_API_DBPOOL__MAX_SIZE=20) replaces one key of a section.
+ENV_PREFIX = "VEHICLE_API_"
+
+NUMBER = (int, float)
+# Section -> key -> accepted types; any other key in a section is an error
+SCHEMA = {
+    "DbPool": {"min_size": int, "max_size": int, "timeout": NUMBER, "max_idle": NUMBER, "max_lifetime": NUMBER,
+               "health_check": bool},
+    "Cache": {"backend": str, "max_size": int, "ttl_seconds": NUMBER, "redis_url": str},
+    "Logging": {"level": str, "console": bool, "json": bool, "sample_rate": NUMBER, "max_bytes": int,
+                "backup_count": int, "queue_size": int},
+    "WriteBehind": {"enabled": bool, "max_pending": int, "flush_interval": NUMBER},
+    "Api": {"swagger": bool, "cors": bool, "max_change_streams": int, "max_bulk_rows": int},
+    "HotReload": {"enabled": bool, "interval": NUMBER},
+    "Resilience": {"enabled": bool, "connect_timeout": NUMBER, "query_timeout": NUMBER, "retries": int,
+                   "retry_backoff": NUMBER, "retry_max_backoff": NUMBER, "failure_threshold": int,
+                   "reset_timeout": NUMBER},
+    "Compression": {"enabled": bool, "min_size": int, "gzip_level": int, "brotli_quality": int},
+}
+TOP_LEVEL = {"DbEngine": str, "DbConnectionString": str}
+ENGINES = ("mssql", "sqlite", "memory")
+TYPE_NAMES = {int: "an integer", bool: "true or false", str: "a string"}
+
+_lock = threading.Lock()
+_config = None
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def _env_value(raw, types):
+    if types is str:
+        return raw
     try:
-        file_path = os.path.join(os.path.dirname(__file__), 'env_parameters.json')
-        with open(file_path, 'r') as file:
-            config_data = json.load(file)
-        environment = config_data['environment']
-        connection_string = config_data[environment]['DbConnectionString']
-        return connection_string
-    except KeyError:
-        raise ValueError("Environment key not found or incorrect environment specified.")
-    except FileNotFoundError:
-        raise FileNotFoundError("The JSON file was not found.")
-    except Exception as e:
-        raise Exception(f"An error occurred: {str(e)}")
\ No newline at end of file
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def _apply_env_overrides(settings, environ):
+    top_level = {key.upper(): key for key in TOP_LEVEL}
+    sections = {section.upper(): section for section in SCHEMA}
+    for name, raw in environ.items():
+        if not name.startswith(ENV_PREFIX) or name == ENV_PREFIX + "ENVIRONMENT":
+            continue
+        key = name[len(ENV_PREFIX):]
+        if key in top_level:
+            settings[top_level[key]] = raw
+            continue
+        section, _, option = key.partition("__")
+        if section not in sections or not option:
+            # The prefix is shared with the launchers (VEHICLE_API_WORKERS,
+            # VEHICLE_API_BIND, ...) and the test suite, so leave those alone
+            continue
+        section = sections[section]
+        option = {known.upper(): known for known in SCHEMA[section]}.get(option, option.lower())
+        settings.setdefault(section, {})[option] = _env_value(raw, SCHEMA[section].get(option))
+
+
+def _check_type(name, value, types):
+    allowed = types if isinstance(types, tuple) else (types,)
+    # bool is an int subclass, but true is not a valid pool size
+    if not isinstance(value, allowed) or (isinstance(value, bool) and bool not in allowed):
+        kind = "a number" if types is NUMBER else TYPE_NAMES[types]
+        raise ConfigError(f"{name} must be {kind}, got {value!r}")
+
+
+def _validate(settings):
+    for key, types in TOP_LEVEL.items():
+        if key in settings:
+            _check_type(key, settings[key], types)
+    if settings.get("DbEngine", "mssql") not in ENGINES:
+        raise ConfigError(f"DbEngine must be one of: {', '.join(ENGINES)}")
+    for section, options in SCHEMA.items():
+        values = settings.get(section, {})
+        if not isinstance(values, dict):
+            raise ConfigError(f"{section} must be an object")
+        unknown = sorted(set(values) - set(options))
+        if unknown:
+            # Sections are passed on as keyword arguments (ConnectionPool(**DbPool))
+            raise ConfigError(f"Unknown {section} setting: {', '.join(unknown)}")
+        for key, types in options.items():
+            if key in values:
+                _check_type(f"{section}.{key}", values[key], types)
+
+    pool = settings.get("DbPool", {})
+    if pool.get("max_size", 1) < 1 or not 0 <= pool.get("min_size", 0) <= pool.get("max_size", 10):
+        raise ConfigError("DbPool needs max_size >= 1 and 0 <= min_size <= max_size")
+    level = settings.get("Logging", {}).get("level", "DEBUG")
+    if not isinstance(logging.getLevelName(level.upper()), int):
+        raise ConfigError(f"Logging.level {level!r} is not a logging level")
+    if not 0 <= settings.get("Logging", {}).get("sample_rate", 1.0) <= 1:
+        raise ConfigError("Logging.sample_rate must be between 0 and 1")
+    resilience = settings.get("Resilience", {})
+    if resilience.get("retries", 0) < 0 or resilience.get("failure_threshold", 1) < 1:
+        raise ConfigError("Resilience needs retries >= 0 and failure_threshold >= 1")
+    for key in ("max_change_streams", "max_bulk_rows"):
+        if settings.get("Api", {}).get(key, 1) < 1:
+            raise ConfigError(f"Api.{key} must be at least 1")
+    compression = settings.get("Compression", {})
+    if not 1 <= compression.get("gzip_level", 6) <= 9 or not 0 <= compression.get("brotli_quality", 5) <= 11:
+        raise ConfigError("Compression needs gzip_level between 1 and 9 and brotli_quality between 0 and 11")
+
+
+def load_config(path=CONFIG_PATH, environ=None):
+    """Reads, overrides and validates the settings of the selected environment."""
+    environ = os.environ if environ is None else environ
+    with open(path, 'r') as file:
+        config_data = json.load(file)
+    environment = environ.get(ENV_PREFIX + "ENVIRONMENT") or config_data.get('environment')
+    if not isinstance(config_data.get(environment), dict):
+        raise ConfigError("Environment key not found or incorrect environment specified.")
+    settings = copy.deepcopy(config_data[environment])
+    _apply_env_overrides(settings, environ)
+    _validate(settings)
+    settings["environment"] = environment
+    return settings
+
+
+def get_config():
+    """The settings loaded on first use; later calls return the same snapshot."""
+    global _config
+    with _lock:
+        if _config is None:
+            _config = load_config()
+        return _config
+
+
+def reload_config(path=CONFIG_PATH):
+    """Re-reads the file; the running settings are kept if the new ones are invalid."""
+    global _config
+    config = load_config(path)
+    with _lock:
+        _config = config
+    return config
+
+
+def _section(name):
+    return copy.deepcopy(get_config().get(name, {}))
+
+
+def get_db_connection_string():
+    connection_string = get_config().get('DbConnectionString')
+    if connection_string is None:
+        raise ConfigError("Environment key not found or incorrect environment specified.")
+    return connection_string
+
+
+def get_db_engine():
+    return get_config().get('DbEngine', 'mssql')
+
+
+def get_db_pool_settings():
+    return _section('DbPool')
+
+
+def get_cache_settings():
+    return _section('Cache')
+
+
+def get_logging_settings():
+    return _section('Logging')
+
+
+def get_write_behind_settings():
+    return _section('WriteBehind')
+
+
+def get_api_settings():
+    return _section('Api')
+
+
+def get_hot_reload_settings():
+    return _section('HotReload')
+
+
+def get_resilience_settings():
+    return _section('Resilience')
+
+
+def get_compression_settings():
+    return _section('Compression')
@@ -0,0 +1,87 @@
+import os
+import threading
+import weakref
+
+from config import CONFIG_PATH, get_config, reload_config
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_running = weakref.WeakSet()
+
+
+class ConfigWatcher:
+    """Polls the config file and passes each valid new version to its listeners.
+
+    Listeners are called as listener(config, changed) where changed is the
+    set of top-level keys (sections) that differ from the running config. A
+    file that fails to load or validate is logged and otherwise ignored.
+    """
+
+    def __init__(self, path=CONFIG_PATH, interval=2.0):
+        self.path = path
+        self.interval = interval
+        self.listeners = []
+        self._stamp = self._file_stamp()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Reloads the file if it changed; returns the set of changed sections."""
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return set()
+        self._stamp = stamp
+        previous = get_config()
+        try:
+            config = reload_config(self.path)
+        except Exception as e:
+            logger.error("Config reload rejected, keeping the running config: %s", str(e))
+            return set()
+        changed = {key for key in previous.keys() | config.keys() if previous.get(key) != config.get(key)}
+        if not changed:
+            return changed
+        logger.info("Config reloaded, changed: %s", ", ".join(sorted(changed)))
+        for listener in self.listeners:
+            try:
+                listener(config, changed)
+            except Exception as e:
+                logger.error("Applying reloaded config failed: %s", str(e))
+        return changed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+            self._thread.start()
+            _running.add(self)
+        return self
+
+    def stop(self):
+        _running.discard(self)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+
+def _restart_after_fork():
+    # The polling thread does not survive fork, so a watcher started in a
+    # preload_app master would leave every gunicorn worker without one
+    for watcher in list(_running):
+        watcher._stop = threading.Event()
+        watcher._thread = None
+        watcher.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
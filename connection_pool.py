@@ -0,0 +1,285 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+RECONFIGURABLE = {"min_size", "max_size", "timeout", "max_idle", "max_lifetime", "health_check"}
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class PoolClosedError(Exception):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    def __init__(self, connect, min_size=1, max_size=10, timeout=30.0,
+                 max_idle=300.0, max_lifetime=1800.0, health_check=True,
+                 health_check_query="SELECT 1", size_limit=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if min_size < 0 or min_size > max_size:
+            raise ValueError("min_size must be between 0 and max_size")
+        # A hard cap set by the backend, which configured sizes cannot exceed
+        self.size_limit = size_limit
+        min_size, max_size = self._limit_sizes(min_size, max_size)
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check = health_check
+        self.health_check_query = health_check_query
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._pid = os.getpid()
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+
+    def _reset_after_fork(self):
+        # Sockets inherited from the parent process must never be shared, so
+        # the child simply forgets them and builds its own connections.
+        if self._pid != os.getpid():
+            logger.info("Process fork detected - resetting connection pool")
+            self._idle.clear()
+            self._size = 0
+            self._in_use = 0
+            self._pid = os.getpid()
+
+    def _open(self):
+        entry = _PooledConnection(self._connect())
+        with self._cond:
+            self._created += 1
+        logger.debug("Opened new pooled connection")
+        return entry
+
+    def _close_raw(self, entry):
+        try:
+            entry.raw.close()
+        except Exception as e:
+            logger.warning("Error closing pooled connection: %s", str(e))
+
+    def _discard(self, entry):
+        self._close_raw(entry)
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _is_usable(self, entry):
+        now = time.monotonic()
+        if self.max_lifetime is not None and now - entry.created_at > self.max_lifetime:
+            logger.debug("Recycling pooled connection - max lifetime reached")
+            return False
+        if self.max_idle is not None and now - entry.last_used > self.max_idle:
+            logger.debug("Recycling pooled connection - idle timeout reached")
+            return False
+        if self.health_check:
+            cursor = None
+            try:
+                cursor = entry.raw.cursor()
+                cursor.execute(self.health_check_query)
+                cursor.fetchall()
+            except Exception as e:
+                logger.warning("Pooled connection failed health check: %s", str(e))
+                return False
+            finally:
+                if cursor:
+                    try:
+                        cursor.close()
+                    except Exception:
+                        pass
+        return True
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            entry = None
+            with self._cond:
+                self._reset_after_fork()
+                if self._closed:
+                    raise PoolClosedError("Connection pool is closed")
+                if self._idle:
+                    # LIFO keeps the most recently used connections warm and
+                    # lets surplus ones age out through max_idle.
+                    entry = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            "Timed out after %.1fs waiting for a database connection" % self.timeout)
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if entry is None:
+                try:
+                    entry = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_usable(entry):
+                self._discard(entry)
+                continue
+
+            waited_for = time.monotonic() - start
+            with self._cond:
+                self._in_use += 1
+                self._checkouts += 1
+                if waited:
+                    self._waits += 1
+                    self._wait_time_total += waited_for
+                    self._wait_time_max = max(self._wait_time_max, waited_for)
+            return entry
+
+    def release(self, entry, discard=False):
+        with self._cond:
+            if self._pid != os.getpid():
+                # Connection was checked out before a fork; it is not ours.
+                return
+            self._in_use -= 1
+            expired = (self.max_lifetime is not None
+                       and time.monotonic() - entry.created_at > self.max_lifetime)
+            # The pool may have been shrunk while this connection was out
+            if not (discard or self._closed or expired or self._size > self.max_size):
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+        self._discard(entry)
+
+    @contextmanager
+    def connection(self):
+        entry = self.acquire()
+        broken = False
+        try:
+            yield entry.raw
+        except BaseException:
+            try:
+                entry.raw.rollback()
+            except Exception as e:
+                logger.warning("Rollback failed, discarding connection: %s", str(e))
+                broken = True
+            raise
+        finally:
+            self.release(entry, discard=broken)
+
+    def prefill(self):
+        with self._cond:
+            self._reset_after_fork()
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(self._open())
+        finally:
+            with self._cond:
+                self._size -= missing - len(opened)
+                self._idle.extend(opened)
+                self._cond.notify_all()
+        logger.info("Connection pool prefilled with %d connection(s)", len(opened))
+
+    def _limit_sizes(self, min_size, max_size):
+        if self.size_limit is None or max_size <= self.size_limit:
+            return min_size, max_size
+        logger.warning("Pool max_size %d exceeds this backend's limit; using %d", max_size, self.size_limit)
+        return min(min_size, self.size_limit), self.size_limit
+
+    def reconfigure(self, **options):
+        """Applies new limits to a live pool.
+
+        Surplus idle connections are closed now; surplus checked-out ones are
+        closed when they are released.
+        """
+        unknown = set(options) - RECONFIGURABLE
+        if unknown:
+            raise ValueError(f"Pool options cannot be changed: {', '.join(sorted(unknown))}")
+        with self._cond:
+            min_size = options.get("min_size", self.min_size)
+            max_size = options.get("max_size", self.max_size)
+            if max_size < 1:
+                raise ValueError("max_size must be at least 1")
+            if min_size < 0 or min_size > max_size:
+                raise ValueError("min_size must be between 0 and max_size")
+            if "min_size" in options or "max_size" in options:
+                options["min_size"], options["max_size"] = self._limit_sizes(min_size, max_size)
+            for name, value in options.items():
+                setattr(self, name, value)
+            surplus = []
+            while self._size > self.max_size and self._idle:
+                surplus.append(self._idle.popleft())
+                self._size -= 1
+                self._discarded += 1
+            # A larger pool may let waiters through
+            self._cond.notify_all()
+        for entry in surplus:
+            self._close_raw(entry)
+        logger.info("Connection pool reconfigured: min_size=%d, max_size=%d, timeout=%s",
+                    self.min_size, self.max_size, self.timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_raw(entry)
+        logger.info("Connection pool closed")
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total": self._wait_time_total,
+                "wait_time_max": self._wait_time_max,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+            }
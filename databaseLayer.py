@@ -1,126 +1,391 @@
+from contextlib import closing
+
+from db_backends import VEHICLE_FIELDS
 from entity import Vehicle
 from logger_config import setup_logger
+from metrics import instrumented
 
 logger = setup_logger(__name__)
 
+
+class VehicleAlreadyExistsError(Exception):
+    pass
+
+
+class VersionConflictError(Exception):
+    pass
+
+
 class VehicleRepository:
     def __init__(self, db_context):
         self.db_context = db_context
+        self.statements = db_context.backend.statements
 
+    @instrumented
     def insert_vehicle(self, vehicle):
-        conn = None
-        cursor = None
         try:
-            conn = self.db_context.get_connection()
-            cursor = conn.cursor()
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                # The primary key rejects duplicates atomically, so there is
+                # no separate existence check to race against.
+                cursor.execute(self.statements["insert_vehicle"], (vehicle.vehicle_no, vehicle.no_of_safety_check, vehicle.isCompleted))
+                self._record_changes(cursor, [("insert", vehicle)])
+                conn.commit()
+                logger.info("Vehicle inserted: %s", vehicle.vehicle_no)
 
-            logger.info("Checking if vehicle exists: %s", vehicle.vehicle_no)
-            cursor.execute("SELECT COUNT(*) FROM VehicleDetails WHERE vehicle_no = ?", (vehicle.vehicle_no,))
-            if cursor.fetchone()[0] > 0:
+        except Exception as e:
+            if self.db_context.backend.is_integrity_error(e):
                 logger.warning("Insert failed - Vehicle already exists: %s", vehicle.vehicle_no)
-                raise Exception("Vehicle already exists")
+                raise VehicleAlreadyExistsError("Vehicle already exists") from e
+            logger.error("Error inserting vehicle %s: %s", vehicle.vehicle_no, str(e))
+            raise
 
-            query = """
-                INSERT INTO VehicleDetails (vehicle_no, no_of_safety_check, isCompleted)
-                VALUES (?, ?, ?)
-            """
-            cursor.execute(query, (vehicle.vehicle_no, vehicle.no_of_safety_check, vehicle.isCompleted))
-            conn.commit()
-            logger.info("Vehicle inserted: %s", vehicle.vehicle_no)
+    @instrumented
+    def upsert_vehicle(self, vehicle):
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Upserting vehicle: %s", vehicle.vehicle_no)
+                cursor.execute(self.statements["upsert_vehicle"], (vehicle.vehicle_no, vehicle.no_of_safety_check, vehicle.isCompleted))
+                # The statement returns the row's new version: a created row
+                # starts at 1, an updated one is past it
+                operation = "insert" if cursor.fetchone()[0] == 1 else "update"
+                self._record_changes(cursor, [(operation, vehicle)])
+                conn.commit()
+                logger.info("Vehicle upserted: %s", vehicle.vehicle_no)
+                return True
+        except Exception as e:
+            logger.error("Error upserting vehicle %s: %s", vehicle.vehicle_no, str(e))
+            raise
 
+    @instrumented
+    def insert_vehicles(self, vehicles, chunk_size=1000):
+        backend = self.db_context.backend
+        chunk_size = max(1, min(chunk_size, backend.max_params))
+        statuses = {}
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                if backend.fast_executemany:
+                    cursor.fast_executemany = True
+                for start in range(0, len(vehicles), chunk_size):
+                    chunk = vehicles[start:start + chunk_size]
+                    statuses.update(self._insert_chunk(conn, cursor, chunk))
+            logger.info("Bulk insert finished: %d rows in chunks of %d", len(vehicles), chunk_size)
+            return statuses
         except Exception as e:
-            logger.error("Error inserting vehicle %s: %s", vehicle.vehicle_no, str(e))
+            logger.error("Error bulk inserting vehicles: %s", str(e))
             raise
-        finally:
-            if cursor: cursor.close()
-            if conn: conn.close()
-            logger.debug("DB connection closed after insert")
 
+    def _insert_chunk(self, conn, cursor, chunk):
+        backend = self.db_context.backend
+        query = self.statements["select_existing"].format(placeholders=backend.placeholders(len(chunk)))
+        cursor.execute(query, [v.vehicle_no for v in chunk])
+        existing = {row[0] for row in cursor.fetchall()}
+        statuses = {v.vehicle_no: "duplicate" for v in chunk if v.vehicle_no in existing}
+        new_vehicles = [v for v in chunk if v.vehicle_no not in existing]
+        if not new_vehicles:
+            return statuses
+
+        params = [(v.vehicle_no, v.no_of_safety_check, v.isCompleted) for v in new_vehicles]
+        try:
+            cursor.executemany(self.statements["insert_vehicle"], params)
+            self._record_changes(cursor, [("insert", vehicle) for vehicle in new_vehicles])
+            conn.commit()
+            statuses.update((v.vehicle_no, "created") for v in new_vehicles)
+        except Exception as e:
+            if not backend.is_integrity_error(e):
+                raise
+            # Another writer inserted one of these rows after our check;
+            # retry the chunk row by row to find out which.
+            logger.warning("Bulk chunk hit a duplicate key, retrying row by row")
+            conn.rollback()
+            for vehicle, row in zip(new_vehicles, params):
+                try:
+                    cursor.execute(self.statements["insert_vehicle"], row)
+                    statuses[vehicle.vehicle_no] = "created"
+                except Exception as row_error:
+                    if not backend.is_integrity_error(row_error):
+                        raise
+                    statuses[vehicle.vehicle_no] = "duplicate"
+            created = [("insert", vehicle) for vehicle in new_vehicles if statuses[vehicle.vehicle_no] == "created"]
+            if created:
+                self._record_changes(cursor, created)
+            conn.commit()
+        return statuses
+
+    def _record_changes(self, cursor, changes):
+        """Logs (operation, vehicle or vehicle_no) pairs inside the caller's transaction.
+
+        Bumping the counter row locks it until commit, so sequence numbers
+        are handed out, and become visible, strictly in order.
+        """
+        cursor.execute(self.statements["bump_change_counter"], (len(changes),))
+        row = cursor.fetchone()
+        if row is None:
+            raise RuntimeError("VehicleChangeCounter is missing its row (id = 1)")
+        first = row[0] - len(changes) + 1
+        entries = []
+        for seq, (operation, target) in enumerate(changes, first):
+            if operation == "delete":
+                entries.append((seq, operation, target, None, None))
+            else:
+                entries.append((seq, operation, target.vehicle_no, target.no_of_safety_check, target.isCompleted))
+        cursor.executemany(self.statements["insert_change"], entries)
+
+    @instrumented
     def get_all_vehicles(self):
-        conn = None
-        cursor = None
-        try:
-            conn = self.db_context.get_connection()
-            cursor = conn.cursor()
-            logger.info("Fetching all vehicles")
-            cursor.execute("SELECT * FROM VehicleDetails")
-            rows = cursor.fetchall()
-            logger.info("Fetched %d vehicles", len(rows))
-            return rows
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Fetching all vehicles")
+                cursor.execute(self.statements["select_all"])
+                rows = cursor.fetchall()
+                logger.info("Fetched %d vehicles", len(rows))
+                return rows
         except Exception as e:
             logger.error("Error fetching all vehicles: %s", str(e))
             raise
-        finally:
-            if cursor: cursor.close()
-            if conn: conn.close()
-            logger.debug("DB connection closed after fetch all")
 
-    def get_vehicle_by_number(self, vehicle_no):
-        conn = None
-        cursor = None
+    @instrumented
+    def iter_vehicles(self, chunk_size=1000):
         try:
-            conn = self.db_context.get_connection()
-            cursor = conn.cursor()
-            logger.info("Fetching vehicle by number: %s", vehicle_no)
-            cursor.execute("SELECT * FROM VehicleDetails WHERE vehicle_no LIKE ?", (vehicle_no + '%',))
-            rows = cursor.fetchall()
-            logger.info("Vehicles found: %d", len(rows))
-            return rows
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Streaming all vehicles in chunks of %d", chunk_size)
+                cursor.execute(self.statements["select_all_ordered"])
+                count = 0
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    count += len(rows)
+                    yield rows
+                logger.info("Streamed %d vehicles", count)
+        except Exception as e:
+            logger.error("Error streaming vehicles: %s", str(e))
+            raise
+
+    @instrumented
+    def get_vehicles_page(self, columns, after=None, limit=100):
+        # Column names are interpolated into the SQL, so only known fields pass
+        unknown = [column for column in columns if column not in VEHICLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown vehicle fields: {', '.join(unknown)}")
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Fetching vehicle page after=%s limit=%d", after, limit)
+                if after is None:
+                    query = self.statements["select_page"].format(columns=", ".join(columns))
+                    cursor.execute(query, (limit,))
+                else:
+                    query = self.statements["select_page_after"].format(columns=", ".join(columns))
+                    cursor.execute(query, (after, limit))
+                rows = cursor.fetchall()
+                logger.info("Fetched %d vehicles", len(rows))
+                return rows
+        except Exception as e:
+            logger.error("Error fetching vehicle page: %s", str(e))
+            raise
+
+    @instrumented
+    def get_vehicle(self, vehicle_no):
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Fetching vehicle: %s", vehicle_no)
+                cursor.execute(self.statements["select_by_number"], (vehicle_no,))
+                row = cursor.fetchone()
+                logger.info("Vehicle %s", "found" if row else "not found")
+                return row
+        except Exception as e:
+            logger.error("Error fetching vehicle %s: %s", vehicle_no, str(e))
+            raise
+
+    @instrumented
+    def get_vehicle_with_version(self, vehicle_no):
+        """The vehicle's row with its version appended, read in one statement; None if missing."""
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Fetching vehicle with version: %s", vehicle_no)
+                cursor.execute(self.statements["select_by_number_versioned"], (vehicle_no,))
+                return cursor.fetchone()
+        except Exception as e:
+            logger.error("Error fetching vehicle %s: %s", vehicle_no, str(e))
+            raise
+
+    @instrumented
+    def get_vehicle_by_number(self, vehicle_no, limit=None):
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Fetching vehicle by number: %s", vehicle_no)
+                pattern = self.db_context.backend.escape_like(vehicle_no) + '%'
+                if limit is None:
+                    cursor.execute(self.statements["select_by_prefix"], (pattern,))
+                else:
+                    cursor.execute(self.statements["select_by_prefix_limited"], (pattern, limit))
+                rows = cursor.fetchall()
+                logger.info("Vehicles found: %d", len(rows))
+                return rows
         except Exception as e:
             logger.error("Error fetching vehicles starting with %s: %s", vehicle_no, str(e))
             raise
-        finally:
-            if cursor: cursor.close()
-            if conn: conn.close()
-            logger.debug("DB connection closed after fetch by number")
-
-    def update_vehicle(self, vehicle):
-        conn = None
-        cursor = None
-        try:
-            conn = self.db_context.get_connection()
-            cursor = conn.cursor()
-            logger.info("Updating vehicle: %s", vehicle.vehicle_no)
-            cursor.execute("""
-                SET NOCOUNT OFF;
-                UPDATE VehicleDetails
-                SET no_of_safety_check = ?, isCompleted = ?
-                WHERE vehicle_no = ?
-            """, (vehicle.no_of_safety_check, vehicle.isCompleted, vehicle.vehicle_no))
-            conn.commit()
-            updated = cursor.rowcount
-            if updated > 0:
-                logger.info("Vehicle updated: %s", vehicle.vehicle_no)
-            else:
+
+    @instrumented
+    def update_vehicle(self, vehicle, expected_version=None):
+        params = (vehicle.no_of_safety_check, vehicle.isCompleted, vehicle.vehicle_no)
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Updating vehicle: %s", vehicle.vehicle_no)
+                if expected_version is None:
+                    cursor.execute(self.statements["update_vehicle"], params)
+                else:
+                    # Optimistic concurrency: only the version the caller read is replaced
+                    cursor.execute(self.statements["update_vehicle_if_version"], params + (expected_version,))
+                updated = cursor.rowcount
+                if updated > 0:
+                    self._record_changes(cursor, [("update", vehicle)])
+                    conn.commit()
+                    logger.info("Vehicle updated: %s", vehicle.vehicle_no)
+                    return True
+                if expected_version is not None:
+                    cursor.execute(self.statements["select_version"], (vehicle.vehicle_no,))
+                    if cursor.fetchone() is not None:
+                        raise VersionConflictError("Vehicle was modified by another request")
                 logger.warning("Update failed - vehicle not found: %s", vehicle.vehicle_no)
-            return updated > 0
+                return False
+        except VersionConflictError:
+            logger.warning("Update rejected - version mismatch: %s", vehicle.vehicle_no)
+            raise
         except Exception as e:
             logger.error("Error updating vehicle %s: %s", vehicle.vehicle_no, str(e))
             raise
-        finally:
-            if cursor: cursor.close()
-            if conn: conn.close()
-            logger.debug("DB connection closed after update")
 
+    @instrumented
+    def update_vehicles(self, vehicles):
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                # One transaction for the whole batch; rows deleted since they
+                # were buffered match nothing and are left out of the change log
+                updated = []
+                for vehicle in vehicles:
+                    cursor.execute(self.statements["update_vehicle"],
+                                   (vehicle.no_of_safety_check, vehicle.isCompleted, vehicle.vehicle_no))
+                    if cursor.rowcount > 0:
+                        updated.append(("update", vehicle))
+                if updated:
+                    self._record_changes(cursor, updated)
+                conn.commit()
+                if len(updated) < len(vehicles):
+                    logger.warning("Batch update skipped %d vehicles no longer present", len(vehicles) - len(updated))
+                logger.info("Vehicles updated in batch: %d", len(updated))
+                return len(updated)
+        except Exception as e:
+            logger.error("Error updating %d vehicles: %s", len(vehicles), str(e))
+            raise
+
+    @instrumented
     def delete_vehicle(self, vehicle_no):
-        conn = None
-        cursor = None
         try:
-            conn = self.db_context.get_connection()
-            cursor = conn.cursor()
-            logger.info("Deleting vehicle: %s", vehicle_no)
-            cursor.execute("DELETE FROM VehicleDetails WHERE vehicle_no = ?", (vehicle_no,))
-            conn.commit()
-            deleted = cursor.rowcount
-            if deleted > 0:
-                logger.info("Vehicle deleted: %s", vehicle_no)
-            else:
-                logger.warning("Delete failed - vehicle not found: %s", vehicle_no)
-            return deleted > 0
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Deleting vehicle: %s", vehicle_no)
+                cursor.execute(self.statements["delete_vehicle"], (vehicle_no,))
+                deleted = cursor.rowcount
+                if deleted > 0:
+                    self._record_changes(cursor, [("delete", vehicle_no)])
+                conn.commit()
+                if deleted > 0:
+                    logger.info("Vehicle deleted: %s", vehicle_no)
+                else:
+                    logger.warning("Delete failed - vehicle not found: %s", vehicle_no)
+                return deleted > 0
         except Exception as e:
             logger.error("Error deleting vehicle %s: %s", vehicle_no, str(e))
             raise
-        finally:
-            if cursor: cursor.close()
-            if conn: conn.close()
-            logger.debug("DB connection closed after delete")
+
+    @instrumented
+    def get_vehicles(self, vehicle_nos, chunk_size=1000):
+        backend = self.db_context.backend
+        chunk_size = max(1, min(chunk_size, backend.max_params))
+        try:
+            rows = []
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Fetching %d vehicles in chunks of %d", len(vehicle_nos), chunk_size)
+                for start in range(0, len(vehicle_nos), chunk_size):
+                    chunk = vehicle_nos[start:start + chunk_size]
+                    query = self.statements["select_by_numbers"].format(placeholders=backend.placeholders(len(chunk)))
+                    cursor.execute(query, chunk)
+                    rows.extend(cursor.fetchall())
+            logger.info("Vehicles found: %d", len(rows))
+            return rows
+        except Exception as e:
+            logger.error("Error fetching %d vehicles: %s", len(vehicle_nos), str(e))
+            raise
+
+    @instrumented
+    def delete_vehicles(self, vehicle_nos, chunk_size=1000):
+        """Deletes the given vehicles in one transaction; returns the vehicle numbers that existed."""
+        backend = self.db_context.backend
+        chunk_size = max(1, min(chunk_size, backend.max_params))
+        try:
+            deleted = []
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Deleting %d vehicles in chunks of %d", len(vehicle_nos), chunk_size)
+                for start in range(0, len(vehicle_nos), chunk_size):
+                    chunk = vehicle_nos[start:start + chunk_size]
+                    query = self.statements["delete_vehicles"].format(placeholders=backend.placeholders(len(chunk)))
+                    # The statement returns the rows it removed, so the result
+                    # cannot disagree with a concurrent delete
+                    cursor.execute(query, chunk)
+                    deleted.extend(row[0] for row in cursor.fetchall())
+                if deleted:
+                    self._record_changes(cursor, [("delete", vehicle_no) for vehicle_no in deleted])
+                conn.commit()
+            logger.info("Vehicles deleted in batch: %d", len(deleted))
+            return deleted
+        except Exception as e:
+            logger.error("Error deleting %d vehicles: %s", len(vehicle_nos), str(e))
+            raise
+
+    @instrumented
+    def get_vehicle_version(self, vehicle_no):
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                cursor.execute(self.statements["select_version"], (vehicle_no,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error("Error fetching version of vehicle %s: %s", vehicle_no, str(e))
+            raise
+
+    @instrumented
+    def get_changes(self, since, limit=1000):
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                cursor.execute(self.statements["select_changes"], (since, limit))
+                rows = cursor.fetchall()
+                logger.debug("Fetched %d changes after seq %s", len(rows), since)
+                return rows
+        except Exception as e:
+            logger.error("Error fetching changes after seq %s: %s", since, str(e))
+            raise
+
+    @instrumented
+    def get_vehicle_stats(self, prefix_length=None):
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                logger.info("Aggregating vehicle stats (prefix_length=%s)", prefix_length)
+                if prefix_length is None:
+                    cursor.execute(self.statements["select_stats"])
+                else:
+                    cursor.execute(self.statements["select_stats_by_prefix"], (prefix_length,))
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error("Error aggregating vehicle stats: %s", str(e))
+            raise
+
+    @instrumented
+    def get_change_counter(self):
+        try:
+            with self.db_context.connection() as conn, closing(conn.cursor()) as cursor:
+                cursor.execute(self.statements["select_change_counter"])
+                row = cursor.fetchone()
+                # None when the counter table has not been seeded
+                return row[0] if row else None
+        except Exception as e:
+            logger.error("Error fetching change counter: %s", str(e))
+            raise
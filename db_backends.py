@@ -0,0 +1,281 @@
+import sqlite3
+import uuid
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+VEHICLE_FIELDS = ("vehicle_no", "no_of_safety_check", "isCompleted")
+VEHICLE_COLUMNS = ", ".join(VEHICLE_FIELDS)
+CHANGE_COLUMNS = "seq, operation, vehicle_no, no_of_safety_check, isCompleted"
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS VehicleDetails (
+        vehicle_no VARCHAR(10) PRIMARY KEY,
+        no_of_safety_check INT,
+        isCompleted TINYINT,
+        version INT NOT NULL DEFAULT 1
+    )
+    """,
+    # One row, bumped by every write, so "has anything changed?" never scans
+    """
+    CREATE TABLE IF NOT EXISTS VehicleChangeCounter (
+        id INT PRIMARY KEY,
+        value BIGINT NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO VehicleChangeCounter (id, value) VALUES (1, 0)",
+    # Append-only; seq is the counter value after the change, so the two agree
+    """
+    CREATE TABLE IF NOT EXISTS VehicleChangeLog (
+        seq BIGINT PRIMARY KEY,
+        operation VARCHAR(6) NOT NULL,
+        vehicle_no VARCHAR(10) NOT NULL,
+        no_of_safety_check INT,
+        isCompleted TINYINT
+    )
+    """,
+]
+
+# Timeout expired, deadlock victim, and lost connection during a transaction
+MSSQL_TRANSIENT_SQLSTATES = {"HYT00", "HYT01", "40001", "40003"}
+SQLITE_TRANSIENT_MESSAGES = ("database is locked", "database table is locked", "unable to open database file",
+                             "disk I/O error")
+
+
+class SqlBackend:
+    name = None
+    health_check_query = "SELECT 1"
+    integrity_errors = ()
+    pool_defaults = {}
+    # Most connections the engine can use at once; None for no limit
+    max_pool_size = None
+    # Upper bound on bind parameters in one statement
+    max_params = 999
+    fast_executemany = False
+    like_special = "\\%_"
+
+    statements = {
+        "insert_vehicle": f"INSERT INTO VehicleDetails ({VEHICLE_COLUMNS}) VALUES (?, ?, ?)",
+        "select_all": f"SELECT {VEHICLE_COLUMNS} FROM VehicleDetails",
+        "select_all_ordered": f"SELECT {VEHICLE_COLUMNS} FROM VehicleDetails ORDER BY vehicle_no",
+        "select_by_prefix": f"SELECT {VEHICLE_COLUMNS} FROM VehicleDetails WHERE vehicle_no LIKE ? ESCAPE '\\'",
+        "select_by_prefix_limited": f"""
+            SELECT {VEHICLE_COLUMNS} FROM VehicleDetails
+            WHERE vehicle_no LIKE ? ESCAPE '\\' ORDER BY vehicle_no LIMIT ?
+        """,
+        "select_by_number": f"SELECT {VEHICLE_COLUMNS} FROM VehicleDetails WHERE vehicle_no = ?",
+        "select_by_number_versioned": f"SELECT {VEHICLE_COLUMNS}, version FROM VehicleDetails WHERE vehicle_no = ?",
+        "update_vehicle": """
+            UPDATE VehicleDetails
+            SET no_of_safety_check = ?, isCompleted = ?, version = version + 1
+            WHERE vehicle_no = ?
+        """,
+        "update_vehicle_if_version": """
+            UPDATE VehicleDetails
+            SET no_of_safety_check = ?, isCompleted = ?, version = version + 1
+            WHERE vehicle_no = ? AND version = ?
+        """,
+        "select_version": "SELECT version FROM VehicleDetails WHERE vehicle_no = ?",
+        "select_change_counter": "SELECT value FROM VehicleChangeCounter WHERE id = 1",
+        "bump_change_counter": "UPDATE VehicleChangeCounter SET value = value + ? WHERE id = 1 RETURNING value",
+        "insert_change": f"INSERT INTO VehicleChangeLog ({CHANGE_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+        "select_changes": f"SELECT {CHANGE_COLUMNS} FROM VehicleChangeLog WHERE seq > ? ORDER BY seq LIMIT ?",
+        "delete_vehicle": "DELETE FROM VehicleDetails WHERE vehicle_no = ?",
+        # A histogram small enough to summarise in Python: one row per distinct
+        # (no_of_safety_check, isCompleted) pair, optionally per plate prefix
+        "select_stats": """
+            SELECT no_of_safety_check, isCompleted, COUNT(*) FROM VehicleDetails
+            GROUP BY no_of_safety_check, isCompleted
+        """,
+        "select_stats_by_prefix": """
+            SELECT prefix, no_of_safety_check, isCompleted, COUNT(*)
+            FROM (SELECT SUBSTR(vehicle_no, 1, ?) AS prefix, no_of_safety_check, isCompleted FROM VehicleDetails) AS v
+            GROUP BY prefix, no_of_safety_check, isCompleted
+        """,
+        "select_existing": "SELECT vehicle_no FROM VehicleDetails WHERE vehicle_no IN ({placeholders})",
+        "select_by_numbers": f"SELECT {VEHICLE_COLUMNS} FROM VehicleDetails WHERE vehicle_no IN ({{placeholders}})",
+        "delete_vehicles": "DELETE FROM VehicleDetails WHERE vehicle_no IN ({placeholders}) RETURNING vehicle_no",
+        "select_page": "SELECT {columns} FROM VehicleDetails ORDER BY vehicle_no LIMIT ?",
+        "select_page_after": "SELECT {columns} FROM VehicleDetails WHERE vehicle_no > ? ORDER BY vehicle_no LIMIT ?",
+        "upsert_vehicle": f"""
+            INSERT INTO VehicleDetails ({VEHICLE_COLUMNS}) VALUES (?, ?, ?)
+            ON CONFLICT (vehicle_no) DO UPDATE
+            SET no_of_safety_check = excluded.no_of_safety_check, isCompleted = excluded.isCompleted,
+                version = VehicleDetails.version + 1
+            RETURNING version
+        """,
+    }
+
+    def connect(self):
+        raise NotImplementedError
+
+    def is_integrity_error(self, error):
+        return isinstance(error, self.integrity_errors)
+
+    def is_transient_error(self, error):
+        """True for failures worth retrying: the server, not the statement, is the problem."""
+        return False
+
+    def escape_like(self, text):
+        return "".join("\\" + char if char in self.like_special else char for char in text)
+
+    def placeholders(self, count):
+        return ", ".join("?" * count)
+
+
+class MssqlBackend(SqlBackend):
+    name = "mssql"
+    max_params = 2000
+    fast_executemany = True
+    like_special = "\\%_["
+
+    statements = dict(SqlBackend.statements, select_page="""
+            SELECT {columns} FROM VehicleDetails ORDER BY vehicle_no
+            OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+        """, select_page_after="""
+            SELECT {columns} FROM VehicleDetails WHERE vehicle_no > ? ORDER BY vehicle_no
+            OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+        """, select_by_prefix_limited=f"""
+            SELECT {VEHICLE_COLUMNS} FROM VehicleDetails
+            WHERE vehicle_no LIKE ? ESCAPE '\\' ORDER BY vehicle_no
+            OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+        """, select_changes=f"""
+            SELECT {CHANGE_COLUMNS} FROM VehicleChangeLog WHERE seq > ? ORDER BY seq
+            OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+        """, select_stats_by_prefix="""
+            SELECT prefix, no_of_safety_check, isCompleted, COUNT(*)
+            FROM (SELECT SUBSTRING(vehicle_no, 1, ?) AS prefix, no_of_safety_check, isCompleted
+                  FROM VehicleDetails) AS v
+            GROUP BY prefix, no_of_safety_check, isCompleted
+        """, delete_vehicles="""
+            DELETE FROM VehicleDetails OUTPUT deleted.vehicle_no WHERE vehicle_no IN ({placeholders})
+        """, bump_change_counter="""
+            UPDATE VehicleChangeCounter SET value = value + ? OUTPUT inserted.value WHERE id = 1
+        """, update_vehicle="""
+            SET NOCOUNT OFF;
+            UPDATE VehicleDetails
+            SET no_of_safety_check = ?, isCompleted = ?, version = version + 1
+            WHERE vehicle_no = ?
+        """, update_vehicle_if_version="""
+            SET NOCOUNT OFF;
+            UPDATE VehicleDetails
+            SET no_of_safety_check = ?, isCompleted = ?, version = version + 1
+            WHERE vehicle_no = ? AND version = ?
+        """, upsert_vehicle="""
+            MERGE VehicleDetails WITH (HOLDLOCK) AS target
+            USING (SELECT ? AS vehicle_no, ? AS no_of_safety_check, ? AS isCompleted) AS source
+            ON target.vehicle_no = source.vehicle_no
+            WHEN MATCHED THEN
+                UPDATE SET no_of_safety_check = source.no_of_safety_check, isCompleted = source.isCompleted,
+                           version = target.version + 1
+            WHEN NOT MATCHED THEN
+                INSERT (vehicle_no, no_of_safety_check, isCompleted)
+                VALUES (source.vehicle_no, source.no_of_safety_check, source.isCompleted)
+            OUTPUT inserted.version;
+        """)
+
+    def __init__(self, connection_string, connect_timeout=None, query_timeout=None):
+        self.connection_string = connection_string
+        # Seconds; None leaves the driver default, which can block for a
+        # long time while the server is failing over
+        self.connect_timeout = connect_timeout
+        self.query_timeout = query_timeout
+
+    @property
+    def integrity_errors(self):
+        import pyodbc
+        return (pyodbc.IntegrityError,)
+
+    def is_transient_error(self, error):
+        try:
+            import pyodbc
+        except ImportError:
+            return False
+        if isinstance(error, (pyodbc.OperationalError, pyodbc.InterfaceError)):
+            return True
+        sqlstate = str(error.args[0]) if isinstance(error, pyodbc.Error) and error.args else ""
+        return sqlstate.startswith("08") or sqlstate in MSSQL_TRANSIENT_SQLSTATES
+
+    def connect(self):
+        # Imported lazily so the other engines work without an ODBC driver
+        import pyodbc
+        if self.connect_timeout:
+            conn = pyodbc.connect(self.connection_string, timeout=self.connect_timeout)
+        else:
+            conn = pyodbc.connect(self.connection_string)
+        if self.query_timeout:
+            conn.timeout = self.query_timeout
+        return conn
+
+
+class SqliteBackend(SqlBackend):
+    name = "sqlite"
+    integrity_errors = (sqlite3.IntegrityError,)
+
+    def __init__(self, path, uri=False, timeout=30):
+        self.path = path
+        self.uri = uri
+        # How long a statement waits on another connection's lock
+        self.timeout = timeout
+
+    def is_transient_error(self, error):
+        # OperationalError also covers SQL mistakes, so go by the message
+        return isinstance(error, sqlite3.OperationalError) and any(
+            text in str(error) for text in SQLITE_TRANSIENT_MESSAGES)
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, uri=self.uri, check_same_thread=False, timeout=self.timeout)
+        if not self.uri and self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        self._migrate(conn)
+        conn.commit()
+        return conn
+
+    def _migrate(self, conn):
+        # Databases created before row versioning lack the version column
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(VehicleDetails)")}
+        if "version" not in columns:
+            logger.info("Adding version column to VehicleDetails")
+            conn.execute("ALTER TABLE VehicleDetails ADD COLUMN version INT NOT NULL DEFAULT 1")
+
+
+class MemoryBackend(SqliteBackend):
+    name = "memory"
+    # A shared-cache memory database locks per table, so connections are
+    # serialised through a single pooled connection, whatever DbPool says.
+    pool_defaults = {"max_size": 1}
+    max_pool_size = 1
+
+    def __init__(self, name=None):
+        super().__init__(f"file:vehicles-{name or uuid.uuid4().hex}?mode=memory&cache=shared", uri=True)
+        # The database lives only while at least one connection is open, so
+        # keep an anchor connection for the lifetime of the backend.
+        self._anchor = super().connect()
+
+    def close(self):
+        self._anchor.close()
+
+
+BACKENDS = {
+    MssqlBackend.name: MssqlBackend,
+    SqliteBackend.name: SqliteBackend,
+    MemoryBackend.name: MemoryBackend,
+}
+
+
+def create_backend(engine, connection_string=None, connect_timeout=None, query_timeout=None):
+    try:
+        backend_class = BACKENDS[engine]
+    except KeyError:
+        raise ValueError(f"Unknown database engine: {engine}")
+    logger.info("Using %s database backend", engine)
+    if backend_class is MemoryBackend:
+        return MemoryBackend()
+    if backend_class is SqliteBackend:
+        # SQLite only ever blocks on locks
+        return SqliteBackend(connection_string, timeout=query_timeout or 30)
+    return backend_class(connection_string, connect_timeout=connect_timeout, query_timeout=query_timeout)
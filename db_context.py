@@ -1,8 +1,28 @@
-import pyodbc
+import time
+from contextlib import contextmanager
+
+from connection_pool import ConnectionPool
+from db_backends import MssqlBackend
+from metrics import InstrumentedConnection, record_db_phase
+
 
 class DatabaseContext:
-    def __init__(self, connection_string):
-        self.connection_string = connection_string
+    def __init__(self, backend, **pool_options):
+        # A bare connection string keeps the original SQL Server behaviour
+        if isinstance(backend, str):
+            backend = MssqlBackend(backend)
+        self.backend = backend
+        options = dict(backend.pool_defaults, health_check_query=backend.health_check_query,
+                       size_limit=backend.max_pool_size)
+        options.update(pool_options)
+        self.pool = ConnectionPool(backend.connect, **options)
+
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        with self.pool.connection() as conn:
+            record_db_phase("acquire", time.perf_counter() - start)
+            yield InstrumentedConnection(conn)
 
-    def get_connection(self):
-        return pyodbc.connect(self.connection_string)
\ No newline at end of file
+    def close(self):
+        self.pool.close()
@@ -1,5 +1,45 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(slots=True)
 class Vehicle:
-    def __init__(self,vehicle_no, no_of_safety_check, isCompleted):
-        self.vehicle_no = vehicle_no
-        self.no_of_safety_check = no_of_safety_check
-        self.isCompleted = isCompleted
+    vehicle_no: str
+    no_of_safety_check: Optional[int]
+    isCompleted: Optional[bool]
+
+    def __post_init__(self):
+        # The column is a TINYINT, so rows come back as 0/1
+        if self.isCompleted is not None:
+            self.isCompleted = bool(self.isCompleted)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row[0], row[1], row[2])
+
+    def to_dict(self):
+        return {"vehicle_no": self.vehicle_no,
+                "no_of_safety_check": self.no_of_safety_check,
+                "isCompleted": self.isCompleted}
+
+
+class VehicleRows(Sequence):
+    """(vehicle_no, no_of_safety_check, isCompleted) rows that read as Vehicle objects.
+
+    Listings return these so the encoders can work on the rows directly; a
+    Vehicle is only built for an item that is actually accessed.
+    """
+
+    __slots__ = ("rows",)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return VehicleRows(self.rows[index])
+        return Vehicle.from_row(self.rows[index])
@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+
+# Loaded by `gunicorn -c gunicorn.conf.py`; every value can be overridden
+# through the VEHICLE_API_* environment variables below.
+wsgi_app = "wsgi:application"
+bind = os.environ.get("VEHICLE_API_BIND", "0.0.0.0:5000")
+
+# Requests mostly wait on the database, so each worker also runs a few
+# threads. Keep DbPool.max_size >= threads to avoid queueing on the pool.
+workers = int(os.environ.get("VEHICLE_API_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("VEHICLE_API_THREADS", 4))
+timeout = int(os.environ.get("VEHICLE_API_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app and build the Swagger spec once in the master; workers
+# inherit it through fork instead of each paying for it.
+preload_app = True
+
+
+def post_fork(server, worker):
+    # The connection pool discards anything inherited from the master, so
+    # each worker opens its own connections here, before the first request.
+    from wsgi import application
+    from app import warmup
+
+    warmup(application, swagger=False)
@@ -1,31 +1,209 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
 
+DEFAULT_LOGGING_SETTINGS = {
+    "level": "DEBUG",
+    "console": True,
+    "json": False,
+    # Fraction of records below WARNING that are kept; 1.0 keeps everything
+    "sample_rate": 1.0,
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "queue_size": 10000,
+}
 
-def setup_logger(name):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+_lock = threading.RLock()
+_settings = None
+_queue_handler = None
+_listener = None
+_logger_names = set()
+
+# Set per request by the web layer and stamped onto every log record
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Hot-path mode: keeps every WARNING and above, samples the rest."""
+
+    def __init__(self, sample_rate=1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        return (record.levelno >= logging.WARNING
+                or self.sample_rate >= 1.0
+                or random.random() < self.sample_rate)
 
-    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Drops records instead of blocking the caller when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The queue never leaves this process, so only the message arguments
+        # are merged now (they may be mutated later); copying and formatting
+        # the record is left to the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _load_settings():
+    settings = dict(DEFAULT_LOGGING_SETTINGS)
+    try:
+        from config import get_logging_settings
+        settings.update(get_logging_settings())
+    except Exception:
+        # Logging must come up even when the config file is missing or broken
+        pass
+    return settings
+
+
+def _build_handlers(settings):
+    if settings["json"]:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s [%(request_id)s]: %(message)s',
+                                      defaults={"request_id": "-"})
 
     # General logs
-    info_handler = logging.FileHandler("app.log")
+    info_handler = logging.handlers.RotatingFileHandler(
+        "app.log", maxBytes=settings["max_bytes"], backupCount=settings["backup_count"], delay=True)
     info_handler.setLevel(logging.INFO)
     info_handler.setFormatter(formatter)
 
     # Error logs
-    error_handler = logging.FileHandler("error.log")
+    error_handler = logging.handlers.RotatingFileHandler(
+        "error.log", maxBytes=settings["max_bytes"], backupCount=settings["backup_count"], delay=True)
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
 
+    handlers = [info_handler, error_handler]
+
     # Console
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-
-    # Avoid duplicate logs
-    if not logger.handlers:
-        logger.addHandler(info_handler)
-        logger.addHandler(error_handler)
-        logger.addHandler(console_handler)
+    if settings["console"]:
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+    return handlers
+
+
+def _stop_listener():
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+def configure_logging(settings=None):
+    """(Re)build the logging pipeline; safe to call again to apply new settings."""
+    global _settings, _queue_handler, _listener
+    with _lock:
+        _settings = dict(DEFAULT_LOGGING_SETTINGS, **(settings if settings is not None else _load_settings()))
+        if _queue_handler is None:
+            _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=_settings["queue_size"]))
+            # No output handler takes DEBUG, so don't spend a queue slot on it
+            _queue_handler.setLevel(logging.INFO)
+            _queue_handler.addFilter(SamplingFilter())
+            # Runs on the caller's thread, where the request's context is set
+            _queue_handler.addFilter(RequestIdFilter())
+            atexit.register(_stop_listener)
+        _queue_handler.filters[0].sample_rate = _settings["sample_rate"]
+
+        # File and console I/O happen on the listener thread, never the caller's
+        _stop_listener()
+        _listener = logging.handlers.QueueListener(
+            _queue_handler.queue, *_build_handlers(_settings), respect_handler_level=True)
+        _listener.start()
+
+        for name in _logger_names:
+            logging.getLogger(name).setLevel(_settings["level"])
+    return _queue_handler
+
+
+def _restart_after_fork():
+    # Only the forking thread survives fork, so the listener is gone in the
+    # child (e.g. gunicorn workers forked from a preload_app master) and the
+    # queue's locks may have been held by it. Start over with an empty queue;
+    # records still queued at fork belong to the parent, which writes them.
+    global _lock, _listener
+    _lock = threading.RLock()
+    if _queue_handler is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=_settings["queue_size"])
+    if _listener is not None:
+        _listener = logging.handlers.QueueListener(
+            _queue_handler.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def flush_logging():
+    # Drain the queue by restarting the listener; used at shutdown and in tests
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+def logging_stats():
+    with _lock:
+        return {"dropped": _queue_handler.dropped if _queue_handler else 0,
+                "queued": _queue_handler.queue.qsize() if _queue_handler else 0}
+
+
+def setup_logger(name):
+    with _lock:
+        handler = _queue_handler if _queue_handler is not None else configure_logging()
+        logger = logging.getLogger(name)
+        logger.setLevel(_settings["level"])
+        _logger_names.add(name)
+
+        # Avoid duplicate logs
+        if not logger.handlers:
+            logger.addHandler(handler)
 
     return logger
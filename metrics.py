@@ -0,0 +1,231 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Repository method currently running on this thread/task, used to label spans
+current_operation = contextvars.ContextVar('current_operation', default='unknown')
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for index, count in enumerate(self.counts):
+                if seen + count >= rank and count:
+                    lower = self.buckets[index - 1] if index > 0 else 0.0
+                    upper = self.buckets[index] if index < len(self.buckets) else self.max
+                    # Linear interpolation inside the bucket
+                    return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+                seen += count
+            return self.max
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, (help_text, {}))
+            histogram = family[1].get(key)
+            if histogram is None:
+                histogram = family[1][key] = Histogram()
+        return histogram
+
+    def observe(self, name, help_text, value, **labels):
+        self.histogram(name, help_text, **labels).observe(value)
+
+    def render(self, gauges=()):
+        lines = []
+        with self._lock:
+            families = {name: (help_text, dict(series)) for name, (help_text, series) in self._families.items()}
+        for name, (help_text, series) in sorted(families.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in sorted(series.items()):
+                counts, count, total = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(key)} {total}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+
+            quantile_name = name + "_quantile"
+            lines.append(f"# HELP {quantile_name} Estimated p50/p95/p99 of {name}")
+            lines.append(f"# TYPE {quantile_name} gauge")
+            for key, histogram in sorted(series.items()):
+                for q in QUANTILES:
+                    lines.append(f"{quantile_name}{_labels(key + (('quantile', str(q)),))} {histogram.percentile(q)}")
+
+        for name, help_text, metric_type, samples in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._families.clear()
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def record_db_phase(phase, seconds):
+    REGISTRY.observe("vehicle_db_phase_seconds", "Time spent per repository method and database phase",
+                     seconds, method=current_operation.get(), phase=phase)
+
+
+@contextmanager
+def span(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_db_phase(phase, time.perf_counter() - start)
+
+
+def instrumented(func):
+    """Times a repository method and labels its database spans with its name."""
+    name = func.__name__
+
+    def observe(start):
+        REGISTRY.observe("vehicle_repository_seconds", "Time spent in VehicleRepository methods",
+                         time.perf_counter() - start, method=name)
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            token = current_operation.set(name)
+            try:
+                yield from func(*args, **kwargs)
+            finally:
+                try:
+                    current_operation.reset(token)
+                except ValueError:
+                    # Resumed from a different context than the one it started in
+                    pass
+                observe(start)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        token = current_operation.set(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            current_operation.reset(token)
+            observe(start)
+    return wrapper
+
+
+class InstrumentedCursor:
+    __slots__ = ('_cursor',)
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def _timed(self, phase, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            record_db_phase(phase, time.perf_counter() - start)
+
+    def execute(self, *args):
+        return self._timed("execute", self._cursor.execute, *args)
+
+    def executemany(self, *args):
+        return self._timed("execute", self._cursor.executemany, *args)
+
+    def fetchone(self):
+        return self._timed("fetch", self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._timed("fetch", self._cursor.fetchall)
+
+    def fetchmany(self, *args):
+        return self._timed("fetch", self._cursor.fetchmany, *args)
+
+    def close(self):
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    __slots__ = ('_conn',)
+
+    def __init__(self, conn):
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor())
+
+    def commit(self):
+        with span("commit"):
+            self._conn.commit()
+
+    def rollback(self):
+        with span("rollback"):
+            self._conn.rollback()
@@ -0,0 +1,217 @@
+import functools
+import inspect
+import random
+import threading
+import time
+
+from connection_pool import PoolTimeoutError
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Repository methods that only read, so running them again is harmless
+READ_METHODS = frozenset({
+    "get_all_vehicles", "get_vehicles_page", "get_vehicle", "get_vehicle_with_version", "get_vehicle_by_number",
+    "get_vehicles", "get_vehicle_version", "get_changes", "get_vehicle_stats", "get_change_counter",
+})
+
+
+class DatabaseUnavailableError(Exception):
+    """The database could not be reached, or kept failing, within the retry budget."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(DatabaseUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling the database after failure_threshold failures in a row.
+
+    While open every call is rejected straight away. After reset_timeout
+    seconds one trial call is let through (half-open): success closes the
+    breaker, failure opens it for another reset_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    STATES = (CLOSED, OPEN, HALF_OPEN)
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._failures = 0
+        self._rejected = 0
+        self._opened = 0
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    def _retry_after(self):
+        if self._state == self.CLOSED:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def before_call(self):
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self._rejected += 1
+            retry_after = self._retry_after()
+        raise CircuitOpenError("Database circuit breaker is open", retry_after=retry_after)
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Database circuit breaker closed")
+            self._state = self.CLOSED
+            self._consecutive = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._consecutive += 1
+            if self._state == self.HALF_OPEN or self._consecutive >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._opened += 1
+                    logger.warning("Database circuit breaker opened after %d consecutive failures; "
+                                   "retrying in %ss", self._consecutive, self.reset_timeout)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {"state": self._current_state(), "consecutive_failures": self._consecutive,
+                    "failures": self._failures, "rejected": self._rejected, "opened": self._opened,
+                    "retry_after": round(self._retry_after(), 3)}
+
+
+class ResilientRepository:
+    """Puts a circuit breaker in front of every VehicleRepository method.
+
+    Errors the backend reports as transient (lost connections, timeouts,
+    deadlocks, a locked database) and pool timeouts count against the
+    breaker and surface as DatabaseUnavailableError. Reads in READ_METHODS
+    are retried with full-jitter exponential backoff first; writes are not,
+    since a lost reply does not tell whether the commit happened. Any other
+    error means the database answered, and is raised unchanged.
+    """
+
+    def __init__(self, repo, breaker=None, retries=2, backoff=0.05, max_backoff=1.0):
+        self.repo = repo
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._retried = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.repo, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        if inspect.isgeneratorfunction(attr):
+            wrapped = self._wrap_generator(attr)
+        else:
+            wrapped = self._wrap(attr, retry=name in READ_METHODS)
+        # Later lookups find the wrapper directly
+        setattr(self, name, wrapped)
+        return wrapped
+
+    def _is_failure(self, error):
+        return isinstance(error, PoolTimeoutError) or self.repo.db_context.backend.is_transient_error(error)
+
+    def _failed(self, error):
+        """Records the outcome of a failed call; returns the error the caller should see."""
+        if not self._is_failure(error):
+            self.breaker.record_success()
+            return error
+        self.breaker.record_failure()
+        retry_after = self.breaker.stats()["retry_after"] or None
+        return DatabaseUnavailableError(f"Database unavailable: {error}", retry_after=retry_after)
+
+    def _delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _wrap(self, func, retry):
+        attempts = self.retries + 1 if retry else 1
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                self.breaker.before_call()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    error = self._failed(e)
+                    if error is e:
+                        raise
+                    # A pool timeout already waited its full timeout
+                    if attempt + 1 < attempts and not isinstance(e, PoolTimeoutError):
+                        delay = self._delay(attempt)
+                        logger.warning("Retrying %s in %.3fs after transient error: %s", func.__name__, delay, str(e))
+                        self._retried += 1
+                        time.sleep(delay)
+                        continue
+                    raise error from e
+                self.breaker.record_success()
+                return result
+        return wrapper
+
+    def _wrap_generator(self, func):
+        # Rows already streamed can't be taken back, so generators are never retried
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.breaker.before_call()
+            try:
+                yield from func(*args, **kwargs)
+            except GeneratorExit:
+                # The consumer stopped early; the rows it got came from a working database
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                error = self._failed(e)
+                if error is e:
+                    raise
+                raise error from e
+            self.breaker.record_success()
+        return wrapper
+
+    def resilience_stats(self):
+        return dict(self.breaker.stats(), retries=self._retried)
+
+
+def create_resilient_repository(settings, repo):
+    if not settings.get("enabled", True):
+        return repo
+    breaker = CircuitBreaker(failure_threshold=settings.get("failure_threshold", 5),
+                             reset_timeout=settings.get("reset_timeout", 30.0))
+    logger.info("Database circuit breaker enabled (failure_threshold=%s, reset_timeout=%ss, retries=%s)",
+                breaker.failure_threshold, breaker.reset_timeout, settings.get("retries", 2))
+    return ResilientRepository(repo, breaker, retries=settings.get("retries", 2),
+                               backoff=settings.get("retry_backoff", 0.05),
+                               max_backoff=settings.get("retry_max_backoff", 1.0))
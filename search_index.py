@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import defaultdict
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _grams(text, sizes):
+    return {text[i:i + n] for n in sizes for i in range(len(text) - n + 1)}
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+class NGramIndex:
+    """In-memory bigram/trigram index over vehicle numbers.
+
+    Serves substring ("contains") and fuzzy plate searches without scanning
+    the table. Rows are kept as (vehicle_no, no_of_safety_check, isCompleted)
+    tuples keyed by the upper-cased plate. seq is the change-log position
+    the index reflects, for callers that keep it up to date from the log.
+    """
+
+    GRAM_SIZES = (2, 3)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._postings = defaultdict(set)
+        self.built_at = None
+        self.seq = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def build(self, rows, seq=None):
+        with self._lock:
+            self._rows.clear()
+            self._postings.clear()
+            for row in rows:
+                self._add(tuple(row))
+            self.seq = seq
+            self.built_at = time.monotonic()
+        logger.info("Search index built with %d vehicles", len(self._rows))
+
+    def _add(self, row):
+        key = row[0].upper()
+        if key in self._rows:
+            self._remove(key)
+        self._rows[key] = row
+        for gram in _grams(key, self.GRAM_SIZES):
+            self._postings[gram].add(key)
+
+    def _remove(self, key):
+        if self._rows.pop(key, None) is None:
+            return
+        for gram in _grams(key, self.GRAM_SIZES):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def add(self, row):
+        with self._lock:
+            self._add(tuple(row))
+
+    def remove(self, vehicle_no):
+        with self._lock:
+            self._remove(vehicle_no.upper())
+
+    def contains(self, query, limit=None):
+        query = query.upper()
+        with self._lock:
+            size = min(len(query), max(self.GRAM_SIZES))
+            if size < min(self.GRAM_SIZES):
+                candidates = self._rows.keys()
+            else:
+                postings = sorted((self._postings.get(gram, ()) for gram in _grams(query, (size,))), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:]) if postings else set()
+            keys = sorted(key for key in candidates if query in key)
+            return [self._rows[key] for key in keys[:limit]]
+
+    def fuzzy(self, query, limit=None, threshold=0.3, max_edits=None):
+        """Plates similar to query, closest first.
+
+        A plate matches when its gram sets overlap by at least threshold
+        (Jaccard), or when it is within max_edits single-character edits of
+        query; by default one edit per six characters, at least one.
+        """
+        query = query.upper()
+        query_grams = _grams(query, self.GRAM_SIZES)
+        if not query_grams:
+            return self.contains(query, limit)
+        if max_edits is None:
+            max_edits = max(1, len(query) // 6)
+        # Each edit destroys at most one gram of every size, so a plate within
+        # max_edits keeps at least this many of the query's grams
+        min_shared = len(query_grams) - max_edits * sum(self.GRAM_SIZES)
+        with self._lock:
+            shared = defaultdict(int)
+            for gram in query_grams:
+                for key in self._postings.get(gram, ()):
+                    shared[key] += 1
+            scored = []
+            for key, count in shared.items():
+                # Jaccard similarity over the gram sets
+                score = count / (len(query_grams) + len(_grams(key, self.GRAM_SIZES)) - count)
+                edits = _edit_distance(query, key, max_edits) if count >= min_shared else max_edits + 1
+                if score >= threshold or edits <= max_edits:
+                    scored.append((edits, -score, key))
+            scored.sort()
+            return [self._rows[key] for _, _, key in scored[:limit]]
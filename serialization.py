@@ -0,0 +1,121 @@
+import json
+from json.encoder import encode_basestring_ascii
+
+from entity import VehicleRows
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+# One array per field instead of one object per vehicle, so keys are sent once
+COLUMNAR_JSON = "application/vnd.vehicle.columnar+json"
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+# Appended to a strong ETag, since each encoding is a different representation
+ETAG_SUFFIXES = {COLUMNAR_JSON: "columnar", MSGPACK: "msgpack", "application/x-msgpack": "msgpack"}
+
+# One vehicle row rendered straight from its three columns, no dict in between
+_ROW_TEMPLATE = '{"vehicle_no":%s,"no_of_safety_check":%s,"isCompleted":%s}'
+_BOOLEANS = {True: "true", False: "false", None: "null"}
+# Rows per orjson call in encode_rows: large enough to amortise the call,
+# small enough that the dicts built for it never add up to the whole listing
+_ROW_CHUNK = 1000
+
+
+def _default(obj):
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    if isinstance(obj, VehicleRows):
+        # Only when nested in a larger payload; dumps encodes them directly
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Encodes a response payload to UTF-8 JSON bytes; Vehicle objects are supported directly."""
+    if isinstance(payload, VehicleRows):
+        return encode_rows(payload.rows)
+    if orjson is not None:
+        # orjson writes slotted dataclasses natively and only falls back to
+        # _default for other objects
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode()
+
+
+def _scalar(value):
+    if type(value) is int:
+        return str(value)
+    return json.dumps(value)
+
+
+def encode_row(row):
+    vehicle_no, no_of_safety_check, is_completed = row[0], row[1], row[2]
+    if is_completed is not None:
+        is_completed = bool(is_completed)
+    return _ROW_TEMPLATE % (
+        encode_basestring_ascii(vehicle_no) if isinstance(vehicle_no, str) else "null",
+        _scalar(no_of_safety_check),
+        _BOOLEANS[is_completed])
+
+
+def _orjson_rows(rows):
+    return orjson.dumps([{"vehicle_no": row[0], "no_of_safety_check": row[1],
+                          "isCompleted": None if row[2] is None else bool(row[2])} for row in rows])
+
+
+def encode_rows(rows):
+    """Encodes (vehicle_no, no_of_safety_check, isCompleted) rows as a JSON array.
+
+    With orjson the rows are encoded in chunks and spliced into one buffer;
+    without it each row goes through the string template.
+    """
+    if orjson is None:
+        return ("[" + ",".join(map(encode_row, rows)) + "]").encode()
+    if not isinstance(rows, (list, tuple)):
+        rows = list(rows)
+    body = bytearray(b"[")
+    for start in range(0, len(rows), _ROW_CHUNK):
+        if start:
+            body += b","
+        body += memoryview(_orjson_rows(rows[start:start + _ROW_CHUNK]))[1:-1]
+    body += b"]"
+    return bytes(body)
+
+
+def encode_rows_ndjson(rows):
+    return "".join(encode_row(row) + "\n" for row in rows)
+
+
+def vehicle_media_types():
+    """Media types vehicle reads can be encoded as, JSON first so that */* picks it."""
+    return (JSON, COLUMNAR_JSON) + (MSGPACK_ALIASES if msgpack is not None else ())
+
+
+def to_columns(records, fields=("vehicle_no", "no_of_safety_check", "isCompleted")):
+    """Turns Vehicle objects, VehicleRows or field dicts into {field: [value per record]}."""
+    if isinstance(records, VehicleRows):
+        columns = dict(zip(("vehicle_no", "no_of_safety_check", "isCompleted"),
+                           (list(column) for column in zip(*records.rows)))) if records.rows else {}
+        if "isCompleted" in columns:
+            columns["isCompleted"] = [None if value is None else bool(value) for value in columns["isCompleted"]]
+        return {field: columns.get(field, []) for field in fields}
+    records = list(records)
+    if records and isinstance(records[0], dict):
+        return {field: [record[field] for record in records] for field in fields}
+    return {field: [getattr(record, field) for record in records] for field in fields}
+
+
+def encode(payload, media_type=JSON):
+    """Encodes payload as media_type; columnar payloads are built by the caller with to_columns."""
+    if media_type in MSGPACK_ALIASES:
+        return msgpack.packb(payload, default=_default)
+    return dumps(payload)
@@ -0,0 +1,15 @@
+import os
+
+from wsgi import application
+from app import warmup
+
+# Windows-friendly production launcher: `pip install waitress`, then `python serve.py`.
+# waitress is single-process, so the pool is warmed here directly.
+if __name__ == '__main__':
+    from waitress import serve
+
+    warmup(application, swagger=False)
+    serve(application,
+          host=os.environ.get("VEHICLE_API_HOST", "0.0.0.0"),
+          port=int(os.environ.get("VEHICLE_API_PORT", 5000)),
+          threads=int(os.environ.get("VEHICLE_API_THREADS", (os.cpu_count() or 1) * 4)))
@@ -1,6 +1,12 @@
+import gzip
+import json
 import unittest
-from unittest.mock import patch
-from app import app
+from unittest.mock import MagicMock, patch
+from app import _parse_ndjson, app, apply_config, create_app, warmup
+from databaseLayer import VersionConflictError
+from entity import VehicleRows
+from resilience import CircuitOpenError, DatabaseUnavailableError
+from validation import ValidationError
 
 
 class DummyVehicle:
@@ -36,6 +42,20 @@ class TestVehicleAPIWithMocks(unittest.TestCase):
         self.assertIn("error", response.get_json())
         mock_vehicle_details.assert_called_once()
 
+    @patch('app.vehicle_service.vehicle_details')
+    def test_1_post_vehicle_database_unavailable(self, mock_vehicle_details):
+        mock_vehicle_details.side_effect = DatabaseUnavailableError("Database unavailable: timeout")
+        response = self.client.post('/api/vehicle-details', json=self.test_data)
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn('Retry-After', response.headers)
+
+    @patch('app.vehicle_service.vehicle_details')
+    def test_1_post_vehicle_invalid_payload(self, mock_vehicle_details):
+        mock_vehicle_details.side_effect = ValidationError({"isCompleted": "isCompleted must be true or false."})
+        response = self.client.post('/api/vehicle-details', json=dict(self.test_data, isCompleted="yes"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("isCompleted", response.get_json()["fields"])
+
     # ---------------------------
     # GET /api/vehicle-details (specific vehicle)
     # ---------------------------
@@ -55,6 +75,29 @@ class TestVehicleAPIWithMocks(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertIn("error", response.get_json())
 
+    @patch('app.vehicle_service.search_vehicles')
+    def test_2_get_exact_vehicle_not_found(self, mock_search):
+        mock_search.return_value = None
+        response = self.client.get(f'/api/vehicle-details?vehicle_no={self.test_data["vehicle_no"]}&match=exact')
+        self.assertEqual(response.status_code, 404)
+        mock_search.assert_called_once_with(self.test_data["vehicle_no"], "exact", None)
+
+    @patch('app.vehicle_service.search_vehicles')
+    def test_2_get_while_circuit_open(self, mock_search):
+        mock_search.side_effect = CircuitOpenError("Database circuit breaker is open", retry_after=12.2)
+        response = self.client.get(f'/api/vehicle-details?vehicle_no={self.test_data["vehicle_no"]}&match=exact')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '13')
+        self.assertIn("error", response.get_json())
+
+    @patch('app.vehicle_service.search_vehicles')
+    def test_2_get_contains_search(self, mock_search):
+        mock_search.return_value = [DummyVehicle(self.test_data)]
+        response = self.client.get('/api/vehicle-details?vehicle_no=ST12&match=contains&limit=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]["vehicle_no"], self.test_data["vehicle_no"])
+        mock_search.assert_called_once_with("ST12", "contains", 5)
+
     # ---------------------------
     # PUT /api/vehicle-details
     # ---------------------------
@@ -72,6 +115,50 @@ class TestVehicleAPIWithMocks(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertIn("error", response.get_json())
 
+    @patch('app.vehicle_service.update_vehicle_details')
+    def test_3_update_vehicle_upsert(self, mock_update):
+        mock_update.return_value = True
+        response = self.client.put('/api/vehicle-details?upsert=true', json=self.test_data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(mock_update.call_args.kwargs["upsert"])
+
+    @patch('app.vehicle_service.update_vehicle_details')
+    def test_3_update_vehicle_upsert_invalid(self, mock_update):
+        mock_update.side_effect = ValueError("Invalid vehicle number.")
+        response = self.client.put('/api/vehicle-details?upsert=true', json=self.test_data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.get_json())
+
+    @patch('app.vehicle_service.update_vehicle_details')
+    def test_3_update_vehicle_if_match(self, mock_update):
+        mock_update.return_value = True
+        response = self.client.put('/api/vehicle-details', json=self.test_data, headers={"If-Match": '"v2"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_update.call_args.kwargs["expected_version"], 2)
+        self.assertEqual(response.headers["ETag"], '"v3"')
+
+        # The tag of a compressed or columnar copy names the same version
+        response = self.client.put('/api/vehicle-details', json=self.test_data, headers={"If-Match": '"v2-gzip"'})
+        self.assertEqual(mock_update.call_args.kwargs["expected_version"], 2)
+
+        mock_update.side_effect = VersionConflictError("Vehicle was modified by another request")
+        response = self.client.put('/api/vehicle-details', json=self.test_data, headers={"If-Match": '"v2"'})
+        self.assertEqual(response.status_code, 412)
+
+    @patch('app.vehicle_service.update_vehicle_details')
+    def test_3_update_vehicle_if_match_needs_one_strong_tag(self, mock_update):
+        for header in ('W/"v2"', '"t9"', '"v1", "v2"'):
+            response = self.client.put('/api/vehicle-details', json=self.test_data, headers={"If-Match": header})
+            self.assertEqual(response.status_code, 412, header)
+        mock_update.assert_not_called()
+
+    @patch('app.vehicle_service.update_vehicle_details')
+    def test_3_update_vehicle_validates_payload(self, mock_update):
+        response = self.client.put('/api/vehicle-details', json={"no_of_safety_check": -1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.get_json()["fields"]), {"vehicle_no", "no_of_safety_check"})
+        mock_update.assert_not_called()
+
     # ---------------------------
     # GET /api/vehicle-details (all vehicles)
     # ---------------------------
@@ -83,6 +170,15 @@ class TestVehicleAPIWithMocks(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.get_json(), list)
 
+    @patch('app.vehicle_service.get_all_vehicle_details')
+    def test_4_get_all_vehicles_encodes_rows(self, mock_get_all):
+        mock_get_all.return_value = VehicleRows([("TEST1234", 3, 1), ("TEST5678", None, 0)])
+        response = self.client.get('/api/vehicle-details')
+        self.assertEqual(response.get_json(), [self.test_data, {"vehicle_no": "TEST5678", "no_of_safety_check": None,
+                                                                "isCompleted": False}])
+        response = self.client.get('/api/vehicle-details', headers={"Accept": "application/vnd.vehicle.columnar+json"})
+        self.assertEqual(json.loads(response.data)["isCompleted"], [True, False])
+
     @patch('app.vehicle_service.get_all_vehicle_details')
     def test_4_get_all_vehicles_empty(self, mock_get_all):
         mock_get_all.return_value = []
@@ -90,6 +186,172 @@ class TestVehicleAPIWithMocks(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.get_json(), [])
 
+    @patch('app.vehicle_service.version_tag', return_value="t5")
+    @patch('app.vehicle_service.get_all_vehicle_details')
+    def test_4_get_all_vehicles_not_modified(self, mock_get_all, mock_tag):
+        mock_get_all.return_value = []
+        response = self.client.get('/api/vehicle-details')
+        self.assertEqual(response.headers["ETag"], '"t5"')
+
+        response = self.client.get('/api/vehicle-details', headers={"If-None-Match": '"t5"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b"")
+        mock_get_all.assert_called_once()
+        mock_tag.assert_called_with(None)
+
+    @patch('app.vehicle_service.version_tag', return_value="t5")
+    @patch('app.vehicle_service.get_all_vehicle_details')
+    def test_4_get_all_vehicles_columnar_and_gzip(self, mock_get_all, mock_tag):
+        mock_get_all.return_value = [DummyVehicle(dict(self.test_data, vehicle_no=f"TEST{i:04d}")) for i in range(100)]
+        headers = {"Accept": "application/vnd.vehicle.columnar+json", "Accept-Encoding": "gzip"}
+        response = self.client.get('/api/vehicle-details', headers=headers)
+        self.assertEqual(response.mimetype, "application/vnd.vehicle.columnar+json")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["ETag"], '"t5-columnar-gzip"')
+        self.assertEqual(set(response.vary), {"Accept", "Accept-Encoding"})
+        columns = json.loads(gzip.decompress(response.data))
+        self.assertEqual(columns["vehicle_no"][:2], ["TEST0000", "TEST0001"])
+        self.assertEqual(columns["no_of_safety_check"], [3] * 100)
+
+        headers["If-None-Match"] = '"t5-columnar-gzip"'
+        response = self.client.get('/api/vehicle-details', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        # Unknown media types still get JSON
+        response = self.client.get('/api/vehicle-details', headers={"Accept": "text/html"})
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(response.headers["ETag"], '"t5"')
+
+    @patch('app.vehicle_service.version_tag', return_value="v4")
+    @patch('app.vehicle_service.search_vehicles')
+    def test_4_exact_lookup_uses_row_version(self, mock_search, mock_tag):
+        response = self.client.get('/api/vehicle-details?vehicle_no=TEST1234&match=exact',
+                                   headers={"If-None-Match": '"v4"'})
+        self.assertEqual(response.status_code, 304)
+        mock_tag.assert_called_once_with("TEST1234")
+        mock_search.assert_not_called()
+
+    @patch('app.vehicle_service.version_tag', return_value="t7")
+    @patch('app.vehicle_service.get_all_vehicle_details', return_value=[])
+    def test_4_prefix_listing_uses_prefix_tag(self, mock_get_all, mock_tag):
+        response = self.client.get('/api/vehicle-details?vehicle_no=TEST')
+        self.assertEqual(response.headers["ETag"], '"t7"')
+        mock_tag.assert_called_once_with("TEST", prefix=True)
+
+    @patch('app.vehicle_service.get_vehicle_page')
+    def test_4_get_vehicle_page(self, mock_page):
+        mock_page.return_value = ([{"vehicle_no": "TEST1234"}], "TEST1234")
+        response = self.client.get('/api/vehicle-details?limit=1&after=TEST0000&fields=vehicle_no')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"items": [{"vehicle_no": "TEST1234"}], "next_cursor": "TEST1234"})
+        mock_page.assert_called_once_with(1, "TEST0000", ["vehicle_no"])
+
+    def test_4_get_vehicle_page_bad_limit(self):
+        response = self.client.get('/api/vehicle-details?limit=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.get_json())
+
+    # ---------------------------
+    # GET /api/vehicle-details/export
+    # ---------------------------
+    @patch('app.vehicle_service.export_vehicles')
+    def test_4_export_streams_chunks(self, mock_export):
+        mock_export.return_value = iter(['{"vehicle_no": "A"}\n', '{"vehicle_no": "B"}\n'])
+        response = self.client.get('/api/vehicle-details/export?format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(response.get_data(as_text=True).splitlines(), ['{"vehicle_no": "A"}', '{"vehicle_no": "B"}'])
+
+    def test_4_export_rejects_unknown_format(self):
+        response = self.client.get('/api/vehicle-details/export?format=xml')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.get_json())
+
+    # ---------------------------
+    # POST /api/vehicle-details/lookup, DELETE /api/vehicle-details/batch
+    # ---------------------------
+    @patch('app.vehicle_service.lookup_vehicles')
+    def test_5_batch_lookup(self, mock_lookup):
+        mock_lookup.return_value = [dict(self.test_data, status="found"),
+                                    {"vehicle_no": "GONE1234", "status": "missing"}]
+        response = self.client.post('/api/vehicle-details/lookup', json=["TEST1234", "GONE1234"])
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual((body["found"], body["missing"], body["invalid"]), (1, 1, 0))
+        mock_lookup.assert_called_once_with(["TEST1234", "GONE1234"])
+
+    @patch('app.vehicle_service.delete_vehicles')
+    def test_5_batch_delete_rejects_non_array(self, mock_delete):
+        mock_delete.side_effect = ValueError("Request body must be a JSON array of vehicle numbers")
+        response = self.client.delete('/api/vehicle-details/batch', json={"vehicle_no": "TEST1234"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.get_json())
+
+    # ---------------------------
+    # GET /api/vehicle-details/stats
+    # ---------------------------
+    @patch('app.vehicle_service.get_vehicle_stats')
+    def test_4_stats(self, mock_stats):
+        mock_stats.return_value = {"total": 0, "completed": 0, "pending": 0, "completion_rate": 0.0,
+                                   "safety_checks": {"count": 0, "distribution": []}}
+        response = self.client.get('/api/vehicle-details/stats?prefix_length=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["total"], 0)
+        mock_stats.assert_called_once_with(2)
+
+        response = self.client.get('/api/vehicle-details/stats?prefix_length=x')
+        self.assertEqual(response.status_code, 400)
+
+    # ---------------------------
+    # GET /api/vehicle-details/changes
+    # ---------------------------
+    @patch('app.vehicle_service.get_changes')
+    def test_4_changes_since(self, mock_changes):
+        change = {"seq": 8, "op": "delete", "vehicle_no": "TEST1234", "no_of_safety_check": None, "isCompleted": None}
+        mock_changes.return_value = ([change], 8)
+        response = self.client.get('/api/vehicle-details/changes?since=7&wait=10')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"changes": [change], "next_since": 8})
+        mock_changes.assert_called_once_with(7, None, 10)
+
+        response = self.client.get('/api/vehicle-details/changes?since=abc')
+        self.assertEqual(response.status_code, 400)
+
+    @patch('app.vehicle_service.get_changes')
+    def test_4_changes_stream_resumes_from_last_event_id(self, mock_changes):
+        change = {"seq": 6, "op": "insert", "vehicle_no": "TEST1234", "no_of_safety_check": 3, "isCompleted": True}
+        # Validation call, one batch, then a failure that ends the stream
+        mock_changes.side_effect = [([], 5), ([change], 6), RuntimeError("database gone")]
+        response = self.client.get('/api/vehicle-details/changes',
+                                   headers={"Accept": "text/event-stream", "Last-Event-ID": "5"})
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        body = response.get_data(as_text=True)
+        self.assertIn('id: 6\nevent: change\ndata: {"seq":6', body)
+        self.assertEqual(mock_changes.call_args_list[1].args[0], 5)
+        self.assertEqual(mock_changes.call_args_list[2].args[0], 6)
+
+    def test_4_waiting_change_requests_are_capped(self):
+        service = MagicMock()
+        service.get_changes.return_value = ([], 0)
+        factory_app = create_app(service)
+        client = factory_app.test_client()
+        slots = factory_app.extensions['vehicle_change_streams']
+        limit = factory_app.config['MAX_CHANGE_STREAMS']
+
+        # Finished long polls and closed streams give their slot back
+        self.assertEqual(client.get('/api/vehicle-details/changes?wait=1').status_code, 200)
+        response = client.get('/api/vehicle-details/changes', headers={"Accept": "text/event-stream"})
+        response.close()
+        for _ in range(limit):
+            self.assertTrue(slots.acquire(blocking=False))
+
+        response = client.get('/api/vehicle-details/changes?wait=1')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        # A poll that doesn't wait needs no slot
+        self.assertEqual(client.get('/api/vehicle-details/changes').status_code, 200)
+        for _ in range(limit):
+            slots.release()
+
     # ---------------------------
     # DELETE /api/vehicle-details
     # ---------------------------
@@ -112,6 +374,128 @@ class TestVehicleAPIWithMocks(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("error", response.get_json())
 
+    # ---------------------------
+    # POST /api/vehicle-details/bulk
+    # ---------------------------
+    @patch('app.vehicle_service.bulk_vehicle_details')
+    def test_6_bulk_post_json_array(self, mock_bulk):
+        mock_bulk.return_value = [
+            {"index": 0, "vehicle_no": "TEST1234", "status": "created"},
+            {"index": 1, "vehicle_no": "TEST1234", "status": "duplicate"},
+        ]
+        response = self.client.post('/api/vehicle-details/bulk', json=[self.test_data, self.test_data])
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual((body["created"], body["duplicate"], body["invalid"]), (1, 1, 0))
+        self.assertEqual(len(mock_bulk.call_args[0][0]), 2)
+
+    @patch('app.vehicle_service.bulk_vehicle_details')
+    def test_6_bulk_post_ndjson(self, mock_bulk):
+        mock_bulk.return_value = []
+        body = '{"vehicle_no": "TEST1234"}\nnot json\n\n{"vehicle_no": "TEST5678"}\n'
+        response = self.client.post('/api/vehicle-details/bulk', data=body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        records = mock_bulk.call_args[0][0]
+        self.assertEqual(records, [{"vehicle_no": "TEST1234"}, None, {"vehicle_no": "TEST5678"}])
+
+    @patch('app.vehicle_service.bulk_vehicle_details')
+    def test_6_bulk_post_rejects_too_many_rows(self, mock_bulk):
+        mock_bulk.return_value = []
+        self.addCleanup(app.config.__setitem__, 'MAX_BULK_ROWS', app.config['MAX_BULK_ROWS'])
+        app.config['MAX_BULK_ROWS'] = 2
+        response = self.client.post('/api/vehicle-details/bulk', json=[self.test_data] * 3)
+        self.assertEqual(response.status_code, 413)
+        body = '{"vehicle_no": "TEST1234"}\n' * 3
+        response = self.client.post('/api/vehicle-details/bulk', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 413)
+        mock_bulk.assert_not_called()
+
+        response = self.client.post('/api/vehicle-details/bulk', data='{"vehicle_no": "TEST1234"}\n\n' * 2,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+
+    def test_6_bulk_ndjson_stops_reading_past_the_limit(self):
+        lines = iter([b'{"vehicle_no": "A"}\n', b'\n', b'not json\n', b'{"vehicle_no": "B"}\n'])
+        self.assertEqual(_parse_ndjson(lines, 2), [{"vehicle_no": "A"}, None])
+        self.assertEqual(next(lines), b'{"vehicle_no": "B"}\n')
+
+    def test_6_bulk_post_rejects_non_array(self):
+        response = self.client.post('/api/vehicle-details/bulk', json=self.test_data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.get_json())
+
+
+class TestApplicationFactory(unittest.TestCase):
+
+    def test_1_factory_uses_injected_service(self):
+        service = MagicMock()
+        service.delete_vehicle.return_value = True
+        client = create_app(service).test_client()
+        response = client.delete('/api/vehicle-details?vehicle_no=TEST1234')
+        self.assertEqual(response.status_code, 200)
+        service.delete_vehicle.assert_called_once_with('TEST1234')
+
+    def test_2_metrics_endpoint_and_request_id(self):
+        service = MagicMock()
+        service.repo.db_context.pool.metrics.return_value = {
+            "in_use": 1, "idle": 2, "max_size": 10, "checkouts": 5, "waits": 0,
+            "timeouts": 0, "created": 3, "discarded": 0, "wait_time_total": 0.0}
+        service.cache_stats.return_value = {"backend": "memory", "hits": 4, "misses": 1,
+                                            "evictions": 0, "invalidations": 0, "stale_hits": 0}
+        service.delete_vehicle.return_value = True
+        client = create_app(service).test_client()
+        response = client.delete('/api/vehicle-details?vehicle_no=TEST1234', headers={'X-Request-ID': 'abc-123'})
+        self.assertEqual(response.headers['X-Request-ID'], 'abc-123')
+        self.assertTrue(client.get('/api/vehicle-details').headers['X-Request-ID'])
+
+        text = client.get('/metrics').get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_count{method="DELETE",route="/api/vehicle-details",status="200"}', text)
+        self.assertIn('vehicle_db_pool_connections{state="idle"} 2', text)
+        self.assertIn('vehicle_cache_hits_total{backend="memory"} 4', text)
+
+    def test_2_warmup_builds_spec_and_prefills_pool(self):
+        service = MagicMock()
+        factory_app = create_app(service)
+        warmup(factory_app)
+        service.repo.db_context.pool.prefill.assert_called_once()
+        swag = factory_app.extensions['vehicle_swagger']
+        self.assertIn('/api/vehicle-details', swag.apispecs['apispec_1']['paths'])
+
+    def test_3_swagger_loads_on_first_docs_request(self):
+        factory_app = create_app(MagicMock())
+        docs = factory_app.extensions['vehicle_docs']
+        self.assertFalse(docs.loaded)
+        client = factory_app.test_client()
+        client.get('/metrics')
+        self.assertFalse(docs.loaded)
+        spec = client.get('/apispec_1.json').get_json()
+        self.assertTrue(docs.loaded)
+        self.assertIn('/api/vehicle-details', spec['paths'])
+        self.assertEqual(client.get('/apidocs/').status_code, 200)
+
+    def test_4_apply_config_reconfigures_running_service(self):
+        service = MagicMock()
+        service.cache_stats.return_value = {"backend": "memory"}
+        config = {"DbPool": {"max_size": 4}, "Cache": {"backend": "memory", "ttl_seconds": 5},
+                  "DbEngine": "sqlite"}
+        restart = apply_config(service, config, {"DbPool", "Cache", "DbEngine"})
+        service.repo.db_context.pool.reconfigure.assert_called_once_with(max_size=4)
+        service.cache.reconfigure.assert_called_once_with(ttl=5, max_size=None)
+        self.assertEqual(restart, {"DbEngine"})
+
+        config["Cache"]["backend"] = "redis"
+        self.assertEqual(apply_config(service, config, {"Cache"}), {"Cache"})
+        service.cache.reconfigure.assert_called_once()
+
+    def test_5_apply_config_applies_sections_independently(self):
+        service = MagicMock()
+        service.cache_stats.return_value = {"backend": "memory"}
+        service.repo.db_context.pool.reconfigure.side_effect = ValueError("min_size must not exceed max_size")
+        config = {"DbPool": {"max_size": 1, "min_size": 2}, "Cache": {"backend": "memory", "ttl_seconds": 5}}
+        self.assertEqual(apply_config(service, config, {"DbPool", "Cache"}), {"DbPool"})
+        service.cache.reconfigure.assert_called_once_with(ttl=5, max_size=None)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,194 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import app
+from asgi import VehicleASGIApp
+from compression import ResponseCompressor
+from entity import Vehicle
+from resilience import CircuitOpenError
+
+
+def call(asgi_app, method, path, query=b'', body=b'', headers=()):
+    async def run():
+        messages = []
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                await asyncio.sleep(3600)
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+                 'headers': list(headers), 'http_version': '1.1', 'scheme': 'http'}
+        await asgi_app(scope, receive, send)
+        return messages
+
+    return asyncio.run(run())
+
+
+def response_of(messages):
+    status = messages[0]['status']
+    body = b''.join(m.get('body', b'') for m in messages[1:])
+    return status, body
+
+
+class TestVehicleASGIApp(unittest.TestCase):
+
+    def setUp(self):
+        self.service = MagicMock()
+        self.service.version_tag.return_value = "t1"
+        self.asgi_app = VehicleASGIApp(self.service, app, max_workers=8)
+        self.test_data = {"vehicle_no": "TEST1234", "no_of_safety_check": 3, "isCompleted": True}
+
+    def tearDown(self):
+        self.asgi_app.executor.shutdown()
+        self.asgi_app.change_executor.shutdown()
+
+    def test_1_post_vehicle(self):
+        status, body = response_of(call(self.asgi_app, 'POST', '/api/vehicle-details',
+                                        body=json.dumps(self.test_data).encode()))
+        self.assertEqual(status, 201)
+        self.service.vehicle_details.assert_called_once_with(self.test_data)
+
+    def test_1_database_unavailable_is_503(self):
+        self.service.vehicle_details.side_effect = CircuitOpenError("Database circuit breaker is open")
+        self.service.delete_vehicle.side_effect = CircuitOpenError("Database circuit breaker is open")
+        status, _ = response_of(call(self.asgi_app, 'POST', '/api/vehicle-details',
+                                     body=json.dumps(self.test_data).encode()))
+        self.assertEqual(status, 503)
+        status, _ = response_of(call(self.asgi_app, 'DELETE', '/api/vehicle-details', query=b'vehicle_no=TEST1234'))
+        self.assertEqual(status, 503)
+
+    def test_2_get_all_vehicles(self):
+        vehicle = MagicMock()
+        vehicle.__dict__ = dict(self.test_data)
+        self.service.get_all_vehicle_details.return_value = [vehicle]
+        status, body = response_of(call(self.asgi_app, 'GET', '/api/vehicle-details'))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), [self.test_data])
+
+    def test_2_get_carries_etag_and_defers_preconditions(self):
+        self.service.get_all_vehicle_details.return_value = []
+        messages = call(self.asgi_app, 'GET', '/api/vehicle-details')
+        self.assertIn((b'etag', b'"t1"'), messages[0]['headers'])
+
+        # Conditional requests go to the Flask route, whose service is not this mock
+        with patch('app.vehicle_service.version_tag', return_value="t1"):
+            status, _ = response_of(call(self.asgi_app, 'GET', '/api/vehicle-details',
+                                         headers=[(b'if-none-match', b'"t1"')]))
+        self.assertEqual(status, 304)
+        self.assertEqual(self.service.get_all_vehicle_details.call_count, 1)
+
+    def test_2_native_get_is_compressed_and_defers_other_encodings(self):
+        self.asgi_app.compressor = ResponseCompressor(min_size=100)
+        vehicles = [Vehicle(f"TEST{i:04d}", 3, True) for i in range(50)]
+        self.service.get_all_vehicle_details.return_value = vehicles
+        messages = call(self.asgi_app, 'GET', '/api/vehicle-details', headers=[(b'accept-encoding', b'gzip')])
+        headers = dict(messages[0]['headers'])
+        self.assertEqual(headers[b'content-encoding'], b'gzip')
+        self.assertEqual(headers[b'etag'], b'"t1-gzip"')
+        self.assertEqual(json.loads(gzip.decompress(response_of(messages)[1]))[0]["vehicle_no"], "TEST0000")
+
+        with patch('app.vehicle_service.get_all_vehicle_details', return_value=vehicles), \
+                patch('app.vehicle_service.version_tag', return_value="t1"):
+            messages = call(self.asgi_app, 'GET', '/api/vehicle-details',
+                            headers=[(b'accept', b'application/vnd.vehicle.columnar+json')])
+        self.assertEqual(json.loads(response_of(messages)[1])["no_of_safety_check"], [3] * 50)
+        self.assertEqual(self.service.get_all_vehicle_details.call_count, 1)
+
+    def test_3_put_and_delete_not_found(self):
+        self.service.update_vehicle_details.return_value = False
+        self.service.delete_vehicle.return_value = False
+        status, _ = response_of(call(self.asgi_app, 'PUT', '/api/vehicle-details',
+                                     body=json.dumps(self.test_data).encode()))
+        self.assertEqual(status, 404)
+        status, _ = response_of(call(self.asgi_app, 'DELETE', '/api/vehicle-details', query=b'vehicle_no=X'))
+        self.assertEqual(status, 404)
+        status, _ = response_of(call(self.asgi_app, 'DELETE', '/api/vehicle-details'))
+        self.assertEqual(status, 400)
+
+    def test_3_bad_requests_match_the_flask_responses(self):
+        body = json.dumps(dict(self.test_data, no_of_safety_check="many")).encode()
+        status, native = response_of(call(self.asgi_app, 'PUT', '/api/vehicle-details', body=body))
+        self.assertEqual(status, 400)
+        self.assertIn("no_of_safety_check", json.loads(native)["fields"])
+        flask_response = app.test_client().put('/api/vehicle-details', data=body, content_type='application/json')
+        self.assertEqual(json.loads(native), flask_response.get_json())
+
+        status, native = response_of(call(self.asgi_app, 'GET', '/api/vehicle-details', query=b'limit=abc'))
+        self.assertEqual(status, 400)
+        self.assertEqual(json.loads(native), {"error": "limit must be an integer"})
+        self.assertEqual(json.loads(native), app.test_client().get('/api/vehicle-details?limit=abc').get_json())
+
+    def test_4_other_routes_go_through_flask(self):
+        status, body = response_of(call(self.asgi_app, 'GET', '/api/vehicle-details/export', query=b'format=xml'))
+        self.assertEqual(status, 400)
+        self.assertIn("error", json.loads(body))
+
+    def test_4_change_feed_runs_outside_the_database_executor(self):
+        threads = []
+
+        def get_changes(since, limit, wait=0):
+            threads.append(threading.current_thread().name)
+            return [], since
+
+        with patch('app.vehicle_service.get_changes', side_effect=get_changes):
+            status, _ = response_of(call(self.asgi_app, 'GET', '/api/vehicle-details/changes', query=b'wait=1'))
+        self.assertEqual(status, 200)
+        self.assertTrue(threads[0].startswith("vehicle-changes"), threads)
+
+    def test_4_native_routes_send_the_same_cors_headers_as_flask(self):
+        self.asgi_app.cors = app.config['VEHICLE_CORS']
+        self.assertTrue(self.asgi_app.cors)
+        self.service.delete_vehicle.return_value = True
+
+        def headers_of(method, path, query, origin=b'http://example.com'):
+            headers = [(b'origin', origin)] if origin else []
+            return dict(call(self.asgi_app, method, path, query=query, headers=headers)[0]['headers'])
+
+        native = headers_of('DELETE', '/api/vehicle-details', b'vehicle_no=X')
+        bridged = headers_of('GET', '/api/vehicle-details/export', b'format=xml')
+        self.assertEqual(native[b'access-control-allow-origin'], b'http://example.com')
+        self.assertEqual(native[b'access-control-allow-origin'], bridged[b'access-control-allow-origin'])
+        self.assertIn(b'Origin', native[b'vary'])
+        self.assertEqual(headers_of('DELETE', '/api/vehicle-details', b'vehicle_no=X', origin=None)
+                         [b'access-control-allow-origin'], b'*')
+
+        self.asgi_app.cors = False
+        self.assertNotIn(b'access-control-allow-origin', headers_of('DELETE', '/api/vehicle-details', b'vehicle_no=X'))
+
+    def test_5_concurrent_requests_overlap_database_waits(self):
+        def slow_lookup(vehicle_no=None):
+            time.sleep(0.2)
+            return []
+        self.service.get_all_vehicle_details.side_effect = slow_lookup
+
+        async def run_many():
+            async def one():
+                async def receive():
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+                async def send(message):
+                    pass
+
+                scope = {'type': 'http', 'method': 'GET', 'path': '/api/vehicle-details', 'query_string': b''}
+                await self.asgi_app(scope, receive, send)
+            await asyncio.gather(*(one() for _ in range(8)))
+
+        start = time.monotonic()
+        asyncio.run(run_many())
+        self.assertLess(time.monotonic() - start, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from benchmarks import cold_start
+from benchmarks.crud import SCENARIOS, compare, run_benchmark
+
+
+class TestCrudBenchmark(unittest.TestCase):
+
+    def test_1_every_scenario_runs_without_errors(self):
+        report = run_benchmark(rows=20, concurrency=2, requests=10, repeat=1)
+        self.assertEqual(set(report["results"]), set(SCENARIOS))
+        for result in report["results"].values():
+            self.assertEqual(result["errors"], 0)
+            self.assertGreater(result["throughput_rps"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+    def test_2_compare_flags_regressions(self):
+        report = {"meta": {"target": "client", "rows": 20, "concurrency": 2},
+                  "results": {"get_exact": {"errors": 0, "throughput_rps": 50.0, "p95_ms": 10.0}}}
+        baseline = {"client-20-c2": {"get_exact": {"throughput_rps": 100.0, "p95_ms": 10.0}}}
+        self.assertEqual(len(compare(report, baseline, 0.3)), 1)
+        self.assertEqual(compare(report, baseline, 0.6), [])
+        self.assertEqual(compare(report, {}, 0.3), [])
+
+    def test_3_cold_start_probe_reports_each_phase(self):
+        results = cold_start.run_benchmark(runs=1)
+        self.assertEqual(set(results), {"import_ms", "first_request_ms", "first_docs_ms"})
+        self.assertTrue(all(value > 0 for value in results.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
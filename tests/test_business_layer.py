@@ -0,0 +1,420 @@
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from businessLayer import VehicleService
+from cache import LRUCache, RedisCache
+from databaseLayer import VehicleRepository
+from db_backends import MemoryBackend
+from db_context import DatabaseContext
+from entity import Vehicle
+from tests.test_cache import FakeRedis
+from write_behind import WriteBehindBuffer
+
+
+class TestVehicleServiceWithMemoryBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.db_context = DatabaseContext(MemoryBackend())
+        self.repo = VehicleRepository(self.db_context)
+        self.service = VehicleService(self.repo)
+
+    def tearDown(self):
+        self.db_context.close()
+
+    # ---------------------------
+    # Batch lookup and delete
+    # ---------------------------
+    def test_5_batch_lookup_and_delete_report_each_plate(self):
+        self.repo.insert_vehicles([Vehicle("BATCH01", 1, 1), Vehicle("BATCH02", 2, 0)])
+        plates = ["BATCH01", "MISSING9", "bad!", "BATCH01", 7]
+        results = self.service.lookup_vehicles(plates)
+        self.assertEqual([r["status"] for r in results], ["found", "missing", "invalid", "found", "invalid"])
+        self.assertEqual(results[0], {"vehicle_no": "BATCH01", "no_of_safety_check": 1, "isCompleted": True,
+                                      "status": "found"})
+
+        results = self.service.delete_vehicles(["BATCH01", "MISSING9", "bad!"])
+        self.assertEqual([r["status"] for r in results], ["deleted", "missing", "invalid"])
+        self.assertEqual([tuple(row) for row in self.repo.get_all_vehicles()], [("BATCH02", 2, 0)])
+        with self.assertRaises(ValueError):
+            self.service.delete_vehicles({"vehicle_no": "BATCH02"})
+
+    # ---------------------------
+    # Bulk create
+    # ---------------------------
+    def test_1_bulk_reports_per_row_status(self):
+        self.repo.insert_vehicle(Vehicle("EXIST01", 1, 1))
+        records = [
+            {"vehicle_no": "NEW0001", "no_of_safety_check": 1, "isCompleted": False},
+            {"vehicle_no": "EXIST01", "no_of_safety_check": 2, "isCompleted": True},
+            {"vehicle_no": "bad", "no_of_safety_check": 0, "isCompleted": False},
+            {"vehicle_no": "NEW0001", "no_of_safety_check": 3, "isCompleted": True},
+            None,
+        ]
+        results = self.service.bulk_vehicle_details(records)
+        self.assertEqual([r["status"] for r in results],
+                         ["created", "duplicate", "invalid", "duplicate", "invalid"])
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual(len(self.repo.get_all_vehicles()), 2)
+
+    def test_1_bulk_with_only_invalid_rows_skips_database(self):
+        results = self.service.bulk_vehicle_details([{"vehicle_no": "x"}])
+        self.assertEqual(results[0]["status"], "invalid")
+        self.assertEqual(self.db_context.pool.metrics()["checkouts"], 0)
+
+    # ---------------------------
+    # Keyset pagination
+    # ---------------------------
+    def test_2_pages_follow_cursor_to_the_end(self):
+        self.repo.insert_vehicles([Vehicle(f"PAGE{i:03d}", i, i % 2) for i in range(5)])
+        seen = []
+        items, cursor = self.service.get_vehicle_page(limit=2, fields=["no_of_safety_check"])
+        seen.extend(items)
+        while cursor:
+            items, cursor = self.service.get_vehicle_page(limit=2, after=cursor, fields=["no_of_safety_check"])
+            seen.extend(items)
+        self.assertEqual(seen, [{"no_of_safety_check": i} for i in range(5)])
+
+    def test_2_page_rejects_unknown_field_and_bad_limit(self):
+        with self.assertRaises(ValueError):
+            self.service.get_vehicle_page(fields=["password"])
+        with self.assertRaises(ValueError):
+            self.service.get_vehicle_page(limit=0)
+
+    # ---------------------------
+    # Streaming export
+    # ---------------------------
+    def test_3_export_ndjson_reads_in_chunks(self):
+        self.repo.insert_vehicles([Vehicle(f"EXPO{i:03d}", i, 0) for i in range(5)])
+        chunks = list(self.service.export_vehicles("ndjson", chunk_size=2))
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+        self.assertEqual([row["vehicle_no"] for row in rows], [f"EXPO{i:03d}" for i in range(5)])
+        self.assertEqual(self.db_context.pool.metrics()["in_use"], 0)
+
+    def test_3_export_csv_has_header(self):
+        self.repo.insert_vehicles([Vehicle("EXPO001", 2, 1), Vehicle("EXPO002", 0, 0), Vehicle("EXPO003", None, None)])
+        body = "".join(self.service.export_vehicles("csv"))
+        self.assertEqual(body.splitlines(), ["vehicle_no,no_of_safety_check,isCompleted", "EXPO001,2,true",
+                                             "EXPO002,0,false", "EXPO003,,"])
+        ndjson = [json.loads(line) for line in "".join(self.service.export_vehicles("ndjson")).splitlines()]
+        self.assertEqual([row["isCompleted"] for row in ndjson], [True, False, None])
+
+    def test_3_abandoned_export_returns_connection(self):
+        self.repo.insert_vehicles([Vehicle(f"EXPO{i:03d}", i, 0) for i in range(5)])
+        chunks = self.service.export_vehicles("ndjson", chunk_size=1)
+        next(chunks)
+        chunks.close()
+        self.assertEqual(self.db_context.pool.metrics()["in_use"], 0)
+
+    # ---------------------------
+    # Search modes
+    # ---------------------------
+    def test_4_exact_search_returns_single_vehicle(self):
+        self.repo.insert_vehicles([Vehicle("FIND001", 1, 0), Vehicle("FIND0011", 2, 0)])
+        vehicle = self.service.search_vehicles("FIND001", "exact")
+        self.assertEqual((vehicle.vehicle_no, vehicle.no_of_safety_check), ("FIND001", 1))
+        self.assertIsNone(self.service.search_vehicles("FIND00", "exact"))
+
+    def test_4_prefix_search_is_limited(self):
+        self.repo.insert_vehicles([Vehicle(f"FIND{i:03d}", i, 0) for i in range(10)])
+        self.assertEqual(len(self.service.search_vehicles("FIND", "prefix", limit=3)), 3)
+        with self.assertRaises(ValueError):
+            self.service.search_vehicles("FIND", "regex")
+
+    def test_4_contains_search_tracks_writes(self):
+        self.repo.insert_vehicle(Vehicle("KA01AB01", 1, 0))
+        self.assertEqual([v.vehicle_no for v in self.service.search_vehicles("AB", "contains")], ["KA01AB01"])
+        self.service.vehicle_details({"vehicle_no": "TN02AB02", "no_of_safety_check": 0, "isCompleted": False})
+        self.service.delete_vehicle("KA01AB01")
+        self.service.update_vehicle_details(Vehicle("TN02AB02", 9, True))
+        results = self.service.search_vehicles("AB", "contains")
+        self.assertEqual([(v.vehicle_no, v.no_of_safety_check) for v in results], [("TN02AB02", 9)])
+
+    def test_4_contains_search_sees_other_workers_writes(self):
+        self.repo.insert_vehicle(Vehicle("KA01AB01", 1, 0))
+        iter_vehicles = self.repo.iter_vehicles
+
+        def iter_with_concurrent_write(chunk_size=1000):
+            yield from iter_vehicles(chunk_size)
+            # Committed by another worker while the index is being built
+            self.repo.insert_vehicle(Vehicle("MH03AB03", 3, 0))
+
+        with patch.object(self.repo, "iter_vehicles", iter_with_concurrent_write):
+            self.assertEqual([v.vehicle_no for v in self.service.search_vehicles("AB", "contains")], ["KA01AB01"])
+        other_worker = VehicleService(self.repo)
+        other_worker.vehicle_details({"vehicle_no": "TN02AB02", "no_of_safety_check": 0, "isCompleted": False})
+        other_worker.delete_vehicle("KA01AB01")
+        with patch("businessLayer.INDEX_REFRESH_INTERVAL", 0):
+            self.assertEqual([v.vehicle_no for v in self.service.search_vehicles("AB", "contains")],
+                             ["MH03AB03", "TN02AB02"])
+
+    def test_4_index_checks_the_change_log_only_after_writes_or_the_interval(self):
+        self.repo.insert_vehicle(Vehicle("KA01AB01", 1, 0))
+        self.service.search_vehicles("AB", "contains")
+        with patch.object(self.repo, "get_change_counter", wraps=self.repo.get_change_counter) as counter:
+            for _ in range(3):
+                self.service.search_vehicles("AB", "fuzzy")
+            self.assertEqual(counter.call_count, 0)
+            # Writes through this service are searchable straight away
+            self.service.vehicle_details({"vehicle_no": "TN02AB02", "no_of_safety_check": 0, "isCompleted": False})
+            self.assertEqual([v.vehicle_no for v in self.service.search_vehicles("AB", "contains")],
+                             ["KA01AB01", "TN02AB02"])
+            self.assertEqual(counter.call_count, 1)
+
+    def test_4_fuzzy_search(self):
+        self.repo.insert_vehicles([Vehicle("KA01AB01", 1, 0), Vehicle("ZZ99ZZ99", 1, 0)])
+        self.assertEqual([v.vehicle_no for v in self.service.search_vehicles("KA01AB0", "fuzzy")], ["KA01AB01"])
+        self.assertEqual([v.vehicle_no for v in self.service.search_vehicles("KA01XB01", "fuzzy")], ["KA01AB01"])
+
+
+class TestVehicleServiceCache(unittest.TestCase):
+
+    def create_cache(self):
+        return LRUCache(max_size=16, ttl=60)
+
+    def setUp(self):
+        self.db_context = DatabaseContext(MemoryBackend())
+        self.repo = VehicleRepository(self.db_context)
+        self.service = VehicleService(self.repo, self.create_cache())
+        self.repo.insert_vehicle(Vehicle("CACHE01", 1, 0))
+
+    def tearDown(self):
+        self.db_context.close()
+
+    def lookup(self, vehicle_no):
+        return sorted((v.vehicle_no, v.no_of_safety_check) for v in self.service.get_all_vehicle_details(vehicle_no))
+
+    def test_1_repeated_lookup_is_served_from_cache(self):
+        self.lookup("CACHE01")
+        checkouts = self.db_context.pool.metrics()["checkouts"]
+        self.assertEqual(self.lookup("cache01"), [("CACHE01", 1)])
+        self.assertEqual(self.db_context.pool.metrics()["checkouts"], checkouts)
+        self.assertEqual(self.service.cache_stats()["hits"], 1)
+
+    def test_2_update_invalidates_exact_and_prefix_results(self):
+        self.lookup("CACHE01")
+        self.lookup("CA")
+        self.service.update_vehicle_details(Vehicle("CACHE01", 5, 1))
+        self.assertEqual(self.lookup("CACHE01"), [("CACHE01", 5)])
+        self.assertEqual(self.lookup("CA"), [("CACHE01", 5)])
+
+    def test_3_create_and_delete_invalidate_prefix_results(self):
+        self.assertEqual(self.lookup("CACHE"), [("CACHE01", 1)])
+        self.service.vehicle_details({"vehicle_no": "CACHE02", "no_of_safety_check": 2, "isCompleted": False})
+        self.assertEqual(self.lookup("CACHE"), [("CACHE01", 1), ("CACHE02", 2)])
+        self.service.delete_vehicle("CACHE01")
+        self.assertEqual(self.lookup("CACHE"), [("CACHE02", 2)])
+
+    def test_3_exact_lookup_is_cached_and_invalidated(self):
+        self.service.search_vehicles("CACHE01", "exact")
+        self.assertIsNone(self.service.search_vehicles("CACHE09", "exact"))
+        self.service.vehicle_details({"vehicle_no": "CACHE09", "no_of_safety_check": 2, "isCompleted": False})
+        self.assertEqual(self.service.search_vehicles("CACHE09", "exact").no_of_safety_check, 2)
+        self.service.delete_vehicle("CACHE01")
+        self.assertIsNone(self.service.search_vehicles("CACHE01", "exact"))
+
+    def test_4_bulk_create_invalidates_prefix_results(self):
+        self.lookup("CACHE")
+        self.service.bulk_vehicle_details([{"vehicle_no": "CACHE03", "no_of_safety_check": 3, "isCompleted": False}])
+        self.assertEqual(self.lookup("CACHE"), [("CACHE01", 1), ("CACHE03", 3)])
+
+    def test_5_batch_delete_invalidates_cached_results(self):
+        self.lookup("CACHE")
+        self.service.search_vehicles("CACHE01", "exact")
+        self.service.delete_vehicles(["CACHE01"])
+        self.assertEqual(self.lookup("CACHE"), [])
+        self.assertIsNone(self.service.search_vehicles("CACHE01", "exact"))
+
+    def test_5_exact_lookup_ignores_plate_case(self):
+        # A lower-case lookup must not cache a miss for the stored plate
+        self.assertEqual(self.service.search_vehicles("cache01", "exact").vehicle_no, "CACHE01")
+        self.assertEqual(self.service.search_vehicles("CACHE01", "exact").vehicle_no, "CACHE01")
+        self.assertEqual(self.service.version_tag("cache01"), "v1")
+        self.assertEqual(VehicleService(self.repo).search_vehicles("cache01", "exact").vehicle_no, "CACHE01")
+
+    def test_6_tags_match_cached_bodies_after_other_workers_write(self):
+        self.assertEqual(self.service.version_tag("CACHE01"), "v1")
+        counter = self.repo.get_change_counter()
+        self.assertEqual(self.service.version_tag("CACHE", prefix=True), f"t{counter}")
+        self.lookup("CACHE")
+
+        # Another worker's service, with its own cache, updates the row
+        VehicleService(self.repo, self.create_cache()).update_vehicle_details(Vehicle("CACHE01", 5, 1))
+        self.assertEqual(self.service.version_tag("CACHE01"), "v1")
+        self.assertEqual(self.service.search_vehicles("CACHE01", "exact").no_of_safety_check, 1)
+        self.assertEqual(self.service.version_tag("CACHE", prefix=True), f"t{counter}")
+        self.assertEqual(self.lookup("CACHE"), [("CACHE01", 1)])
+
+        # Once the entries expire, tag and body move together
+        self.service.cache.delete_many(["row:CACHE01", self.service._cache_key("CACHE")])
+        self.assertEqual(self.service.version_tag("CACHE01"), "v2")
+        self.assertEqual(self.service.search_vehicles("CACHE01", "exact").no_of_safety_check, 5)
+        self.assertEqual(self.service.version_tag("CACHE", prefix=True), f"t{counter + 1}")
+        self.assertEqual(self.lookup("CACHE"), [("CACHE01", 5)])
+
+
+class TestVehicleServiceWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        self.db_context = DatabaseContext(MemoryBackend())
+        self.repo = VehicleRepository(self.db_context)
+        # Long interval: tests flush explicitly
+        self.buffer = WriteBehindBuffer(self.repo.update_vehicles, max_pending=100, flush_interval=60)
+        self.service = VehicleService(self.repo, LRUCache(max_size=16, ttl=60), write_buffer=self.buffer)
+        self.repo.insert_vehicles([Vehicle("WB00001", 0, 0), Vehicle("WB00002", 0, 0)])
+
+    def tearDown(self):
+        self.buffer.close()
+        self.db_context.close()
+
+    def stored(self):
+        return sorted(tuple(row) for row in self.repo.get_all_vehicles())
+
+    def test_1_updates_are_coalesced_into_one_commit(self):
+        for count in range(1, 6):
+            self.assertTrue(self.service.update_vehicle_details(Vehicle("WB00001", count, 0)))
+        self.assertTrue(self.service.update_vehicle_details(Vehicle("WB00002", 1, 1)))
+        self.assertEqual(self.stored(), [("WB00001", 0, 0), ("WB00002", 0, 0)])
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.stored(), [("WB00001", 5, 0), ("WB00002", 1, 1)])
+        stats = self.buffer.stats()
+        self.assertEqual((stats["coalesced"], stats["flushes"], stats["pending"]), (4, 1, 0))
+
+    def test_2_reads_see_buffered_values(self):
+        self.service.get_all_vehicle_details("WB")
+        self.service.update_vehicle_details(Vehicle("WB00001", 7, 1))
+        self.assertEqual(self.service.search_vehicles("WB00001", "exact").no_of_safety_check, 7)
+        self.assertEqual([v.no_of_safety_check for v in self.service.get_all_vehicle_details("WB")], [7, 0])
+        items, _ = self.service.get_vehicle_page(fields=["isCompleted", "vehicle_no"])
+        self.assertEqual(items[0], {"isCompleted": True, "vehicle_no": "WB00001"})
+        self.assertIn('"no_of_safety_check":7', "".join(self.service.export_vehicles()))
+
+        # After the flush the cache must not serve the pre-update rows
+        self.buffer.flush()
+        self.assertEqual([v.no_of_safety_check for v in self.service.get_all_vehicle_details("WB")], [7, 0])
+
+    def test_3_missing_vehicle_is_not_buffered(self):
+        self.assertFalse(self.service.update_vehicle_details(Vehicle("WB99999", 1, 0)))
+        self.assertEqual(self.buffer.stats()["pending"], 0)
+
+    def test_4_delete_and_upsert_drop_buffered_update(self):
+        self.service.update_vehicle_details(Vehicle("WB00001", 3, 0))
+        self.service.update_vehicle_details(Vehicle("WB00002", 3, 0))
+        self.assertTrue(self.service.delete_vehicle("WB00001"))
+        self.service.update_vehicle_details(Vehicle("WB00002", 9, 1), upsert=True)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.stored(), [("WB00002", 9, 1)])
+
+    def test_5_close_flushes_remaining_updates(self):
+        self.service.update_vehicle_details(Vehicle("WB00002", 4, 1))
+        self.buffer.close()
+        self.assertEqual(self.stored(), [("WB00001", 0, 0), ("WB00002", 4, 1)])
+        # Once closed, updates are written through and cached reads follow them
+        self.assertEqual(self.service.search_vehicles("WB00002", "exact").no_of_safety_check, 4)
+        self.assertEqual([v.no_of_safety_check for v in self.service.get_all_vehicle_details("WB")], [0, 4])
+        tag = self.service.version_tag("WB00002")
+        self.assertTrue(self.service.update_vehicle_details(Vehicle("WB00002", 5, 1)))
+        self.assertEqual(self.stored(), [("WB00001", 0, 0), ("WB00002", 5, 1)])
+        self.assertEqual(self.service.search_vehicles("WB00002", "exact").no_of_safety_check, 5)
+        self.assertEqual([v.no_of_safety_check for v in self.service.get_all_vehicle_details("WB")], [0, 5])
+        self.assertNotEqual(self.service.version_tag("WB00002"), tag)
+
+    def test_6_no_version_tag_while_updates_are_buffered(self):
+        self.assertTrue(self.service.version_tag().startswith("t"))
+        self.service.update_vehicle_details(Vehicle("WB00001", 3, 0))
+        self.assertIsNone(self.service.version_tag())
+        self.assertIsNone(self.service.version_tag("WB00001"))
+        self.assertEqual(self.service.version_tag("WB00002"), "v1")
+
+        # A conditional update commits the buffered one first, then applies to version 2
+        self.assertTrue(self.service.update_vehicle_details(Vehicle("WB00001", 4, 1), expected_version=2))
+        self.assertEqual(self.service.version_tag("WB00001"), "v3")
+        self.assertEqual(self.stored(), [("WB00001", 4, 1), ("WB00002", 0, 0)])
+
+
+class TestVehicleServiceChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.db_context = DatabaseContext(MemoryBackend())
+        self.repo = VehicleRepository(self.db_context)
+        self.service = VehicleService(self.repo)
+
+    def tearDown(self):
+        self.db_context.close()
+
+    def test_1_changes_page_through_since(self):
+        self.service.vehicle_details({"vehicle_no": "FEED001", "no_of_safety_check": 1, "isCompleted": False})
+        self.service.update_vehicle_details(Vehicle("FEED001", 2, True))
+        self.service.delete_vehicle("FEED001")
+        changes, next_since = self.service.get_changes(0, limit=2)
+        self.assertEqual(changes, [
+            {"seq": 1, "op": "insert", "vehicle_no": "FEED001", "no_of_safety_check": 1, "isCompleted": False},
+            {"seq": 2, "op": "update", "vehicle_no": "FEED001", "no_of_safety_check": 2, "isCompleted": True}])
+        changes, next_since = self.service.get_changes(next_since)
+        self.assertEqual([(c["seq"], c["op"]) for c in changes], [(3, "delete")])
+        self.assertEqual(self.service.get_changes(next_since), ([], 3))
+
+    def test_2_long_poll_wakes_on_a_write(self):
+        timer = threading.Timer(0.1, self.service.vehicle_details,
+                                [{"vehicle_no": "FEED002", "no_of_safety_check": 0, "isCompleted": None}])
+        timer.start()
+        started = time.monotonic()
+        changes, next_since = self.service.get_changes(0, wait=5)
+        timer.join()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual((changes[0]["vehicle_no"], next_since), ("FEED002", 1))
+
+    def test_3_invalid_arguments(self):
+        for kwargs in ({"since": -1}, {"limit": 0}, {"wait": 61}):
+            with self.assertRaises(ValueError):
+                self.service.get_changes(**kwargs)
+
+
+class TestVehicleServiceStats(unittest.TestCase):
+
+    def setUp(self):
+        self.db_context = DatabaseContext(MemoryBackend())
+        self.repo = VehicleRepository(self.db_context)
+        self.service = VehicleService(self.repo, LRUCache(max_size=16, ttl=60))
+        self.repo.insert_vehicles([Vehicle(f"KA{i:05d}", i % 10, i % 4 == 0) for i in range(100)]
+                                  + [Vehicle("TN00001", None, None)])
+
+    def tearDown(self):
+        self.db_context.close()
+
+    def test_1_totals_and_percentiles(self):
+        stats = self.service.get_vehicle_stats()
+        self.assertEqual((stats["total"], stats["completed"], stats["pending"]), (101, 25, 76))
+        self.assertEqual(stats["completion_rate"], round(25 / 101, 4))
+        checks = stats["safety_checks"]
+        self.assertEqual((checks["count"], checks["min"], checks["max"], checks["mean"]), (100, 0, 9, 4.5))
+        self.assertEqual((checks["p50"], checks["p90"], checks["p99"]), (4, 8, 9))
+        self.assertEqual(checks["distribution"][0], {"value": 0, "count": 10})
+
+    def test_2_grouped_by_prefix(self):
+        stats = self.service.get_vehicle_stats(prefix_length=2)
+        self.assertEqual([(g["prefix"], g["total"]) for g in stats["groups"]], [("KA", 100), ("TN", 1)])
+        self.assertEqual(stats["groups"][1]["safety_checks"], {"count": 0, "distribution": []})
+        with self.assertRaises(ValueError):
+            self.service.get_vehicle_stats(prefix_length=5)
+
+    def test_3_cached_until_the_next_write(self):
+        self.service.get_vehicle_stats()
+        self.assertEqual(self.service.get_vehicle_stats()["total"], 101)
+        self.assertEqual(self.service.cache_stats()["hits"], 1)
+        self.service.delete_vehicle("TN00001")
+        self.assertEqual(self.service.get_vehicle_stats()["total"], 100)
+
+
+class TestVehicleServiceRedisCache(TestVehicleServiceCache):
+
+    def create_cache(self):
+        return RedisCache(FakeRedis(), ttl=60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import time
+import unittest
+
+from cache import MISSING, LRUCache, RedisCache, create_cache
+
+
+class FakeRedis:
+    """Local stand-in for the subset of the redis-py client the cache uses."""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        value, expires_at = self.store.get(key, (None, None))
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self.store[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.store[key] = (value.encode(), time.monotonic() + ex if ex else None)
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_1_hit_and_miss_counters(self):
+        cache = LRUCache(max_size=2, ttl=None)
+        self.assertIs(cache.get("a"), MISSING)
+        cache.set("a", [])
+        self.assertEqual(cache.get("a"), [])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_2_least_recently_used_is_evicted(self):
+        cache = LRUCache(max_size=2, ttl=None)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_3_entries_expire(self):
+        cache = LRUCache(max_size=2, ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_4_delete_many_counts_invalidations(self):
+        cache = LRUCache()
+        cache.set("a", 1)
+        cache.delete_many(["a", "b"])
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_4_expired_entries_stay_readable_as_stale(self):
+        cache = LRUCache(max_size=2, ttl=0.01)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        time.sleep(0.02)
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(cache.get_stale("a"), 1)
+        self.assertEqual(cache.get_stale("b"), 2)
+        cache.delete_many(["a"])
+        self.assertIs(cache.get_stale("a"), MISSING)
+        self.assertEqual(cache.stats()["stale_hits"], 2)
+
+    def test_5_reconfigure_evicts_down_to_new_size(self):
+        cache = LRUCache(max_size=3, ttl=None)
+        for key in "abc":
+            cache.set(key, key)
+        cache.reconfigure(ttl=0.01, max_size=1)
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(cache.get("c"), "c")
+        self.assertEqual(cache.stats()["evictions"], 2)
+        self.assertEqual(cache.ttl, 0.01)
+
+
+class TestRedisCache(unittest.TestCase):
+
+    def test_1_round_trip_through_client(self):
+        cache = RedisCache(FakeRedis(), ttl=30)
+        self.assertIs(cache.get("a"), MISSING)
+        cache.set("a", [["ABC123", 1, 0]])
+        self.assertEqual(cache.get("a"), [["ABC123", 1, 0]])
+        cache.delete_many(["a"])
+        self.assertIs(cache.get("a"), MISSING)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["invalidations"]), (1, 2, 1))
+
+    def test_2_create_cache_from_settings(self):
+        self.assertIsNone(create_cache({"backend": "none"}))
+        self.assertIsInstance(create_cache({"max_size": 8}), LRUCache)
+        with self.assertRaises(ValueError):
+            create_cache({"backend": "memcached"})
+
+
+if __name__ == '__main__':
+    unittest.main()
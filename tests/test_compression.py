@@ -0,0 +1,66 @@
+import gzip
+import json
+import unittest
+
+from flask import Flask, Response, jsonify
+
+from compression import ResponseCompressor, etag_variants
+
+
+def build_app(compressor):
+    app = Flask(__name__)
+    app.after_request(compressor)
+
+    @app.route('/big')
+    def big():
+        response = jsonify([{"vehicle_no": f"KA{i:06d}"} for i in range(200)])
+        response.set_etag("t3")
+        return response
+
+    @app.route('/small')
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route('/missing')
+    def missing():
+        return jsonify({"error": "x" * 2000}), 404
+
+    @app.route('/stream')
+    def stream():
+        return Response((json.dumps({"row": i}) + "\n" for i in range(500)), mimetype='application/x-ndjson')
+
+    return app
+
+
+class TestResponseCompressor(unittest.TestCase):
+
+    def setUp(self):
+        self.client = build_app(ResponseCompressor(min_size=512)).test_client()
+
+    def test_1_large_json_is_gzipped_with_suffixed_etag(self):
+        plain = self.client.get('/big')
+        response = self.client.get('/big', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['ETag'], '"t3-gzip"')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertLess(int(response.headers['Content-Length']), len(plain.data))
+        # Identical bytes every time, as a strong ETag promises
+        self.assertEqual(self.client.get('/big', headers={'Accept-Encoding': 'gzip'}).data, response.data)
+
+    def test_2_small_error_and_streamed_responses_are_left_alone(self):
+        headers = {'Accept-Encoding': 'gzip'}
+        for path in ('/small', '/missing', '/stream'):
+            response = self.client.get(path, headers=headers)
+            self.assertNotIn('Content-Encoding', response.headers, path)
+        response = self.client.get('/big', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.headers['ETag'], '"t3"')
+
+    def test_3_etag_variants_cover_each_coding(self):
+        self.assertEqual(etag_variants("t3")[0], "t3")
+        self.assertIn("t3-gzip", etag_variants("t3"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import unittest
+
+import config
+from config import ConfigError, load_config
+from config_watcher import ConfigWatcher
+
+SETTINGS = {
+    "environment": "dev",
+    "dev": {
+        "DbEngine": "sqlite",
+        "DbConnectionString": "vehicles.db",
+        "DbPool": {"min_size": 1, "max_size": 10},
+        "Logging": {"level": "INFO"},
+    },
+    "qa": {"DbEngine": "memory", "DbConnectionString": ""},
+}
+
+
+class TestLoadConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "env_parameters.json")
+        self.write(SETTINGS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, settings):
+        with open(self.path, "w") as file:
+            json.dump(settings, file)
+
+    def test_1_environment_variables_override_the_file(self):
+        environ = {"VEHICLE_API_DBPOOL__MAX_SIZE": "20", "VEHICLE_API_LOGGING__CONSOLE": "false",
+                   "VEHICLE_API_DBCONNECTIONSTRING": "other.db", "PATH": "/usr/bin"}
+        settings = load_config(self.path, environ)
+        self.assertEqual(settings["DbPool"], {"min_size": 1, "max_size": 20})
+        self.assertIs(settings["Logging"]["console"], False)
+        self.assertEqual(settings["DbConnectionString"], "other.db")
+        self.assertEqual(settings["environment"], "dev")
+
+        self.assertEqual(load_config(self.path, {"VEHICLE_API_ENVIRONMENT": "qa"})["DbEngine"], "memory")
+
+    def test_2_invalid_settings_are_rejected(self):
+        for environ in ({"VEHICLE_API_DBPOOL__MAX_SIZE": "big"}, {"VEHICLE_API_DBPOOL__MIN_SIZE": "50"},
+                        {"VEHICLE_API_LOGGING__LEVEL": "LOUD"}, {"VEHICLE_API_DBENGINE": "oracle"},
+                        {"VEHICLE_API_ENVIRONMENT": "staging"},
+                        {"VEHICLE_API_RESILIENCE__RETRIES": "-1"}, {"VEHICLE_API_API__MAX_CHANGE_STREAMS": "0"},
+                        {"VEHICLE_API_API__MAX_BULK_ROWS": "0"}, {"VEHICLE_API_DBPOOL__MAX_SIZES": "20"}):
+            with self.assertRaises(ConfigError, msg=environ):
+                load_config(self.path, environ)
+
+    def test_2_unknown_section_keys_are_named(self):
+        settings = json.loads(json.dumps(SETTINGS))
+        settings["dev"]["DbPool"]["max_conns"] = 5
+        self.write(settings)
+        with self.assertRaisesRegex(ConfigError, "Unknown DbPool setting: max_conns"):
+            load_config(self.path, {})
+
+    def test_3_other_prefixed_variables_are_ignored(self):
+        environ = {"VEHICLE_API_WORKERS": "4", "VEHICLE_API_BIND": "0.0.0.0:8000", "VEHICLE_API_TEST_MSSQL": "1",
+                   "VEHICLE_API_NOPE__KEY": "1"}
+        settings = load_config(self.path, environ)
+        self.assertEqual(settings["DbEngine"], load_config(self.path, {})["DbEngine"])
+        self.assertNotIn("NOPE", settings)
+
+    def test_4_watcher_reloads_changed_sections(self):
+        original = config._config
+        self.addCleanup(setattr, config, "_config", original)
+        config._config = load_config(self.path, {})
+        watcher = ConfigWatcher(self.path)
+        calls = []
+        watcher.listeners.append(lambda settings, changed: calls.append((settings, changed)))
+        self.assertEqual(watcher.check(), set())
+
+        settings = json.loads(json.dumps(SETTINGS))
+        settings["dev"]["DbPool"]["max_size"] = 4
+        self.write(settings)
+        os.utime(self.path, ns=(0, 1))
+        self.assertEqual(watcher.check(), {"DbPool"})
+        self.assertEqual(calls[0][0]["DbPool"]["max_size"], 4)
+        self.assertEqual(config.get_db_pool_settings()["max_size"], 4)
+
+        # An invalid file keeps the running config
+        settings["dev"]["DbPool"]["max_size"] = 0
+        self.write(settings)
+        os.utime(self.path, ns=(0, 2))
+        self.assertEqual(watcher.check(), set())
+        self.assertEqual(config.get_db_pool_settings()["max_size"], 4)
+        self.assertEqual(len(calls), 1)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_5_watcher_keeps_running_in_forked_children(self):
+        watcher = ConfigWatcher(self.path, interval=60).start()
+        self.addCleanup(watcher.stop)
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if watcher._thread.is_alive() else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
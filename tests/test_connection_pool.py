@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from connection_pool import ConnectionPool, PoolTimeoutError
+from databaseLayer import VehicleRepository
+from db_backends import MemoryBackend
+from db_context import DatabaseContext
+from entity import Vehicle
+
+
+def sqlite_connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_1_connection_is_reused(self):
+        pool = ConnectionPool(sqlite_connect, max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(pool.metrics()["created"], 1)
+        self.assertEqual(pool.metrics()["checkouts"], 2)
+
+    def test_2_metrics_track_in_use_and_idle(self):
+        pool = ConnectionPool(sqlite_connect, max_size=2)
+        with pool.connection():
+            metrics = pool.metrics()
+            self.assertEqual(metrics["in_use"], 1)
+            self.assertEqual(metrics["idle"], 0)
+        metrics = pool.metrics()
+        self.assertEqual(metrics["in_use"], 0)
+        self.assertEqual(metrics["idle"], 1)
+
+    def test_3_exhausted_pool_times_out(self):
+        pool = ConnectionPool(sqlite_connect, max_size=1, timeout=0.05)
+        with pool.connection():
+            with self.assertRaises(PoolTimeoutError):
+                pool.acquire()
+        self.assertEqual(pool.metrics()["timeouts"], 1)
+
+    def test_3_waiter_gets_released_connection(self):
+        pool = ConnectionPool(sqlite_connect, max_size=1, timeout=2)
+        entry = pool.acquire()
+        threading.Timer(0.05, pool.release, args=(entry,)).start()
+        with pool.connection() as conn:
+            self.assertIs(conn, entry.raw)
+        metrics = pool.metrics()
+        self.assertEqual(metrics["waits"], 1)
+        self.assertGreater(metrics["wait_time_total"], 0)
+
+    def test_4_failed_health_check_replaces_connection(self):
+        pool = ConnectionPool(sqlite_connect, max_size=1)
+        with pool.connection() as conn:
+            pass
+        conn.close()
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, conn)
+        self.assertEqual(pool.metrics()["discarded"], 1)
+
+    def test_4_idle_connection_is_recycled(self):
+        pool = ConnectionPool(sqlite_connect, max_size=1, max_idle=0.01)
+        with pool.connection() as conn:
+            pass
+        time.sleep(0.02)
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, conn)
+
+    def test_4_old_connection_is_recycled(self):
+        pool = ConnectionPool(sqlite_connect, max_size=1, max_lifetime=0.01)
+        with pool.connection() as conn:
+            time.sleep(0.02)
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, conn)
+
+    def test_5_prefill_opens_min_size(self):
+        pool = ConnectionPool(sqlite_connect, min_size=3, max_size=5)
+        pool.prefill()
+        self.assertEqual(pool.metrics()["idle"], 3)
+
+    def test_5_fork_resets_pool(self):
+        pool = ConnectionPool(sqlite_connect, max_size=1)
+        with pool.connection() as conn:
+            pass
+        with patch("connection_pool.os.getpid", return_value=-1):
+            with pool.connection() as child_conn:
+                self.assertIsNot(child_conn, conn)
+
+    def test_5_reconfigure_shrinks_idle_connections(self):
+        pool = ConnectionPool(sqlite_connect, min_size=3, max_size=5)
+        pool.prefill()
+        pool.reconfigure(min_size=1, max_size=2, timeout=0.05)
+        metrics = pool.metrics()
+        self.assertEqual((metrics["idle"], metrics["discarded"]), (2, 1))
+        self.assertEqual(pool.timeout, 0.05)
+        with self.assertRaises(ValueError):
+            pool.reconfigure(min_size=3)
+        with self.assertRaises(ValueError):
+            pool.reconfigure(connect=sqlite_connect)
+
+    def test_6_repository_borrows_from_pool(self):
+        context = DatabaseContext(MemoryBackend(), max_size=2)
+        repo = VehicleRepository(context)
+        repo.insert_vehicle(Vehicle("POOL123", 1, 0))
+        with self.assertRaises(Exception):
+            repo.insert_vehicle(Vehicle("POOL123", 1, 0))
+        self.assertEqual(repo.delete_vehicle("POOL123"), True)
+        metrics = context.pool.metrics()
+        self.assertEqual(metrics["in_use"], 0)
+        self.assertLessEqual(metrics["created"], 2)
+
+    def test_7_memory_backend_caps_pool_size(self):
+        context = DatabaseContext(MemoryBackend(), min_size=2, max_size=10)
+        self.addCleanup(context.close)
+        self.assertEqual((context.pool.min_size, context.pool.max_size), (1, 1))
+        context.pool.reconfigure(max_size=8)
+        self.assertEqual(context.pool.max_size, 1)
+
+        # Concurrent writers queue on the one connection instead of hitting table locks
+        repo = VehicleRepository(context)
+        errors = []
+
+        def insert(start):
+            try:
+                for i in range(start, start + 25):
+                    repo.insert_vehicle(Vehicle(f"CAP{i:04d}", i, 0))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=insert, args=(n * 25,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(repo.get_all_vehicles()), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import logging
+import os
+import queue
+import time
+import unittest
+
+import logger_config
+from logger_config import JsonFormatter, NonBlockingQueueHandler, SamplingFilter, setup_logger
+
+
+def make_record(level=logging.INFO, msg="hello %s", args=("world",)):
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+class TestLoggerConfig(unittest.TestCase):
+
+    def test_1_setup_logger_uses_single_queue_handler(self):
+        logger = setup_logger("tests.logger_config")
+        setup_logger("tests.logger_config")
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertIsInstance(logger.handlers[0], NonBlockingQueueHandler)
+
+    def test_2_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(make_record())
+        handler.handle(make_record())
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(handler.queue.get_nowait().getMessage(), "hello world")
+
+    def test_3_sampling_keeps_warnings(self):
+        sampler = SamplingFilter(sample_rate=0.0)
+        self.assertFalse(sampler.filter(make_record(logging.INFO)))
+        self.assertTrue(sampler.filter(make_record(logging.WARNING)))
+        self.assertTrue(SamplingFilter(sample_rate=1.0).filter(make_record(logging.INFO)))
+
+    def test_4_json_formatter(self):
+        entry = json.loads(JsonFormatter().format(make_record()))
+        self.assertEqual((entry["level"], entry["logger"], entry["message"]), ("INFO", "test", "hello world"))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_5_forked_child_restarts_listener(self):
+        logger = setup_logger("tests.logger_config")
+        pid = os.fork()
+        if pid == 0:
+            # Child: the record must be taken off the queue by a live listener
+            status = 1
+            try:
+                logger.warning("written by forked child")
+                deadline = time.monotonic() + 5
+                while logger_config.logging_stats()["queued"] and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                if logger_config._listener._thread.is_alive() and not logger_config.logging_stats()["queued"]:
+                    status = 0
+            finally:
+                os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
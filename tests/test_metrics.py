@@ -0,0 +1,51 @@
+import unittest
+
+from databaseLayer import VehicleRepository
+from db_backends import MemoryBackend
+from db_context import DatabaseContext
+from entity import Vehicle
+from metrics import Histogram, MetricsRegistry, REGISTRY
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_1_percentiles_are_interpolated_within_buckets(self):
+        histogram = Histogram(buckets=(0.1, 0.2, 0.5))
+        for value in [0.05] * 50 + [0.15] * 45 + [0.4] * 5:
+            histogram.observe(value)
+        self.assertLessEqual(histogram.percentile(0.5), 0.1)
+        self.assertTrue(0.1 < histogram.percentile(0.95) <= 0.2)
+        self.assertTrue(0.2 < histogram.percentile(0.99) <= 0.4)
+        self.assertEqual(Histogram().percentile(0.5), 0.0)
+
+    def test_2_prometheus_text_format(self):
+        registry = MetricsRegistry()
+        registry.observe("demo_seconds", "Demo", 0.003, route="/x")
+        text = registry.render([("demo_gauge", "A gauge", "gauge", [({"state": "idle"}, 2)])])
+        self.assertIn('# TYPE demo_seconds histogram', text)
+        self.assertIn('demo_seconds_bucket{route="/x",le="+Inf"} 1', text)
+        self.assertIn('demo_seconds_count{route="/x"} 1', text)
+        self.assertIn('demo_seconds_quantile{route="/x",quantile="0.99"}', text)
+        self.assertIn('demo_gauge{state="idle"} 2', text)
+
+
+class TestRepositorySpans(unittest.TestCase):
+
+    def test_1_repository_phases_are_recorded(self):
+        REGISTRY.reset()
+        db_context = DatabaseContext(MemoryBackend())
+        repo = VehicleRepository(db_context)
+        repo.insert_vehicle(Vehicle("SPAN001", 1, 0))
+        repo.get_all_vehicles()
+        text = REGISTRY.render()
+        for phase in ("acquire", "commit"):
+            self.assertIn(f'vehicle_db_phase_seconds_count{{method="insert_vehicle",phase="{phase}"}} 1', text)
+        # The insert, the change-counter bump and the change-log entry
+        self.assertIn('vehicle_db_phase_seconds_count{method="insert_vehicle",phase="execute"} 3', text)
+        self.assertIn('vehicle_db_phase_seconds_count{method="get_all_vehicles",phase="fetch"} 1', text)
+        self.assertIn('vehicle_repository_seconds_count{method="insert_vehicle"} 1', text)
+        db_context.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+
+from databaseLayer import VehicleAlreadyExistsError, VehicleRepository, VersionConflictError
+from db_backends import MemoryBackend, MssqlBackend, SqliteBackend
+from db_context import DatabaseContext
+from entity import Vehicle
+
+
+class RepositoryContract:
+    """Behaviour every storage backend must share with SQL Server."""
+
+    def create_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend = self.create_backend()
+        self.db_context = DatabaseContext(self.backend, max_size=2)
+        self.repo = VehicleRepository(self.db_context)
+        with self.db_context.connection() as conn:
+            conn.cursor().execute("DELETE FROM VehicleDetails")
+            conn.commit()
+
+    def tearDown(self):
+        self.db_context.close()
+
+    def test_1_insert_and_fetch_all(self):
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 1))
+        self.repo.insert_vehicle(Vehicle("XYZ789", 0, 0))
+        rows = sorted(tuple(row) for row in self.repo.get_all_vehicles())
+        self.assertEqual(rows, [("ABC123", 2, 1), ("XYZ789", 0, 0)])
+
+    def test_1_insert_duplicate_fails(self):
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 1))
+        with self.assertRaises(VehicleAlreadyExistsError):
+            self.repo.insert_vehicle(Vehicle("ABC123", 5, 0))
+        self.assertEqual(tuple(self.repo.get_all_vehicles()[0]), ("ABC123", 2, 1))
+
+    def test_1_bulk_insert_reports_duplicates(self):
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 1))
+        vehicles = [Vehicle("ABC123", 1, 0)] + [Vehicle(f"BULK{i:04d}", i, 0) for i in range(25)]
+        statuses = self.repo.insert_vehicles(vehicles, chunk_size=10)
+        self.assertEqual(statuses["ABC123"], "duplicate")
+        self.assertEqual(sum(1 for s in statuses.values() if s == "created"), 25)
+        self.assertEqual(len(self.repo.get_all_vehicles()), 26)
+
+    def test_2_fetch_by_prefix(self):
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 1))
+        self.repo.insert_vehicle(Vehicle("ABD456", 1, 0))
+        self.repo.insert_vehicle(Vehicle("XYZ789", 0, 0))
+        rows = sorted(row[0] for row in self.repo.get_vehicle_by_number("AB"))
+        self.assertEqual(rows, ["ABC123", "ABD456"])
+        self.assertEqual(len(self.repo.get_vehicle_by_number("NOPE")), 0)
+
+    def test_2_point_lookup(self):
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 1))
+        self.repo.insert_vehicle(Vehicle("ABC1234", 0, 0))
+        self.assertEqual(tuple(self.repo.get_vehicle("ABC123")), ("ABC123", 2, 1))
+        self.assertIsNone(self.repo.get_vehicle("ABC12"))
+
+    def test_2_prefix_escapes_wildcards(self):
+        for plate in ("AB_001", "ABX001", "ABX002"):
+            self.repo.insert_vehicle(Vehicle(plate, 0, 0))
+        self.assertEqual([row[0] for row in self.repo.get_vehicle_by_number("AB_")], ["AB_001"])
+        self.assertEqual(len(self.repo.get_vehicle_by_number("%001")), 0)
+        self.assertEqual([row[0] for row in self.repo.get_vehicle_by_number("AB_", limit=10)], ["AB_001"])
+        self.assertEqual([row[0] for row in self.repo.get_vehicle_by_number("ABX", limit=1)], ["ABX001"])
+
+    def test_2_keyset_page(self):
+        for plate in ("CCC333", "AAA111", "BBB222"):
+            self.repo.insert_vehicle(Vehicle(plate, 1, 0))
+        first = [tuple(row) for row in self.repo.get_vehicles_page(["vehicle_no"], limit=2)]
+        self.assertEqual(first, [("AAA111",), ("BBB222",)])
+        rest = [tuple(row) for row in self.repo.get_vehicles_page(["vehicle_no", "isCompleted"], "BBB222", 2)]
+        self.assertEqual(rest, [("CCC333", 0)])
+        with self.assertRaises(ValueError):
+            self.repo.get_vehicles_page(["vehicle_no; DROP TABLE VehicleDetails"])
+
+    def test_3_update(self):
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 0))
+        self.assertTrue(self.repo.update_vehicle(Vehicle("ABC123", 3, 1)))
+        self.assertEqual(tuple(self.repo.get_vehicle_by_number("ABC123")[0]), ("ABC123", 3, 1))
+        self.assertFalse(self.repo.update_vehicle(Vehicle("MISSING1", 3, 1)))
+
+    def test_3_batch_update_in_one_transaction(self):
+        self.repo.insert_vehicles([Vehicle("ABC123", 1, 0), Vehicle("DEF456", 1, 0)])
+        self.assertEqual(self.repo.update_vehicles([Vehicle("ABC123", 5, 1), Vehicle("DEF456", 6, 0)]), 2)
+        rows = sorted(tuple(row) for row in self.repo.get_all_vehicles())
+        self.assertEqual(rows, [("ABC123", 5, 1), ("DEF456", 6, 0)])
+
+    def test_3_batch_update_skips_deleted_rows(self):
+        self.repo.insert_vehicles([Vehicle("ABC123", 1, 0), Vehicle("DEF456", 1, 0)])
+        self.repo.delete_vehicle("DEF456")
+        since = self.repo.get_change_counter()
+        self.assertEqual(self.repo.update_vehicles([Vehicle("ABC123", 5, 1), Vehicle("DEF456", 6, 0)]), 1)
+        self.assertEqual([tuple(row)[1:] for row in self.repo.get_changes(since)], [("update", "ABC123", 5, 1)])
+        self.assertEqual(self.repo.get_change_counter(), since + 1)
+        self.assertEqual(len(self.repo.get_vehicle_by_number("DEF456")), 0)
+
+    def test_3_upsert_creates_then_updates(self):
+        self.assertTrue(self.repo.upsert_vehicle(Vehicle("ABC123", 1, 0)))
+        self.assertTrue(self.repo.upsert_vehicle(Vehicle("ABC123", 4, 1)))
+        rows = [tuple(row) for row in self.repo.get_all_vehicles()]
+        self.assertEqual(rows, [("ABC123", 4, 1)])
+
+    def test_4_delete(self):
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 0))
+        self.assertTrue(self.repo.delete_vehicle("ABC123"))
+        self.assertFalse(self.repo.delete_vehicle("ABC123"))
+        self.assertEqual(len(self.repo.get_all_vehicles()), 0)
+
+    def test_5_writes_bump_version_and_change_counter(self):
+        counter = self.repo.get_change_counter()
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 0))
+        self.assertEqual(self.repo.get_vehicle_version("ABC123"), 1)
+        self.assertTrue(self.repo.update_vehicle(Vehicle("ABC123", 3, 1)))
+        self.assertEqual(self.repo.get_vehicle_version("ABC123"), 2)
+        self.assertFalse(self.repo.delete_vehicle("MISSING1"))
+        self.assertEqual(self.repo.get_change_counter(), counter + 2)
+        self.assertIsNone(self.repo.get_vehicle_version("MISSING1"))
+        self.assertEqual(tuple(self.repo.get_vehicle_with_version("ABC123")), ("ABC123", 3, 1, 2))
+        self.assertIsNone(self.repo.get_vehicle_with_version("MISSING1"))
+
+    def test_5_conditional_update(self):
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 0))
+        with self.assertRaises(VersionConflictError):
+            self.repo.update_vehicle(Vehicle("ABC123", 3, 1), expected_version=7)
+        self.assertTrue(self.repo.update_vehicle(Vehicle("ABC123", 3, 1), expected_version=1))
+        self.assertEqual(self.repo.get_vehicle_version("ABC123"), 2)
+        self.assertFalse(self.repo.update_vehicle(Vehicle("MISSING1", 3, 1), expected_version=1))
+
+    def test_5_change_log_records_every_write_in_order(self):
+        since = self.repo.get_change_counter()
+        self.repo.insert_vehicle(Vehicle("ABC123", 2, 0))
+        self.repo.insert_vehicles([Vehicle("ABC123", 1, 0), Vehicle("DEF456", 1, 1)])
+        self.repo.update_vehicle(Vehicle("ABC123", 3, 1))
+        self.repo.update_vehicle(Vehicle("MISSING1", 3, 1))
+        self.repo.upsert_vehicle(Vehicle("GHI789", 4, 0))
+        self.repo.upsert_vehicle(Vehicle("GHI789", 5, 1))
+        self.repo.delete_vehicle("DEF456")
+        changes = [tuple(row) for row in self.repo.get_changes(since)]
+        self.assertEqual([row[0] for row in changes], list(range(since + 1, since + 7)))
+        self.assertEqual([row[1:] for row in changes], [
+            ("insert", "ABC123", 2, 0), ("insert", "DEF456", 1, 1), ("update", "ABC123", 3, 1),
+            ("insert", "GHI789", 4, 0), ("update", "GHI789", 5, 1), ("delete", "DEF456", None, None)])
+        self.assertEqual(self.repo.get_change_counter(), since + 6)
+        self.assertEqual(len(self.repo.get_changes(since + 3, limit=1)), 1)
+
+    def test_6_stats_histogram(self):
+        self.repo.insert_vehicles([Vehicle("KA00001", 2, 1), Vehicle("KA00002", 2, 1), Vehicle("TN00001", 0, 0)])
+        self.assertEqual(sorted(tuple(row) for row in self.repo.get_vehicle_stats()), [(0, 0, 1), (2, 1, 2)])
+        rows = sorted(tuple(row) for row in self.repo.get_vehicle_stats(prefix_length=2))
+        self.assertEqual(rows, [("KA", 2, 1, 2), ("TN", 0, 0, 1)])
+
+    def test_7_batch_lookup_and_delete_in_chunks(self):
+        self.repo.insert_vehicles([Vehicle(f"ABC{i:04d}", i, 0) for i in range(25)])
+        plates = [f"ABC{i:04d}" for i in range(0, 30, 2)]
+        rows = self.repo.get_vehicles(plates, chunk_size=4)
+        self.assertEqual(sorted(row[0] for row in rows), plates[:13])
+
+        since = self.repo.get_change_counter()
+        deleted = self.repo.delete_vehicles(plates, chunk_size=4)
+        self.assertEqual(sorted(deleted), plates[:13])
+        self.assertEqual(len(self.repo.get_all_vehicles()), 12)
+        self.assertEqual([row[1] for row in self.repo.get_changes(since)], ["delete"] * 13)
+        self.assertEqual(self.repo.delete_vehicles(plates), [])
+
+
+class TestMemoryBackend(RepositoryContract, unittest.TestCase):
+
+    def create_backend(self):
+        return MemoryBackend()
+
+
+class TestSqliteBackend(RepositoryContract, unittest.TestCase):
+
+    def create_backend(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        return SqliteBackend(os.path.join(self.tmp_dir.name, "vehicles.db"))
+
+    def test_6_adds_version_column_to_existing_table(self):
+        path = os.path.join(self.tmp_dir.name, "old.db")
+        with closing(sqlite3.connect(path)) as conn:
+            conn.execute("CREATE TABLE VehicleDetails (vehicle_no VARCHAR(10) PRIMARY KEY,"
+                         " no_of_safety_check INT, isCompleted TINYINT)")
+            conn.execute("INSERT INTO VehicleDetails VALUES ('OLD0001', 1, 0)")
+            conn.commit()
+        db_context = DatabaseContext(SqliteBackend(path), max_size=1)
+        self.addCleanup(db_context.close)
+        repo = VehicleRepository(db_context)
+        self.assertEqual(repo.get_vehicle_version("OLD0001"), 1)
+        self.assertTrue(repo.update_vehicle(Vehicle("OLD0001", 2, 1), expected_version=1))
+
+
+@unittest.skipUnless(os.environ.get("VEHICLE_API_TEST_MSSQL"),
+                     "set VEHICLE_API_TEST_MSSQL to a SQL Server connection string")
+class TestMssqlBackend(RepositoryContract, unittest.TestCase):
+
+    def create_backend(self):
+        return MssqlBackend(os.environ["VEHICLE_API_TEST_MSSQL"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import sqlite3
+import time
+import unittest
+from unittest.mock import patch
+
+from businessLayer import VehicleService
+from cache import LRUCache
+from connection_pool import PoolTimeoutError
+from databaseLayer import VehicleAlreadyExistsError, VehicleRepository
+from db_backends import MemoryBackend, SqliteBackend
+from db_context import DatabaseContext
+from entity import Vehicle
+from resilience import CircuitBreaker, CircuitOpenError, DatabaseUnavailableError, ResilientRepository
+
+
+def locked():
+    return sqlite3.OperationalError("database is locked")
+
+
+class FlakyRepository(VehicleRepository):
+    """Raises the queued errors, one per call, before reaching the database."""
+
+    def __init__(self, db_context):
+        super().__init__(db_context)
+        self.errors = []
+        self.calls = 0
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def get_vehicle(self, vehicle_no):
+        self._maybe_fail()
+        return super().get_vehicle(vehicle_no)
+
+    def get_vehicle_with_version(self, vehicle_no):
+        self._maybe_fail()
+        return super().get_vehicle_with_version(vehicle_no)
+
+    def insert_vehicle(self, vehicle):
+        self._maybe_fail()
+        return super().insert_vehicle(vehicle)
+
+    def iter_vehicles(self, chunk_size=1000):
+        self._maybe_fail()
+        yield from super().iter_vehicles(chunk_size)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_1_opens_after_threshold_and_rejects(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            breaker.before_call()
+        self.assertGreater(raised.exception.retry_after, 59)
+        self.assertEqual(breaker.stats()["rejected"], 1)
+
+    def test_2_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.02)
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.stats()["state"], CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.stats()["opened"], 2)
+
+
+class TestResilientRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.db_context = DatabaseContext(MemoryBackend())
+        self.flaky = FlakyRepository(self.db_context)
+        self.flaky.insert_vehicle(Vehicle("RES0001", 1, 0))
+        self.flaky.calls = 0
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        self.repo = ResilientRepository(self.flaky, self.breaker, retries=2, backoff=0.001)
+
+    def tearDown(self):
+        self.db_context.close()
+
+    def test_1_reads_are_retried_on_transient_errors(self):
+        self.flaky.errors = [locked(), locked()]
+        self.assertEqual(tuple(self.repo.get_vehicle("RES0001")), ("RES0001", 1, 0))
+        self.assertEqual(self.flaky.calls, 3)
+        stats = self.repo.resilience_stats()
+        self.assertEqual((stats["state"], stats["retries"], stats["consecutive_failures"]), ("closed", 2, 0))
+        self.assertIs(self.repo.db_context, self.db_context)
+
+    def test_2_writes_and_pool_timeouts_are_not_retried(self):
+        self.flaky.errors = [locked()]
+        with self.assertRaises(DatabaseUnavailableError):
+            self.repo.insert_vehicle(Vehicle("RES0002", 1, 0))
+        self.flaky.errors = [PoolTimeoutError("no connection")]
+        with self.assertRaises(DatabaseUnavailableError):
+            self.repo.get_vehicle("RES0001")
+        self.assertEqual(self.flaky.calls, 2)
+
+    def test_3_breaker_opens_and_fails_fast(self):
+        self.flaky.errors = [locked()] * 3
+        with self.assertRaises(DatabaseUnavailableError):
+            self.repo.get_vehicle("RES0001")
+        with self.assertRaises(CircuitOpenError):
+            self.repo.get_vehicle("RES0001")
+        with self.assertRaises(CircuitOpenError):
+            list(self.repo.iter_vehicles())
+        self.assertEqual(self.flaky.calls, 3)
+
+    def test_4_other_errors_pass_through_without_tripping(self):
+        with self.assertRaises(VehicleAlreadyExistsError):
+            self.repo.insert_vehicle(Vehicle("RES0001", 1, 0))
+        self.flaky.errors = [sqlite3.OperationalError("no such table: Nope")]
+        with self.assertRaises(sqlite3.OperationalError):
+            self.repo.get_vehicle("RES0001")
+        self.assertEqual(self.flaky.calls, 2)
+        self.assertEqual(self.breaker.stats()["failures"], 0)
+
+    def test_5_stale_cache_is_served_while_unavailable(self):
+        service = VehicleService(self.repo, LRUCache(ttl=0.01))
+        self.assertEqual(service.search_vehicles("RES0001", match="exact").no_of_safety_check, 1)
+        time.sleep(0.02)
+        self.flaky.errors = [locked()] * 3
+        self.assertEqual(service.search_vehicles("RES0001", match="exact").no_of_safety_check, 1)
+        self.assertEqual(service.cache_stats()["stale_hits"], 1)
+        with self.assertRaises(CircuitOpenError):
+            service.search_vehicles("RES0002", match="exact")
+        self.assertEqual(service.resilience_stats()["state"], "open")
+
+
+class TestTransientErrors(unittest.TestCase):
+
+    def test_1_sqlite_classifies_by_message(self):
+        backend = SqliteBackend(":memory:")
+        self.assertTrue(backend.is_transient_error(locked()))
+        self.assertFalse(backend.is_transient_error(sqlite3.OperationalError("near \"SELEC\": syntax error")))
+        self.assertFalse(backend.is_transient_error(sqlite3.IntegrityError("UNIQUE constraint failed")))
+
+    def test_2_pool_timeouts_count_against_the_breaker(self):
+        context = DatabaseContext(MemoryBackend(), timeout=0.01)
+        self.addCleanup(context.close)
+        repo = ResilientRepository(VehicleRepository(context), CircuitBreaker(failure_threshold=1))
+        with context.pool.connection():
+            with patch("resilience.time.sleep") as sleep:
+                with self.assertRaises(DatabaseUnavailableError):
+                    repo.get_vehicle("RES0001")
+        sleep.assert_not_called()
+        self.assertEqual(repo.resilience_stats()["state"], "open")
+
+
+if __name__ == '__main__':
+    unittest.main()
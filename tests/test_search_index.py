@@ -0,0 +1,45 @@
+import unittest
+
+from search_index import NGramIndex
+
+
+class TestNGramIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NGramIndex()
+        self.index.build([("ABC123", 1, 0), ("XAB999", 2, 1), ("KL01AB12", 0, 0), ("ZZZ000", 0, 0)])
+
+    def plates(self, rows):
+        return [row[0] for row in rows]
+
+    def test_1_contains(self):
+        self.assertEqual(self.plates(self.index.contains("ab")), ["ABC123", "KL01AB12", "XAB999"])
+        self.assertEqual(self.plates(self.index.contains("B12")), ["KL01AB12"])
+        self.assertEqual(self.plates(self.index.contains("ab", limit=1)), ["ABC123"])
+        self.assertEqual(self.plates(self.index.contains("Q")), [])
+
+    def test_1_single_character_contains(self):
+        self.assertEqual(self.plates(self.index.contains("9")), ["XAB999"])
+
+    def test_2_fuzzy_ranks_closest_first(self):
+        self.assertEqual(self.plates(self.index.fuzzy("ABC124"))[0], "ABC123")
+        self.assertEqual(self.plates(self.index.fuzzy("QQQQQQ")), [])
+
+    def test_2_fuzzy_tolerates_single_character_typos(self):
+        for typo in ("ABD123", "XBC123", "ABC12X", "AB123", "ABCC123"):
+            self.assertEqual(self.plates(self.index.fuzzy(typo))[0], "ABC123", typo)
+        self.assertEqual(self.plates(self.index.fuzzy("ABD123")), ["ABC123"])
+        self.assertEqual(self.plates(self.index.fuzzy("KL01AX12"))[0], "KL01AB12")
+        self.assertEqual(self.plates(self.index.fuzzy("AXY123", max_edits=1)), [])
+        self.assertEqual(self.plates(self.index.fuzzy("AXY123", max_edits=2)), ["ABC123"])
+
+    def test_3_add_and_remove_keep_index_in_sync(self):
+        self.index.add(("NEWAB1", 1, 0))
+        self.index.remove("ABC123")
+        self.index.add(("XAB999", 7, 1))
+        self.assertEqual(self.index.contains("AB"), [("KL01AB12", 0, 0), ("NEWAB1", 1, 0), ("XAB999", 7, 1)])
+        self.assertEqual(len(self.index), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
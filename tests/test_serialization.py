@@ -0,0 +1,91 @@
+import json
+import unittest
+
+import serialization
+from entity import Vehicle, VehicleRows
+from serialization import MSGPACK, dumps, encode, encode_rows, encode_rows_ndjson, to_columns, vehicle_media_types
+
+
+class TestVehicleEntity(unittest.TestCase):
+
+    def test_1_is_completed_normalized_to_bool(self):
+        self.assertIs(Vehicle("KA01AB1234", 2, 1).isCompleted, True)
+        self.assertIs(Vehicle("KA01AB1234", 2, 0).isCompleted, False)
+        self.assertIsNone(Vehicle("KA01AB1234", 2, None).isCompleted)
+
+    def test_2_slots_without_instance_dict(self):
+        vehicle = Vehicle.from_row(("KA01AB1234", 2, 1))
+        self.assertFalse(hasattr(vehicle, "__dict__"))
+        self.assertEqual(vehicle.to_dict(),
+                         {"vehicle_no": "KA01AB1234", "no_of_safety_check": 2, "isCompleted": True})
+
+
+class TestSerialization(unittest.TestCase):
+
+    rows = [("KA01AB1234", 3, 1), ("TN09\"X 1", None, 0), ("MH12ZZ0001", 0, None)]
+
+    def expected(self):
+        return [Vehicle.from_row(row).to_dict() for row in self.rows]
+
+    def test_1_encode_rows_matches_entity(self):
+        self.assertEqual(json.loads(encode_rows(self.rows)), self.expected())
+        self.assertEqual(encode_rows([]), b"[]")
+
+    def test_2_encode_rows_ndjson(self):
+        lines = encode_rows_ndjson(self.rows).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected())
+
+    def test_3_dumps_vehicles_and_plain_objects(self):
+        class Plain:
+            def __init__(self):
+                self.vehicle_no = "KA01AB1234"
+
+        payload = [Vehicle.from_row(row) for row in self.rows]
+        self.assertEqual(json.loads(dumps(payload)), self.expected())
+        self.assertEqual(json.loads(dumps(Plain())), {"vehicle_no": "KA01AB1234"})
+
+    def test_4_dumps_without_orjson(self):
+        original = serialization.orjson
+        serialization.orjson = None
+        try:
+            self.assertEqual(json.loads(dumps([Vehicle.from_row(row) for row in self.rows])), self.expected())
+        finally:
+            serialization.orjson = original
+
+    def test_4_encode_rows_is_the_same_with_and_without_orjson(self):
+        rows = self.rows * 1000
+        encoded = encode_rows(rows)
+        original = serialization.orjson
+        serialization.orjson = None
+        try:
+            self.assertEqual(encode_rows(rows), encoded)
+        finally:
+            serialization.orjson = original
+        self.assertEqual(len(json.loads(encoded)), 3000)
+        self.assertEqual(encode_rows(iter(self.rows)), encode_rows(self.rows))
+
+    def test_5_columnar_from_vehicles_and_dicts(self):
+        columns = to_columns(Vehicle.from_row(row) for row in self.rows)
+        self.assertEqual(columns["vehicle_no"], [row[0] for row in self.rows])
+        self.assertEqual(columns["isCompleted"], [True, False, None])
+        self.assertEqual(to_columns([{"vehicle_no": "KA01AB1234"}], ["vehicle_no"]), {"vehicle_no": ["KA01AB1234"]})
+        self.assertEqual(to_columns([])["no_of_safety_check"], [])
+
+    @unittest.skipUnless(serialization.msgpack, "msgpack is not installed")
+    def test_6_msgpack_round_trip(self):
+        body = encode([Vehicle.from_row(row) for row in self.rows], MSGPACK)
+        self.assertEqual(serialization.msgpack.unpackb(body), self.expected())
+        self.assertIn(MSGPACK, vehicle_media_types())
+        self.assertEqual(serialization.msgpack.unpackb(encode(VehicleRows(self.rows), MSGPACK)), self.expected())
+
+    def test_7_vehicle_rows_encode_without_vehicles(self):
+        rows = VehicleRows(self.rows)
+        self.assertEqual(dumps(rows), encode_rows(self.rows))
+        self.assertEqual(to_columns(rows), to_columns(Vehicle.from_row(row) for row in self.rows))
+        self.assertEqual(to_columns(VehicleRows([]), ["vehicle_no"]), {"vehicle_no": []})
+        self.assertEqual(json.loads(dumps({"items": rows})), {"items": self.expected()})
+        self.assertEqual((len(rows), rows[0], rows[1:].rows), (3, Vehicle.from_row(self.rows[0]), self.rows[1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from validation import (INVALID_BODY, INVALID_IS_COMPLETED, INVALID_SAFETY_CHECKS, INVALID_VEHICLE_NO,
+                        ValidationError, VehicleValidator)
+
+
+class TestVehicleValidator(unittest.TestCase):
+
+    def setUp(self):
+        self.validator = VehicleValidator(max_checks=100)
+        self.valid = {"vehicle_no": "KA01AB1234", "no_of_safety_check": 3, "isCompleted": True}
+
+    def test_1_valid_record_becomes_vehicle(self):
+        vehicle = self.validator.to_vehicle(self.valid)
+        self.assertEqual(vehicle.to_dict(), self.valid)
+        self.assertEqual(self.validator.errors({"vehicle_no": "KA01AB1234"}), {})
+
+    def test_2_each_field_is_checked(self):
+        self.assertEqual(self.validator.errors({"vehicle_no": "ka01"}), {"vehicle_no": INVALID_VEHICLE_NO})
+        self.assertEqual(self.validator.errors({"vehicle_no": "KA01AB\n"}), {"vehicle_no": INVALID_VEHICLE_NO})
+        for count in (-1, 101, "3", True, 2.0):
+            self.assertIn("no_of_safety_check", self.validator.errors(dict(self.valid, no_of_safety_check=count)))
+        for flag in (1, 0, "true"):
+            self.assertIn("isCompleted", self.validator.errors(dict(self.valid, isCompleted=flag)))
+        self.assertEqual(self.validator.errors(None), {"body": INVALID_BODY})
+
+    def test_3_validate_raises_value_error_with_fields(self):
+        with self.assertRaises(ValueError) as context:
+            self.validator.validate({"no_of_safety_check": -1})
+        self.assertIsInstance(context.exception, ValidationError)
+        self.assertEqual(set(context.exception.errors), {"vehicle_no", "no_of_safety_check"})
+
+    def test_4_batch_matches_per_record_checks(self):
+        records = [
+            self.valid,
+            {"vehicle_no": "bad", "no_of_safety_check": 1, "isCompleted": False},
+            "not a row",
+            {"vehicle_no": "TN09 X1234", "no_of_safety_check": 500, "isCompleted": 1},
+            {"vehicle_no": 12345, "no_of_safety_check": None},
+            {"vehicle_no": "MH12ZZ0001"},
+        ]
+        expected = {index: errors for index, record in enumerate(records)
+                    if (errors := self.validator.errors(record))}
+        self.assertEqual(self.validator.validate_batch(records), expected)
+        self.assertEqual(expected[3], {"no_of_safety_check": INVALID_SAFETY_CHECKS,
+                                       "isCompleted": INVALID_IS_COMPLETED})
+        self.assertEqual(self.validator.validate_batch([self.valid] * 3), {})
+        self.assertEqual(self.validator.validate_batch([]), {})
+
+    def test_5_batch_plates_with_embedded_newline(self):
+        plates = ["KA01AB1234", "AB\nCDEFG", "MH12ZZ0001", ""]
+        self.assertEqual(self.validator.validate_plates(plates), {1, 3})
+        self.assertEqual(self.validator.validate_plates(["KA01AB1234", "x", "MH12ZZ0001"]), {1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import threading
+import unittest
+
+from entity import Vehicle
+from write_behind import WriteBehindBuffer, create_write_buffer
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.flushed = threading.Event()
+        self.fail = False
+
+    def flush(self, vehicles):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.batches.append(sorted((v.vehicle_no, v.no_of_safety_check) for v in vehicles))
+        self.flushed.set()
+
+    def test_1_size_trigger_wakes_the_flusher(self):
+        buffer = WriteBehindBuffer(self.flush, max_pending=2, flush_interval=60)
+        try:
+            buffer.add(Vehicle("KA00001", 1, 0))
+            buffer.add(Vehicle("KA00002", 1, 0))
+            self.assertTrue(self.flushed.wait(5))
+            self.assertEqual(self.batches, [[("KA00001", 1), ("KA00002", 1)]])
+        finally:
+            buffer.close()
+
+    def test_2_time_trigger_flushes(self):
+        buffer = WriteBehindBuffer(self.flush, max_pending=100, flush_interval=0.05)
+        try:
+            buffer.add(Vehicle("KA00001", 1, 0))
+            self.assertTrue(self.flushed.wait(5))
+        finally:
+            buffer.close()
+
+    def test_3_failed_flush_keeps_entries(self):
+        buffer = WriteBehindBuffer(self.flush, max_pending=100, flush_interval=60)
+        buffer.add(Vehicle("KA00001", 1, 0))
+        self.fail = True
+        with self.assertRaises(RuntimeError):
+            buffer.flush()
+        self.assertEqual(buffer.stats()["failures"], 1)
+        self.assertEqual(buffer.get("ka00001").no_of_safety_check, 1)
+        self.fail = False
+        buffer.close()
+        self.assertEqual(self.batches, [[("KA00001", 1)]])
+
+    def test_4_overlay_replaces_only_buffered_rows(self):
+        buffer = WriteBehindBuffer(self.flush, max_pending=100, flush_interval=60)
+        rows = [("KA00001", 0, 0), ("KA00002", 0, 0)]
+        self.assertIs(buffer.overlay(rows), rows)
+        buffer.add(Vehicle("KA00002", 3, True))
+        self.assertEqual(buffer.overlay(rows), [("KA00001", 0, 0), ("KA00002", 3, 1)])
+        self.assertEqual(buffer.overlay([("KA00002", 0)], ["vehicle_no", "isCompleted"]), [("KA00002", 1)])
+        buffer.close()
+
+    def test_4_full_buffer_rejects_new_vehicles_while_flushes_fail(self):
+        self.fail = True
+        buffer = WriteBehindBuffer(self.flush, max_pending=2, flush_interval=60)
+        for i in range(4):
+            self.assertTrue(buffer.add(Vehicle(f"KA0000{i}", 1, 0)))
+        self.assertFalse(buffer.add(Vehicle("KA00009", 1, 0)))
+        # Vehicles already buffered keep coalescing so nothing older overtakes them
+        self.assertTrue(buffer.add(Vehicle("KA00000", 2, 0)))
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.stats()["rejected"], 1)
+        self.fail = False
+        buffer.close()
+        self.assertEqual(len(self.batches[-1]), 4)
+
+    def test_5_disabled_by_default(self):
+        self.assertIsNone(create_write_buffer({}, repo=None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import re
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import accumulate
+from operator import methodcaller
+from types import NoneType
+
+import entity
+
+PLATE_PATTERN = r'[A-Z0-9\- ]{5,10}'
+MIN_SAFETY_CHECKS = 0
+# no_of_safety_check is a SQL INT column
+MAX_SAFETY_CHECKS = 2 ** 31 - 1
+
+INVALID_VEHICLE_NO = "Invalid vehicle number. It must be 5–10 characters long and contain only A-Z, 0–9, hyphen, or space."
+INVALID_SAFETY_CHECKS = f"no_of_safety_check must be an integer between {MIN_SAFETY_CHECKS} and {MAX_SAFETY_CHECKS}."
+INVALID_IS_COMPLETED = "isCompleted must be true or false."
+INVALID_BODY = "Request body must be a JSON object."
+
+
+class ValidationError(ValueError):
+    def __init__(self, errors):
+        super().__init__(" ".join(errors.values()))
+        # field name -> message
+        self.errors = errors
+
+
+class VehicleValidator:
+    """Validates vehicle payloads; every pattern is compiled once, here."""
+
+    def __init__(self, min_checks=MIN_SAFETY_CHECKS, max_checks=MAX_SAFETY_CHECKS):
+        self.min_checks = min_checks
+        self.max_checks = max_checks
+        self.plate = re.compile(PLATE_PATTERN)
+        # Matches every line that is *not* a valid plate, so a batch of
+        # mostly good plates is scanned in C and only failures surface
+        self._invalid_plate_lines = re.compile(rf'^(?!{PLATE_PATTERN}$).*$', re.M)
+
+    def _check_count(self, value):
+        return value is None or (type(value) is int and self.min_checks <= value <= self.max_checks)
+
+    def errors(self, record):
+        if not isinstance(record, dict):
+            return {"body": INVALID_BODY}
+        errors = {}
+        vehicle_no = record.get('vehicle_no')
+        if not isinstance(vehicle_no, str) or not self.plate.fullmatch(vehicle_no):
+            errors["vehicle_no"] = INVALID_VEHICLE_NO
+        if not self._check_count(record.get('no_of_safety_check')):
+            errors["no_of_safety_check"] = INVALID_SAFETY_CHECKS
+        # Strict: 0/1 and "true" are rejected, only JSON booleans (or null) pass
+        if record.get('isCompleted') is not None and type(record.get('isCompleted')) is not bool:
+            errors["isCompleted"] = INVALID_IS_COMPLETED
+        return errors
+
+    def validate(self, record):
+        errors = self.errors(record)
+        if errors:
+            raise ValidationError(errors)
+        return record
+
+    def to_vehicle(self, record):
+        self.validate(record)
+        return entity.Vehicle(record['vehicle_no'], record.get('no_of_safety_check'), record.get('isCompleted'))
+
+    def validate_plates(self, plates):
+        """Indexes of the invalid plates, found with one regex pass over all of them."""
+        if not plates:
+            return set()
+        if not set(map(type, plates)) <= {str}:
+            plates = [plate if isinstance(plate, str) else "" for plate in plates]
+        text = "\n".join(plates)
+        if text.count("\n") != len(plates) - 1:
+            # A plate with an embedded newline would shift every line after it
+            return {index for index, plate in enumerate(plates) if not self.plate.fullmatch(plate)}
+        starts = list(accumulate(map((1).__add__, map(len, plates)), initial=0))
+        return {bisect_right(starts, match.start()) - 1 for match in self._invalid_plate_lines.finditer(text)}
+
+    def validate_batch(self, records):
+        """Errors for the invalid records only, as {index: {field: message}}.
+
+        Checked a column at a time rather than one record at a time.
+        """
+        results = defaultdict(dict)
+        if set(map(type, records)) <= {dict}:
+            rows, positions = records, range(len(records))
+        else:
+            positions = [index for index, record in enumerate(records) if isinstance(record, dict)]
+            for index in set(range(len(records))).difference(positions):
+                results[index]["body"] = INVALID_BODY
+            rows = [records[index] for index in positions]
+
+        for position in self.validate_plates(list(map(methodcaller('get', 'vehicle_no'), rows))):
+            results[positions[position]]["vehicle_no"] = INVALID_VEHICLE_NO
+
+        # Each column gets a type scan (plus min/max) first; values are only
+        # checked one by one when that scan finds a problem
+        counts = list(map(methodcaller('get', 'no_of_safety_check'), rows))
+        types = set(map(type, counts))
+        counts_ok = types <= {int, NoneType}
+        if counts_ok:
+            present = counts if NoneType not in types else [value for value in counts if value is not None]
+            counts_ok = not present or (self.min_checks <= min(present) and max(present) <= self.max_checks)
+        if not counts_ok:
+            for position, value in enumerate(counts):
+                if not self._check_count(value):
+                    results[positions[position]]["no_of_safety_check"] = INVALID_SAFETY_CHECKS
+
+        flags = list(map(methodcaller('get', 'isCompleted'), rows))
+        if not set(map(type, flags)) <= {bool, NoneType}:
+            for position, value in enumerate(flags):
+                if value is not None and type(value) is not bool:
+                    results[positions[position]]["isCompleted"] = INVALID_IS_COMPLETED
+        return dict(results)
+
+
+vehicle_validator = VehicleValidator()
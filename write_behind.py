@@ -0,0 +1,171 @@
+import atexit
+import os
+import threading
+
+from db_backends import VEHICLE_FIELDS
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class WriteBehindBuffer:
+    """Holds vehicle updates in memory and commits them in batches.
+
+    Updates to the same vehicle_no are coalesced (the latest one wins). The
+    buffer is written out in one transaction when it reaches max_pending
+    entries or every flush_interval seconds, whichever comes first, and once
+    more at interpreter exit.
+    """
+
+    def __init__(self, flush, max_pending=500, flush_interval=1.0):
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self._flush_batch = flush
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        # Called with the flushed vehicle numbers after every commit
+        self.listeners = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._pid = None
+        self._buffered = 0
+        self._coalesced = 0
+        self._flushes = 0
+        self._flushed = 0
+        self._failures = 0
+        self._rejected = 0
+        atexit.register(self.close)
+
+    @staticmethod
+    def _key(vehicle_no):
+        # Plate lookups are case-insensitive in the database
+        return vehicle_no.upper()
+
+    def _ensure_flusher(self):
+        # Started lazily, and again in a forked worker, whose copy of the
+        # parent's thread is not running
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+            self._thread.start()
+
+    def add(self, vehicle):
+        """Buffers an update; returns False once the buffer is closed or full.
+
+        The buffer is full at twice max_pending, which only happens while
+        flushes keep failing. Vehicles already buffered are still coalesced,
+        so a write-through can never be overtaken by an older buffered value.
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            key = self._key(vehicle.vehicle_no)
+            if key in self._pending:
+                self._coalesced += 1
+            elif len(self._pending) >= self.max_pending * 2:
+                self._rejected += 1
+                self._wake.set()
+                return False
+            self._pending[key] = vehicle
+            self._buffered += 1
+            size = len(self._pending)
+            self._ensure_flusher()
+        if size >= self.max_pending:
+            self._wake.set()
+        return True
+
+    def __len__(self):
+        return len(self._pending)
+
+    def get(self, vehicle_no):
+        with self._lock:
+            return self._pending.get(self._key(vehicle_no))
+
+    def discard(self, vehicle_no):
+        # Waits for an in-flight flush so it cannot land after the caller's write
+        with self._flush_lock, self._lock:
+            return self._pending.pop(self._key(vehicle_no), None)
+
+    def overlay(self, rows, columns=VEHICLE_FIELDS):
+        """Replaces rows that have a buffered update; the first column must be vehicle_no."""
+        if not self._pending:
+            return rows
+        with self._lock:
+            pending = dict(self._pending)
+        result = []
+        for row in rows:
+            vehicle = pending.get(self._key(row[0])) if isinstance(row[0], str) else None
+            if vehicle is None:
+                result.append(row)
+                continue
+            values = {"vehicle_no": row[0], "no_of_safety_check": vehicle.no_of_safety_check,
+                      # Keep the TINYINT shape the database would return
+                      "isCompleted": None if vehicle.isCompleted is None else int(vehicle.isCompleted)}
+            result.append(tuple(values[column] for column in columns))
+        return result
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = dict(self._pending)
+            if not batch:
+                return 0
+            try:
+                self._flush_batch(list(batch.values()))
+            except Exception as e:
+                # Entries stay buffered and are retried on the next trigger
+                self._failures += 1
+                logger.error("Write-behind flush of %d updates failed: %s", len(batch), str(e))
+                raise
+            with self._lock:
+                # Reads keep seeing an entry until it is committed; anything
+                # updated again during the flush stays for the next one
+                for key, vehicle in batch.items():
+                    if self._pending.get(key) is vehicle:
+                        del self._pending[key]
+                self._flushes += 1
+                self._flushed += len(batch)
+        logger.info("Write-behind flushed %d updates", len(batch))
+        vehicle_nos = [vehicle.vehicle_no for vehicle in batch.values()]
+        for listener in self.listeners:
+            listener(vehicle_nos)
+        return len(batch)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        try:
+            self.flush()
+        except Exception:
+            logger.error("Write-behind buffer closed with %d unflushed updates", len(self._pending))
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "buffered": self._buffered, "coalesced": self._coalesced,
+                    "flushes": self._flushes, "flushed": self._flushed, "failures": self._failures,
+                    "rejected": self._rejected}
+
+
+def create_write_buffer(settings, repo):
+    if not settings.get("enabled", False):
+        return None
+    max_pending = settings.get("max_pending", 500)
+    flush_interval = settings.get("flush_interval", 1.0)
+    logger.info("Write-behind updates enabled (max_pending=%s, flush_interval=%ss)", max_pending, flush_interval)
+    return WriteBehindBuffer(repo.update_vehicles, max_pending=max_pending, flush_interval=flush_interval)
@@ -0,0 +1,7 @@
+from app import create_app, warmup
+
+# Production WSGI entry point, e.g. `gunicorn -c gunicorn.conf.py`.
+# Database connections are opened per worker after fork (see gunicorn.conf.py);
+# only the process-independent warmup happens here.
+application = create_app()
+warmup(application, connections=False)